@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+# Background callers (imports, reindexing, rescreens) mark themselves with this header
+PRIORITY_HEADER = b"x-request-priority"
+
+# Share of an endpoint's queue that batch requests may fill, so interactive ones always find room
+BATCH_QUEUE_SHARE = 0.5
+_MAX_RETRY_AFTER_SECONDS = 60
+
+# Built-in limits per expensive endpoint: (requests running at once, requests waiting for a slot)
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "/screen-candidate": (16, 32),
+    "/screen-candidates/batch": (2, 2),
+    "/parse-cv": (4, 16),
+    "/vectorize-candidate": (8, 32),
+    "/search-candidates": (16, 32),
+    "/hybrid-search-candidates": (16, 32),
+    "/match-job": (16, 32),
+    "/generate-job-description": (8, 16),
+    "/generate-job-description/stream": (8, 16),
+    "/generate-template-section": (8, 16),
+    "/generate-template-section/stream": (8, 16),
+    "/generate-scorecard": (8, 16),
+    "/generate-rejection-email": (8, 16),
+    "/analyze-interview": (8, 16),
+    "/generate-interview-questions": (8, 16),
+    "/tasks/suggest": (4, 8),
+    "/deduplication/candidates": (2, 4),
+    "/async/screen-candidate": (16, 32),
+    "/async/parse-cv": (4, 16),
+}
+# Task submissions from backend-core's job processor: always the batch lane, with or without
+# the priority header, so they never take a slot an interactive request is waiting for
+BATCH_ENDPOINTS = {"/async/screen-candidate", "/async/parse-cv"}
+
+
+class AdmissionRejectedError(RuntimeError):
+    """An endpoint's queue is full or the request waited too long for a slot (HTTP 429)."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: float):
+        super().__init__(f"{endpoint} is overloaded ({reason}), retry later")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded, two-lane wait queue for one endpoint.
+    Freed slots go to waiting interactive requests before batch ones. A request is shed
+    instead of queued when its lane is full, and shed when it waits longer than its lane's
+    max wait: by then its caller has usually given up, and running it would only waste quota.
+    Used from the event loop only (no locking).
+    """
+
+    def __init__(self, endpoint: str, max_concurrent: int, max_queue: int,
+                 max_wait: float, batch_max_wait: float, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._max_wait = {PRIORITY_INTERACTIVE: max_wait, PRIORITY_BATCH: batch_max_wait}
+        self._clock = clock
+        self._active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {
+            PRIORITY_INTERACTIVE: deque(), PRIORITY_BATCH: deque()
+        }
+        # Moving average of how long a request holds its slot, for Retry-After
+        self._service_time = max(max_wait, 1.0)
+
+    def _queue_limit(self, priority: str) -> int:
+        if priority == PRIORITY_BATCH:
+            return int(self.max_queue * BATCH_QUEUE_SHARE)
+        return self.max_queue
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE) -> float:
+        """Waits for a slot; returns when it was granted (pass it to release())."""
+        if self._active < self.max_concurrent and not self.queued:
+            self._active += 1
+            self._publish()
+            return self._clock()
+
+        queue = self._queues[priority]
+        if len(queue) >= self._queue_limit(priority):
+            self._shed(priority, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self._publish()
+        queued_at = self._clock()
+        try:
+            await asyncio.wait_for(future, self._max_wait[priority])
+        except asyncio.TimeoutError:
+            self._forget(queue, future)
+            self._shed(priority, "timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the client went away: pass the slot on
+                self.release(self._clock())
+            else:
+                self._forget(queue, future)
+            raise
+        finally:
+            metrics.observe("admission_queue_wait_seconds", self._clock() - queued_at,
+                            endpoint=self.endpoint, lane=priority)
+        return self._clock()
+
+    def release(self, granted_at: float):
+        self._service_time = 0.8 * self._service_time + 0.2 * (self._clock() - granted_at)
+        for priority in (PRIORITY_INTERACTIVE, PRIORITY_BATCH):
+            queue = self._queues[priority]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    # The slot moves to the waiter: _active stays the same
+                    future.set_result(None)
+                    self._publish()
+                    return
+        self._active -= 1
+        self._publish()
+
+    def retry_after(self) -> float:
+        """Rough time until the current queue has drained."""
+        estimate = self._service_time * (self.queued + 1) / self.max_concurrent
+        return min(max(1.0, estimate), _MAX_RETRY_AFTER_SECONDS)
+
+    def _forget(self, queue: Deque[asyncio.Future], future: asyncio.Future):
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        self._publish()
+
+    def _shed(self, priority: str, reason: str):
+        metrics.inc("admission_shed_total", endpoint=self.endpoint, lane=priority, reason=reason)
+        raise AdmissionRejectedError(self.endpoint, reason, self.retry_after())
+
+    def _publish(self):
+        metrics.set_gauge("admission_active", self._active, endpoint=self.endpoint)
+        for priority, queue in self._queues.items():
+            metrics.set_gauge("admission_queued", len(queue), endpoint=self.endpoint, lane=priority)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            "max_queue": self.max_queue,
+        }
+
+
+def request_priority(scope: Scope) -> str:
+    if scope.get("path") in BATCH_ENDPOINTS:
+        return PRIORITY_BATCH
+    for name, value in scope.get("headers", []):
+        if name == PRIORITY_HEADER:
+            return PRIORITY_BATCH if value.strip().lower() == b"batch" else PRIORITY_INTERACTIVE
+    return PRIORITY_INTERACTIVE
+
+
+def parse_limits(overrides: str) -> Dict[str, Tuple[int, int]]:
+    """DEFAULT_LIMITS updated from "path=concurrent:queue,..." (e.g. ADMISSION_LIMITS)."""
+    limits = dict(DEFAULT_LIMITS)
+    for entry in overrides.split(","):
+        if not entry.strip():
+            continue
+        try:
+            path, values = entry.strip().split("=", 1)
+            concurrent, queue = values.split(":", 1)
+            limits[path.strip()] = (int(concurrent), int(queue))
+        except ValueError:
+            logger.warning(f"Ignoring malformed ADMISSION_LIMITS entry: {entry!r}")
+    return limits
+
+
+def build_controllers() -> Dict[str, AdmissionController]:
+    if not settings.ADMISSION_ENABLED:
+        return {}
+    return {
+        path: AdmissionController(path, concurrent, queue, settings.ADMISSION_MAX_WAIT_SECONDS,
+                                  settings.ADMISSION_BATCH_MAX_WAIT_SECONDS)
+        for path, (concurrent, queue) in parse_limits(settings.ADMISSION_LIMITS).items()
+        if concurrent > 0
+    }
+
+
+controllers = build_controllers()
+
+
+def stats() -> dict:
+    return {path: controller.stats() for path, controller in controllers.items()}
+
+
+class AdmissionControlMiddleware:
+    """
+    Applies the endpoint's AdmissionController before the request body is read, so shed
+    requests cost neither an upload nor a model call. The slot is held until the response
+    (including a stream) has been sent.
+    """
+
+    def __init__(self, app: ASGIApp, controllers: Dict[str, AdmissionController]):
+        self.app = app
+        self.controllers = controllers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        controller = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            controller = self.controllers.get(scope["path"])
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            granted_at = await controller.acquire(request_priority(scope))
+        except AdmissionRejectedError as e:
+            await self._reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(granted_at)
+
+    async def _reject(self, send: Send, error: AdmissionRejectedError):
+        body = json.dumps({"detail": str(error)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(error.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
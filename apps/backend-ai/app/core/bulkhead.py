@@ -0,0 +1,193 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from app.core.cancellation import check_cancelled
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+
+class BulkheadFullError(RuntimeError):
+    """A workload's executor stayed saturated for its whole queue timeout (HTTP 503)."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"The service is busy ({name} workers saturated), retry later")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """
+    A dedicated thread pool for one class of blocking work (LLM I/O, CPU-bound PDF work,
+    Milvus calls), so a burst of one class cannot take the threads the others need, as it
+    could in AnyIO's single shared pool for sync routes.
+    Work that waits longer than `queue_timeout` for a thread is dropped with BulkheadFullError.
+    """
+
+    def __init__(self, name: str, max_workers: int, queue_timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-bulkhead")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = 0
+        self._queued = 0
+
+    # --- Entry points ---
+
+    def endpoint(self, fn: Callable) -> Callable:
+        """
+        Route decorator: the sync endpoint runs on this bulkhead instead of the shared pool.
+        FastAPI still reads the signature of `fn`, which stays reachable as `__wrapped__`.
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await self.run(fn, *args, **kwargs)
+        return wrapper
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(await self._admit(fn, args, kwargs))
+
+    async def _admit(self, fn: Callable, args, kwargs) -> Future:
+        """Queues `fn` and waits (up to queue_timeout) until a thread has started it."""
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(started.set)
+            except RuntimeError:  # loop closed, nobody is waiting
+                pass
+
+        future = self._submit(fn, args, kwargs, notify)
+        try:
+            await asyncio.wait_for(started.wait(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                self._reject()
+        except asyncio.CancelledError:
+            # Caller gone before a thread was free: drop the queued work
+            if future.cancel():
+                self._dequeue()
+            raise
+        return future
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Blocking variant for code already on a thread (another bulkhead, the async task pool)."""
+        if getattr(self._local, "inside", False):
+            # Already on one of this bulkhead's threads: waiting for another could deadlock
+            return fn(*args, **kwargs)
+        started = threading.Event()
+        future = self._submit(fn, args, kwargs, started.set)
+        if not started.wait(self.queue_timeout) and future.cancel():
+            self._reject()
+        return future.result()
+
+    async def iterate(self, iterator: Iterator) -> AsyncIterator:
+        """Async view of a blocking iterator (e.g. a streaming generator), each next() on this bulkhead."""
+        done = object()
+        last = None
+        try:
+            while True:
+                last = await self._admit(next, (iterator, done), {})
+                item = await asyncio.wrap_future(last)
+                if item is done:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # Closing runs a generator's cleanup (may block): off the event loop, and only
+                # once a next() abandoned by a disconnected client has returned
+                if last is None or last.done():
+                    self._close_later(close)
+                else:
+                    last.add_done_callback(lambda _: self._close_later(close))
+
+    def _close_later(self, close: Callable):
+        try:
+            self._executor.submit(close)
+        except RuntimeError:  # shutting down
+            pass
+
+    # --- Internals ---
+
+    def _submit(self, fn: Callable, args, kwargs, on_start: Callable[[], None]) -> Future:
+        submitted = time.monotonic()
+        with self._lock:
+            self._queued += 1
+            self._publish()
+
+        def task():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._publish()
+            metrics.observe("bulkhead_queue_wait_seconds", time.monotonic() - submitted, bulkhead=self.name)
+            on_start()
+            self._local.inside = True
+            try:
+                # Queued work whose client left meanwhile is dropped unstarted
+                check_cancelled(f"{self.name}_queue")
+                return fn(*args, **kwargs)
+            finally:
+                self._local.inside = False
+                with self._lock:
+                    self._active -= 1
+                    self._publish()
+
+        # Context variables (request-scoped state) follow the work onto the thread
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, task)
+
+    def _dequeue(self):
+        with self._lock:
+            self._queued -= 1
+            self._publish()
+
+    def _reject(self):
+        self._dequeue()
+        metrics.inc("bulkhead_rejected_total", bulkhead=self.name)
+        logger.warning(f"Bulkhead '{self.name}' saturated for {self.queue_timeout}s, rejecting work")
+        raise BulkheadFullError(self.name, retry_after=max(1.0, self.queue_timeout))
+
+    def _publish(self):
+        """Caller holds the lock."""
+        metrics.set_gauge("bulkhead_active", self._active, bulkhead=self.name)
+        metrics.set_gauge("bulkhead_queued", self._queued, bulkhead=self.name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "queued": self._queued, "max_workers": self.max_workers}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Blocking Gemini calls: I/O waits, so many threads are cheap
+llm = Bulkhead("llm", settings.BULKHEAD_LLM_WORKERS, settings.BULKHEAD_LLM_QUEUE_TIMEOUT_SECONDS)
+# PDF extraction / OCR / rendering and MinHash: one thread per core is all that helps
+cpu = Bulkhead("cpu", settings.BULKHEAD_CPU_WORKERS or os.cpu_count() or 1,
+               settings.BULKHEAD_CPU_QUEUE_TIMEOUT_SECONDS)
+# Milvus searches / upserts / deletes (and the query embedding they start with)
+vector = Bulkhead("vector", settings.BULKHEAD_VECTOR_WORKERS, settings.BULKHEAD_VECTOR_QUEUE_TIMEOUT_SECONDS)
+
+ALL = (llm, cpu, vector)
+
+
+def stats() -> dict:
+    return {bulkhead.name: bulkhead.stats() for bulkhead in ALL}
+
+
+def shutdown():
+    for bulkhead in ALL:
+        bulkhead.shutdown()
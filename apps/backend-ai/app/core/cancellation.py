@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+
+class RequestCancelledError(BaseException):
+    """
+    The client of the current request has gone away. Like asyncio.CancelledError it derives
+    from BaseException, so the routes' `except Exception` fallbacks (500s, degraded parse
+    results) let it through; CancellationMiddleware ends the request quietly.
+    """
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request cancelled by the client (during {stage})")
+        self.stage = stage
+
+
+class CancellationToken:
+    """Thread-safe flag set once the client disconnects; polled at checkpoints by the pipeline."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def raise_if_cancelled(self, stage: str):
+        if self._event.is_set():
+            metrics.inc("cancelled_work_total", stage=stage)
+            raise RequestCancelledError(stage)
+
+    def sleep(self, seconds: float, stage: str = "backoff"):
+        """time.sleep that wakes up (and raises) as soon as the token is cancelled."""
+        if self._event.wait(seconds):
+            self.raise_if_cancelled(stage)
+
+
+# Set per request by CancellationMiddleware; copied onto the bulkhead threads with the context.
+# Work without a request (async tasks, warm-up) sees None and is never cancelled.
+_current: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    "cancellation_token", default=None
+)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current.get()
+
+
+def check_cancelled(stage: str):
+    """Checkpoint: raises RequestCancelledError if the current request's client is gone."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled(stage)
+
+
+def cancellable_sleep(seconds: float):
+    token = _current.get()
+    if token is None:
+        threading.Event().wait(seconds)
+    else:
+        token.sleep(seconds)
+
+
+class CancellationMiddleware:
+    """
+    Watches for the client disconnecting once the request body has been read, and cancels
+    the request's CancellationToken so its PDF extraction, Gemini calls and Milvus writes
+    stop at the next checkpoint instead of running to completion for nobody.
+    The disconnect is read by a watcher task; later receive() calls by the app (e.g.
+    StreamingResponse listening for the disconnect) get the same message.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = CancellationToken()
+        watcher: Optional[asyncio.Task] = None
+        response_complete = False
+
+        async def watch() -> Message:
+            message = await receive()
+            if message["type"] == "http.disconnect" and not response_complete:
+                token.cancel()
+                metrics.inc("requests_abandoned_total", path=scope["path"])
+            return message
+
+        async def watched_receive() -> Message:
+            nonlocal watcher
+            if watcher is not None:
+                # Body fully read: the only message left is the disconnect
+                return await asyncio.shield(watcher)
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.ensure_future(watch())
+            elif message["type"] == "http.disconnect":
+                token.cancel()
+                metrics.inc("requests_abandoned_total", path=scope["path"])
+            return message
+
+        async def tracked_send(message: Message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        reset = _current.set(token)
+        try:
+            await self.app(scope, watched_receive, tracked_send)
+        except RequestCancelledError as e:
+            # Nobody is left to answer
+            logger.info(f"{scope['path']}: {e}")
+        finally:
+            _current.reset(reset)
+            if watcher is not None and not watcher.done():
+                watcher.cancel()
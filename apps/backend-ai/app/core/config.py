@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load Environment Variables
@@ -6,10 +7,156 @@ load_dotenv()
 
 class Settings:
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    # Resilience policy for every Gemini call (see GeminiService._call)
+    GEMINI_MAX_ATTEMPTS: int = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+    GEMINI_RETRY_BASE_DELAY: float = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+    GEMINI_RETRY_MAX_DELAY: float = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8.0"))
+    GEMINI_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_DEADLINE_SECONDS", "120"))
+    GEMINI_EMBED_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_EMBED_DEADLINE_SECONDS", "15"))
+    GEMINI_BREAKER_FAILURES: int = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+    GEMINI_BREAKER_RESET_SECONDS: float = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+    # Extra generations allowed when structured output fails schema validation
+    GEMINI_STRUCTURED_MAX_REASKS: int = int(os.getenv("GEMINI_STRUCTURED_MAX_REASKS", "1"))
+    # Vision uploads are reused by content hash (the Files API keeps them for 48h)
+    GEMINI_FILE_CACHE_TTL_SECONDS: float = float(os.getenv("GEMINI_FILE_CACHE_TTL_SECONDS", "43200"))
+    GEMINI_FILE_CACHE_MAX_ENTRIES: int = int(os.getenv("GEMINI_FILE_CACHE_MAX_ENTRIES", "256"))
+    GEMINI_FILE_CLEANUP_INTERVAL_SECONDS: float = float(os.getenv("GEMINI_FILE_CLEANUP_INTERVAL_SECONDS", "300"))
+    # Shared prompt prefixes (e.g. one job's screening context) are cached server-side when at
+    # least this many tokens (Gemini's explicit-cache minimum); shorter ones rely on implicit caching
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "900"))
+    # Query embeddings kept in memory (LRU), see GeminiService.embed_text
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+    # Startup warm-up (see app.services.warmup); /ready reports unavailable until it is done
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    # Optional file of frequent recruiter queries (one per line) embedded into the cache at startup
+    WARMUP_QUERIES_FILE: str = os.getenv("WARMUP_QUERIES_FILE", "")
+    WARMUP_MAX_QUERIES: int = int(os.getenv("WARMUP_MAX_QUERIES", "200"))
+    # How long warm-up waits for the background Milvus connect before giving up on its search
+    WARMUP_MILVUS_WAIT_SECONDS: float = float(os.getenv("WARMUP_MILVUS_WAIT_SECONDS", "60"))
+    # Hedged requests (app.utils.hedging) for latency-sensitive idempotent calls: a call still running
+    # after the HEDGE_PERCENTILE latency of recent calls gets an identical second call, first answer
+    # wins. HEDGE_BUDGET caps hedges at that fraction of calls; no hedging before HEDGE_MIN_SAMPLES
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+    HEDGE_BUDGET: float = float(os.getenv("HEDGE_BUDGET", "0.1"))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05"))
+    HEDGE_WORKERS: int = int(os.getenv("HEDGE_WORKERS", "64"))
+    # Batch screening: resumes screened concurrently per request, and resumes per request
+    SCREENING_BATCH_CONCURRENCY: int = int(os.getenv("SCREENING_BATCH_CONCURRENCY", "8"))
+    SCREENING_BATCH_MAX_CANDIDATES: int = int(os.getenv("SCREENING_BATCH_MAX_CANDIDATES", "500"))
+    # Upload limits: request bodies are counted while streaming (early 413)
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    MAX_PDF_PAGES: int = int(os.getenv("MAX_PDF_PAGES", "30"))
+    # Uploads up to this size stay in memory, larger ones are spooled to disk
+    UPLOAD_SPOOL_BYTES: int = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+    # Extraction stops (and raw_text is cut) past this many characters
+    MAX_EXTRACTED_CHARS: int = int(os.getenv("MAX_EXTRACTED_CHARS", "100000"))
+    # Extracted texts kept by content hash (app.services.text_store), shared by the workers of one host;
+    # least recently used ones are evicted past TEXT_STORE_MAX_MB (compressed)
+    TEXT_STORE_DIR: str = os.getenv("TEXT_STORE_DIR", os.path.join(tempfile.gettempdir(), "ats-ai-texts"))
+    TEXT_STORE_MAX_MB: int = int(os.getenv("TEXT_STORE_MAX_MB", "1024"))
+    # CV text extraction: text layer -> local OCR (Tesseract) -> Gemini vision
+    MIN_EXTRACTED_CHARS: int = int(os.getenv("MIN_EXTRACTED_CHARS", "50"))
+    OCR_ENABLED: bool = os.getenv("OCR_ENABLED", "true").lower() == "true"
+    OCR_LANGUAGE: str = os.getenv("OCR_LANGUAGE", "eng+fra")
+    OCR_DPI: int = int(os.getenv("OCR_DPI", "200"))
+    # Pages with less text than this (and at least one image) are OCR'd
+    OCR_PAGE_MIN_CHARS: int = int(os.getenv("OCR_PAGE_MIN_CHARS", "20"))
+    # Minimum text_quality() for a page's OCR output to be kept
+    OCR_MIN_QUALITY: float = float(os.getenv("OCR_MIN_QUALITY", "0.6"))
+    # Image pages OCR could not read are sent to Gemini vision as JPEGs at this resolution
+    VISION_DPI: int = int(os.getenv("VISION_DPI", "150"))
+    VISION_JPEG_QUALITY: int = int(os.getenv("VISION_JPEG_QUALITY", "80"))
+    # Typed CVs with such pages: send them to vision along with the text (false: parse the text
+    # alone, the pages are dropped and counted in cv_image_pages_dropped_total)
+    VISION_FOR_IMAGE_PAGES: bool = os.getenv("VISION_FOR_IMAGE_PAGES", "true").lower() == "true"
+    TESSDATA_PREFIX: str = os.getenv("TESSDATA_PREFIX", "")
     MILVUS_HOST: str = os.getenv("MILVUS_HOST", "localhost")
     MILVUS_PORT: str = os.getenv("MILVUS_PORT", "19530")
+    MILVUS_CONNECT_TIMEOUT: float = float(os.getenv("MILVUS_CONNECT_TIMEOUT", "5"))
+    MILVUS_OPERATION_TIMEOUT: float = float(os.getenv("MILVUS_OPERATION_TIMEOUT", "10"))
+    MILVUS_RECONNECT_MIN_SECONDS: float = float(os.getenv("MILVUS_RECONNECT_MIN_SECONDS", "1"))
+    MILVUS_RECONNECT_MAX_SECONDS: float = float(os.getenv("MILVUS_RECONNECT_MAX_SECONDS", "30"))
+    MILVUS_BREAKER_FAILURES: int = int(os.getenv("MILVUS_BREAKER_FAILURES", "3"))
+    MILVUS_BREAKER_RESET_SECONDS: float = float(os.getenv("MILVUS_BREAKER_RESET_SECONDS", "15"))
     AI_SERVICE_PORT: int = int(os.getenv("PORT", "8000"))
-    COLLECTION_NAME: str = "candidate_profiles_v3"
-    DIMENSION: int = 768
+    # Response compression (app.core.middleware.CompressionMiddleware) from this body size up:
+    # Brotli when installed and accepted, gzip otherwise; SSE streams are never compressed
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+    # Production server (serve.py). WEB_CONCURRENCY=0 starts one worker per usable CPU
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    # Worker processes actually running, set by serve.py for its workers (1 under main.py / plain uvicorn)
+    SERVER_WORKER_PROCESSES: int = int(os.getenv("SERVER_WORKER_PROCESSES", "1"))
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    # Above the usual 60s load balancer idle timeout, so the balancer closes idle connections first
+    SERVER_KEEP_ALIVE_SECONDS: int = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "75"))
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "30"))
+    SERVER_ACCESS_LOG: bool = os.getenv("SERVER_ACCESS_LOG", "false").lower() == "true"
+    # Bulkheads (app.core.bulkhead): a thread pool per workload class, and how long work may
+    # wait for one of its threads before the request gets a 503. BULKHEAD_CPU_WORKERS=0: one per CPU
+    BULKHEAD_LLM_WORKERS: int = int(os.getenv("BULKHEAD_LLM_WORKERS", "32"))
+    BULKHEAD_LLM_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("BULKHEAD_LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+    BULKHEAD_CPU_WORKERS: int = int(os.getenv("BULKHEAD_CPU_WORKERS", "0"))
+    BULKHEAD_CPU_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("BULKHEAD_CPU_QUEUE_TIMEOUT_SECONDS", "30"))
+    BULKHEAD_VECTOR_WORKERS: int = int(os.getenv("BULKHEAD_VECTOR_WORKERS", "16"))
+    BULKHEAD_VECTOR_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("BULKHEAD_VECTOR_QUEUE_TIMEOUT_SECONDS", "5"))
+    # Admission control (app.core.admission): per expensive endpoint, requests past its concurrency
+    # and queue limits, or waiting longer than their lane's max wait, get a 429 with Retry-After
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_WAIT_SECONDS: float = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+    # Batch callers (X-Request-Priority: batch) retry with backoff, so they give up their place sooner
+    ADMISSION_BATCH_MAX_WAIT_SECONDS: float = float(os.getenv("ADMISSION_BATCH_MAX_WAIT_SECONDS", "1"))
+    # Overrides of the built-in limits: "/parse-cv=4:16,/match-job=32:64" (path=concurrent:queue, 0 = unlimited)
+    ADMISSION_LIMITS: str = os.getenv("ADMISSION_LIMITS", "")
+    # Worker recycling: restart after N requests (+ random jitter) or above an RSS limit (0 = off)
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    WORKER_MAX_RSS_MB: int = int(os.getenv("WORKER_MAX_RSS_MB", "2048"))
+    WORKER_MEMORY_CHECK_SECONDS: float = float(os.getenv("WORKER_MEMORY_CHECK_SECONDS", "10"))
+    COLLECTION_NAME: str = "candidate_profiles_v4"
+    # Dense embedding size: the model's 768 values, or fewer (e.g. 256 / 384) via output_dimensionality.
+    # Dimension and VECTOR_STORAGE are part of the schema: changing them moves to another collection
+    # (see MilvusService.collection_name), which must then be re-indexed
+    DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+    # "float32" or "float16" (half the memory, Milvus >= 2.4)
+    VECTOR_STORAGE: str = os.getenv("VECTOR_STORAGE", "float32").lower()
+    # Dense index: IVF_FLAT (exact vectors), IVF_SQ8 (1 byte per value) or IVF_PQ (VECTOR_PQ_M bytes
+    # per vector; 0 = one byte per 4 dimensions). Applies to newly created collections
+    VECTOR_INDEX_TYPE: str = os.getenv("VECTOR_INDEX_TYPE", "IVF_FLAT").upper()
+    VECTOR_INDEX_NLIST: int = int(os.getenv("VECTOR_INDEX_NLIST", "128"))
+    VECTOR_PQ_M: int = int(os.getenv("VECTOR_PQ_M", "0"))
+    # Max primary keys per `candidate_id in [...]` expression (deletes, embedding lookups);
+    # MILVUS_DELETE_BATCH_SIZE is its former name
+    MILVUS_EXPR_BATCH_SIZE: int = int(os.getenv("MILVUS_EXPR_BATCH_SIZE", os.getenv("MILVUS_DELETE_BATCH_SIZE", "500")))
+
+    # Sparse (BM25-style) lexical vectors stored next to the dense embedding
+    SPARSE_BM25_K1: float = float(os.getenv("SPARSE_BM25_K1", "1.2"))
+    SPARSE_BM25_B: float = float(os.getenv("SPARSE_BM25_B", "0.75"))
+    SPARSE_AVG_DOC_LENGTH: float = float(os.getenv("SPARSE_AVG_DOC_LENGTH", "300"))
+
+    # Async task API (submit / poll / callback) for long AI calls
+    ASYNC_TASK_WORKERS: int = int(os.getenv("ASYNC_TASK_WORKERS", "4"))
+    ASYNC_TASK_MAX_PENDING: int = int(os.getenv("ASYNC_TASK_MAX_PENDING", "100"))
+    ASYNC_TASK_RESULT_TTL_SECONDS: float = float(os.getenv("ASYNC_TASK_RESULT_TTL_SECONDS", "3600"))
+    # Task records shared by the worker processes of one host (empty: per process only)
+    ASYNC_TASK_STORE_DIR: str = os.getenv("ASYNC_TASK_STORE_DIR", os.path.join(tempfile.gettempdir(), "ats-ai-tasks"))
+    ASYNC_CALLBACK_ALLOWED_HOSTS: list = [
+        host.strip() for host in os.getenv("ASYNC_CALLBACK_ALLOWED_HOSTS", "localhost,127.0.0.1,backend-core").split(",")
+        if host.strip()
+    ]
+
+    # Near-duplicate detection (see app.services.dedup_service)
+    DEDUP_MINHASH_PERMUTATIONS: int = int(os.getenv("DEDUP_MINHASH_PERMUTATIONS", "128"))
+    DEDUP_LSH_BANDS: int = int(os.getenv("DEDUP_LSH_BANDS", "16"))
+    DEDUP_TEXT_MIN_SIMILARITY: float = float(os.getenv("DEDUP_TEXT_MIN_SIMILARITY", "0.8"))
+    DEDUP_EMBEDDING_MIN_SIMILARITY: float = float(os.getenv("DEDUP_EMBEDDING_MIN_SIMILARITY", "0.97"))
+    DEDUP_EMBEDDING_NEIGHBOURS: int = int(os.getenv("DEDUP_EMBEDDING_NEIGHBOURS", "10"))
+    # Larger LSH buckets are shared boilerplate (templates, disclaimers), not duplicates
+    DEDUP_MAX_BUCKET_SIZE: int = int(os.getenv("DEDUP_MAX_BUCKET_SIZE", "50"))
 
 settings = Settings()
@@ -0,0 +1,79 @@
+import logging
+import os
+import signal
+import sys
+import threading
+from typing import Callable, Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (0 when the platform does not expose it)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return 0
+    # Peak RSS: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _request_shutdown():
+    # Same path as `kill -TERM`: uvicorn drains connections, runs the lifespan shutdown and
+    # exits; with several workers the supervisor starts a replacement
+    signal.raise_signal(signal.SIGTERM)
+
+
+class MemoryWatchdog:
+    """
+    Recycles a worker whose RSS grows past `max_rss_bytes` (fragmentation, large PDFs) before
+    the container's memory limit gets the whole pod OOM-killed.
+    """
+
+    def __init__(self, max_rss_bytes: int, interval: float,
+                 on_exceeded: Callable[[], None] = _request_shutdown,
+                 rss: Callable[[], int] = current_rss_bytes):
+        self.max_rss_bytes = max_rss_bytes
+        self.interval = interval
+        self._on_exceeded = on_exceeded
+        self._rss = rss
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.triggered = False
+
+    def start(self):
+        if self.max_rss_bytes <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def check(self) -> bool:
+        """True (once) when the limit is exceeded and the shutdown has been requested."""
+        rss = self._rss()
+        metrics.set_gauge("worker_rss_bytes", rss)
+        if self.triggered or rss <= self.max_rss_bytes:
+            return False
+        self.triggered = True
+        logger.warning(
+            f"Worker {os.getpid()} RSS {rss / 2**20:.0f}MB above {self.max_rss_bytes / 2**20:.0f}MB, recycling"
+        )
+        metrics.inc("worker_memory_recycles_total")
+        self._on_exceeded()
+        return True
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            if self.check():
+                return
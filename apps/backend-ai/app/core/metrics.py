@@ -0,0 +1,82 @@
+import threading
+from typing import Dict, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters, gauges, summaries) rendered in the
+    Prometheus text format at /metrics. Values are per worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # [count, sum, max]
+        self._summaries: Dict[str, Dict[LabelKey, list]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def get(self, name: str, **labels) -> float:
+        key = _key(labels)
+        with self._lock:
+            for store in (self._counters, self._gauges):
+                if key in store.get(name, {}):
+                    return store[name][key]
+        return 0
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{_format_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_format_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self._summaries.items()):
+                lines.append(f"# TYPE {name} summary")
+                for k, (count, total, maximum) in series.items():
+                    lines.append(f"{name}_count{_format_labels(k)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(k)} {total}")
+                    lines.append(f"{name}_max{_format_labels(k)} {maximum}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,189 @@
+import json
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+from app.core.responses import accepts
+
+# Optional: Brotli is preferred over gzip when installed and accepted by the client
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Streamed as produced, never buffered for compression
+_UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream",)
+# Bodies from this size are compressed on a worker thread, not on the event loop
+_THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+class RequestTooLargeError(HTTPException):
+    """Raised from the request body stream; an HTTPException so FastAPI's body parsing re-raises it."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds the {max_bytes} byte limit")
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than `max_bytes` with 413 without buffering them:
+    up front from Content-Length, otherwise (chunked / lying clients) as soon as the
+    streamed byte count crosses the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    metrics.inc("request_rejected_too_large_total", check="content_length")
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    metrics.inc("request_rejected_too_large_total", check="stream")
+                    raise RequestTooLargeError(self.max_bytes)
+            return message
+
+        async def tracked_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestTooLargeError:
+            # Raised outside a route (e.g. by another middleware reading the body)
+            if response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send: Send):
+        body = json.dumps({"detail": f"Request body exceeds the {self.max_bytes} byte limit"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class BrotliResponder:
+    """
+    Brotli-encodes one response by wrapping its ASGI `send`. Single-message bodies under
+    `minimum_size`, already encoded responses and SSE streams are sent as is; streamed
+    bodies are compressed chunk by chunk (flushed, so each chunk reaches the client).
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.quality = quality
+        self.send: Send = None
+        # Held back until the first body message shows whether to compress
+        self.start_message: Message = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = "content-encoding" in headers \
+                or headers.get("content-type", "").startswith(_UNCOMPRESSED_CONTENT_TYPES)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            if not more_body and len(body) < self.minimum_size:
+                await self._send_start()
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = "br"
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = brotli.Compressor(quality=self.quality)
+            body = await self._compress(body, more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self._send_start()
+        else:
+            body = await self._compress(body, more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def _send_start(self):
+        if self.start_message is not None:
+            message, self.start_message = self.start_message, None
+            await self.send(message)
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= _THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Starlette's GZipMiddleware (bodies under `minimum_size`, SSE streams and already encoded
+    responses are sent as is; large bodies are compressed off the event loop), answering with
+    Brotli instead when the brotli package is installed and the client accepts `br`.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and brotli is not None \
+                and accepts(Headers(scope=scope).get("accept-encoding"), "br"):
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+            await responder(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
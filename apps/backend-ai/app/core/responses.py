@@ -0,0 +1,73 @@
+import contextvars
+from typing import Any, Optional
+
+from fastapi import Header
+from fastapi.responses import JSONResponse
+
+# Optional speed-ups: the service works (stdlib json, no msgpack) without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Set by negotiate_encoding for the current request
+_wants_msgpack: contextvars.ContextVar[bool] = contextvars.ContextVar("wants_msgpack", default=False)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (several times faster on large CV texts) when installed."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepts(header: Optional[str], value: str) -> bool:
+    """True when a comma-separated Accept / Accept-Encoding header lists `value` (wildcards aside) with q > 0."""
+    for item in (header or "").split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == value:
+            return _quality(params) > 0
+    return False
+
+
+async def negotiate_encoding(accept: Optional[str] = Header(None)):
+    """
+    Route dependency for bulk endpoints: `Accept: application/msgpack` switches the response
+    to MessagePack (when msgpack is installed). Async so the choice stays in the request's context.
+    """
+    _wants_msgpack.set(msgpack is not None and accepts(accept, MSGPACK_MEDIA_TYPE))
+
+
+class NegotiatedResponse(FastJSONResponse):
+    """Response class of bulk endpoints: JSON, or MessagePack for clients that asked for it."""
+
+    def __init__(self, content: Any, *args, **kwargs):
+        if _wants_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, *args, **kwargs)
+        # The body depends on Accept: caches must not serve one client's encoding to another
+        self.headers.add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
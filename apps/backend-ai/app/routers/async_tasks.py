@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header
+from fastapi.responses import JSONResponse
+from typing import Optional
+import hashlib
+import logging
+import os
+
+from app.core import bulkhead
+from app.core.responses import NegotiatedResponse, negotiate_encoding
+from app.schemas import ScreeningRequest
+from app.routers.candidates import screen_candidate, parse_cv_source, resolve_resume_text
+from app.services.gemini_file_cache import file_sha256
+from app.services.pdf_service import pdf_service
+from app.services.task_queue import task_queue, callback_allowed
+
+logger = logging.getLogger("uvicorn")
+
+router = APIRouter(
+    prefix="/async",
+    tags=["async"],
+    responses={404: {"description": "Not found"}},
+)
+
+def _check_callback(callback_url: Optional[str]):
+    if callback_url and not callback_allowed(callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host is not allowed")
+
+def _parse_cv_task(source):
+    """
+    parse_cv_source as a task. Its degraded results (Gemini unavailable, parsing error) fail
+    the task with 503 instead of being stored as successes: a resubmit of the same file then
+    runs again rather than getting the cached failure back for the whole result TTL.
+    """
+    result = parse_cv_source(source)
+    if "error" in result:
+        raise HTTPException(status_code=503, detail=f"CV parsing failed, please resubmit: {result['error']}")
+    return result
+
+def _accepted(record) -> JSONResponse:
+    status_url = f"/async/tasks/{record.task_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"task_id": record.task_id, "status": record.status, "status_url": status_url},
+        headers={"Location": status_url}
+    )
+
+@router.post("/screen-candidate", status_code=202)
+def submit_screen_candidate(request: ScreeningRequest, callback_url: Optional[str] = None,
+                            idempotency_key: Optional[str] = Header(None)):
+    """
+    Queues /screen-candidate. Identical requests (or the same Idempotency-Key) within the
+    result TTL return the existing task instead of calling the model again.
+    """
+    _check_callback(callback_url)
+    key = idempotency_key or hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+    if request.text_handle:
+        # Unknown handles get their 404 now rather than as a failed task
+        request = request.model_copy(update={"resume_text": resolve_resume_text(request), "text_handle": None})
+    record, _ = task_queue.submit(
+        "screen_candidate",
+        # Already on a task queue thread: skip the route's bulkhead wrapper
+        lambda: screen_candidate.__wrapped__(request),
+        idempotency_key=f"screen_candidate:{key}",
+        callback_url=callback_url
+    )
+    return _accepted(record)
+
+@router.post("/parse-cv", status_code=202)
+async def submit_parse_cv(file: UploadFile = File(...), callback_url: Optional[str] = None,
+                          idempotency_key: Optional[str] = Header(None)):
+    """Queues /parse-cv; the same file (or Idempotency-Key) is only parsed once per result TTL."""
+    _check_callback(callback_url)
+    # Reading / hashing the upload is CPU and disk work: on the CPU bulkhead, like /parse-cv
+    record = await bulkhead.cpu.run(_submit_parse_cv, file, callback_url, idempotency_key)
+    return _accepted(record)
+
+def _submit_parse_cv(file: UploadFile, callback_url: Optional[str], idempotency_key: Optional[str]):
+    source = pdf_service.load_upload(file)
+    created = False
+    try:
+        if idempotency_key:
+            key = idempotency_key
+        elif isinstance(source, str):
+            key = file_sha256(source)
+        else:
+            key = hashlib.sha256(source).hexdigest()
+
+        # parse_cv_source removes the temp file once it has run
+        record, created = task_queue.submit(
+            "parse_cv",
+            lambda: _parse_cv_task(source),
+            idempotency_key=f"parse_cv:{key}",
+            callback_url=callback_url
+        )
+    finally:
+        if not created and isinstance(source, str) and os.path.exists(source):
+            os.remove(source)
+    return record
+
+# Finished parse-cv tasks carry the full CV text: MessagePack on request
+@router.get("/tasks/{task_id}", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+def get_task(task_id: str):
+    """
+    Task status; once finished, `result` holds what the synchronous endpoint returns
+    (or `error` and the HTTP `status_code` it would have answered with).
+    """
+    record = task_queue.get(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Task not found or expired")
+    return record.to_dict()
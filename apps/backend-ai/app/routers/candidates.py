@@ -1,36 +1,47 @@
 import logging
 import json
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
 
 from app.schemas import (
-    ScreeningRequest, ScreeningResponse,
+    ScreeningRequest, ScreeningResponse, BatchScreeningRequest,
     CVParseResponse,
-    VectorizeRequest, SearchRequest
+    VectorizeRequest, SearchRequest, HybridSearchRequest,
+    DeleteCandidateRequest, BulkDeleteCandidatesRequest
 )
-from app.services.gemini_service import gemini_service
-from app.services.pdf_service import pdf_service
-from app.services.milvus_service import milvus_service
+from app.core import bulkhead
+from app.core.bulkhead import BulkheadFullError
+from app.core.cancellation import RequestCancelledError, check_cancelled
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.responses import NegotiatedResponse, negotiate_encoding
+from app.services.gemini_service import gemini_service, GeminiUnavailableError
+from app.services.pdf_service import pdf_service, PdfLimitError, PdfSource
+from app.services.milvus_service import milvus_service, MilvusUnavailableError
+from app.services.text_store import text_store, TextHandleNotFoundError
+from app.utils.sparse_encoder import encode_document, encode_query
+from app.utils.sse import format_sse
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
 
-@router.post("/screen-candidate")
-def screen_candidate(request: ScreeningRequest):
-    try:
-        # safely extract criteria
-        required = request.criteria.get('requiredSkills', [])
-        nice = request.criteria.get('niceToHaves', [])
-        weights = request.criteria.get('scoringWeights', { "skills": 0.7, "experience": 0.3 })
-        
-        prompt = f"""
-        Act as a strict Technical Recruiter. Evaluate this resume against specific criteria.
+def _screening_context(job_description: str, criteria: dict) -> str:
+    """The job half of the screening prompt: identical for every resume screened for the job."""
+    required = criteria.get('requiredSkills', [])
+    nice = criteria.get('niceToHaves', [])
+    weights = criteria.get('scoringWeights', { "skills": 0.7, "experience": 0.3 })
+
+    return f"""
+        Act as a strict Technical Recruiter. Evaluate the resume you are given against specific criteria.
         
         JOB DESCRIPTION CONTEXT:
-        {request.job_description[:5000]}
-
-        RESUME TEXT:
-        {request.resume_text[:100000]}
+        {(job_description or "")[:5000]}
         
         SCREENING CRITERIA:
         1. MUST HAVE SKILLS: {", ".join(required)}
@@ -49,46 +60,194 @@ def screen_candidate(request: ScreeningRequest):
         - Do NOT repeat phrases or sentences in the summary.
         - Be concise and professional.
         """
+
+def _stored_text(handle: str) -> str:
+    try:
+        return text_store.get(handle)
+    except TextHandleNotFoundError as e:
+        # Another host's handle, or evicted: the caller sends the text again
+        raise HTTPException(status_code=404, detail=str(e))
+
+def _store_text(text: str):
+    """Handle of the stored `text`, or None when it could not be stored (never fails the request)."""
+    if not text:
+        return None
+    try:
+        return text_store.put(text)
+    except OSError as e:
+        logger.warning(f"Text store write failed: {e}")
+        return None
+
+def resolve_resume_text(request) -> str:
+    """
+    Resume of a screening request: the stored text named by text_handle, or the text sent
+    (stored, so later screenings of the same resume can name it by its hash).
+    """
+    if request.text_handle:
+        return _stored_text(request.text_handle)
+    _store_text(request.resume_text)
+    return request.resume_text
+
+def _resume_prompt(resume_text: str) -> str:
+    return f"""
+        RESUME TEXT:
+        {resume_text[:100000]}
+        """
+
+@router.post("/screen-candidate")
+@bulkhead.llm.endpoint
+def screen_candidate(request: ScreeningRequest):
+    resume_text = resolve_resume_text(request)
+    try:
+        # Job context first: the shared prefix is what Gemini's prompt caching can reuse
+        prompt = _screening_context(request.job_description, request.criteria) + _resume_prompt(resume_text)
         
-        # Uses standard Gemini Service (2.5 Pro)
-        return gemini_service.generate_json(prompt)
+        # Uses standard Gemini Service (2.5 Pro), schema-constrained and validated
+        return gemini_service.generate_json(prompt, schema=ScreeningResponse)
         
+    except GeminiUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Screening Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/parse-cv")
+@router.post("/screen-candidates/batch")
+async def screen_candidates_batch(request: BatchScreeningRequest):
+    """
+    Screens many resumes against one job. The job context is sent once as a shared
+    (cached) system instruction and only the resume goes with each call; resumes are
+    screened SCREENING_BATCH_CONCURRENCY at a time, each call on the LLM bulkhead.
+    SSE events, in completion order: result {candidate_id, result}, error {candidate_id,
+    detail, status_code}, then done {screened, failed}.
+    """
+    if len(request.candidates) > settings.SCREENING_BATCH_MAX_CANDIDATES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.SCREENING_BATCH_MAX_CANDIDATES} candidates per batch"
+        )
+
+    def screen(model, candidate):
+        return gemini_service.generate_structured(_resume_prompt(resolve_resume_text(candidate)), ScreeningResponse, model=model)
+
+    def events():
+        started = time.perf_counter()
+        screened = failed = 0
+        try:
+            with gemini_service.shared_context(_screening_context(request.job_description, request.criteria)) as model, \
+                    ThreadPoolExecutor(max_workers=min(settings.SCREENING_BATCH_CONCURRENCY, bulkhead.llm.max_workers),
+                                       thread_name_prefix="screening") as executor:
+                futures = {
+                    # Each resume call carries the request context (its cancellation token) and runs on
+                    # the LLM bulkhead, so its limit covers batches too; the batch threads only wait
+                    executor.submit(contextvars.copy_context().run, bulkhead.llm.call, screen, model, candidate):
+                        candidate.candidate_id
+                    for candidate in request.candidates
+                }
+                try:
+                    for future in as_completed(futures):
+                        candidate_id = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            failed += 1
+                            logger.error(f"Batch Screening Error ({candidate_id}): {e}")
+                            if isinstance(e, HTTPException):
+                                detail, status_code = e.detail, e.status_code
+                            else:
+                                unavailable = isinstance(e, (GeminiUnavailableError, BulkheadFullError))
+                                detail, status_code = str(e), 503 if unavailable else 500
+                            yield format_sse("error", {
+                                "candidate_id": candidate_id,
+                                "detail": detail,
+                                "status_code": status_code
+                            })
+                            continue
+                        screened += 1
+                        yield format_sse("result", {"candidate_id": candidate_id, "result": result})
+                finally:
+                    # Client gone (generator closed): drop the resumes not started yet
+                    for future in futures:
+                        future.cancel()
+        except Exception as e:
+            logger.error(f"Batch Screening Error: {e}")
+            yield format_sse("error", {"detail": str(e)})
+            return
+
+        elapsed = time.perf_counter() - started
+        if request.candidates:
+            metrics.observe("screening_batch_seconds_per_candidate", elapsed / len(request.candidates))
+        yield format_sse("done", {"screened": screened, "failed": failed})
+
+    return StreamingResponse(
+        # The generator waits on the LLM bulkhead too; each resume call takes one more of its threads
+        bulkhead.llm.iterate(events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Bulk responses (the full CV text, result lists) can be negotiated to MessagePack
+@router.post("/parse-cv", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
 async def parse_cv(file: UploadFile = File(...)):
-    tmp_path = None
     try:
-        # 1. Save and Extract Text via PdfService (PyMuPDF)
-        # We need to handle the file saving manually here to pass path to PdfService or 
-        # let PdfService handle UploadFile?
-        # PdfService.extract_text_from_upload handles the temp file lifecycle for extraction
-        text = pdf_service.extract_text_from_upload(file)
-
-        # 2. OCR Fallback Logic
-        if len(text.strip()) < 50:
+        # Small uploads stay in memory, large ones are streamed to a temp file
+        source = await bulkhead.cpu.run(pdf_service.load_upload, file)
+    except BulkheadFullError:
+        raise
+    except Exception as e:
+        logger.error(f"Parse CV Error: {e}")
+        return {"skills": [], "summary": "Parsing failed", "error": str(e), "raw_text": ""}
+    try:
+        # Mostly waiting on Gemini; the PDF work inside goes to the CPU bulkhead
+        return await bulkhead.llm.run(parse_cv_source, source)
+    except (BulkheadFullError, RequestCancelledError):
+        # Rejected or dropped before it started, so nothing cleaned up the upload
+        if isinstance(source, str) and os.path.exists(source):
+            os.remove(source)
+        raise
+
+def _drop_image_pages(pages: List[int], reason: str):
+    """Logs and counts image pages left out of a parse (their content is missing from the result)."""
+    if pages:
+        logger.warning(f"Parsing CV without image pages {pages} ({reason})")
+        metrics.inc("cv_image_pages_dropped_total", len(pages))
+
+def parse_cv_source(source: PdfSource):
+    """
+    Parses a CV held in memory or in a temp file (removed afterwards).
+    Never raises for parsing problems: backend-core drops the application when parse-cv
+    fails, so errors come back as a degraded result. Only PdfLimitError becomes a 413.
+    """
+    vision_path = None
+    buffered = 0
+    try:
+        # 1. Per-page extraction via PdfService (PyMuPDF): text layer, local OCR for image pages
+        document = bulkhead.cpu.call(pdf_service.extract_document, source)
+        text = document.text
+        image_pages = document.unrecognized_image_pages
+        # Bytes this request holds in memory: the upload unless spooled to disk, plus its text
+        buffered = (0 if isinstance(source, str) else len(source)) + len(text)
+        if len(text.strip()) < settings.MIN_EXTRACTED_CHARS:
+            tier = "vision"
+        elif image_pages and settings.VISION_FOR_IMAGE_PAGES:
+            # Enough text, but some pages (e.g. a scanned page of experience) are still unread
+            tier = "text_vision"
+        else:
+            tier = "local_ocr" if document.ocr_used else "text"
+            _drop_image_pages(image_pages, "VISION_FOR_IMAGE_PAGES is off")
+
+        metrics.inc("cv_extraction_total", tier=tier)
+
+        # 2. Vision Fallback: not enough text even after local OCR
+        if tier == "vision":
             logger.info("Text extraction failed or too short. Triggering OCR Fallback with Gemini Vision...")
-            
-            try:
-                # We need the file again for Vision. 
-                # Since UploadFile is a stream, we might have consumed it?
-                # PdfService saves to temp, reads, then deletes. 
-                # Re-reading stream might fail if not seek(0).
-                await file.seek(0)
-                
-                # Create a temp file again for Gemini Upload
-                # (Ideally PdfService could return the path? But it deletes it for safety)
-                # Let's simple create a temp file here for Vision
-                import tempfile
-                import shutil
-                import os
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    shutil.copyfileobj(file.file, tmp)
-                    tmp_path = tmp.name
 
+            # Only the pages OCR could not read, downscaled; the original file if there are none
+            if image_pages:
+                vision_path = bulkhead.cpu.call(pdf_service.render_pages, source, image_pages, dpi=settings.VISION_DPI)
+            else:
+                vision_path = pdf_service.to_path(source)
+
+            try:
                 prompt = """
                 You are an expert HR AI. Look at this document image and extract the resume data into JSON.
                 
@@ -97,84 +256,110 @@ async def parse_cv(file: UploadFile = File(...)):
                 - summary (string)
                 - experience_years (int)
                 - education_level (string)
+                - location (string, city / country if present)
                 
                 Output strictly valid JSON.
                 """
                 
-                parsed_data = gemini_service.generate_with_vision(prompt, tmp_path)
+                parsed_data = gemini_service.generate_with_vision(prompt, vision_path, schema=CVParseResponse)
                 parsed_data["raw_text"] = "OCR_EXTRACTED" 
                 return parsed_data
                 
             except Exception as e:
                 logger.error(f"OCR Fallback Error: {e}")
                 raise e
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
 
-        # 3. Text Analysis (Standard)
-        prompt_text = text[:500000]
+        # 3. Text + the pages OCR could not read, in one vision call
+        if tier == "text_vision":
+            vision_path = bulkhead.cpu.call(pdf_service.render_pages, source, image_pages, dpi=settings.VISION_DPI)
+            prompt = f"""
+            You are an expert HR AI. Analyze this resume and extract the resume data into JSON.
+            Text of the typed pages: {text}
+            The attached document holds the other pages of the same resume (scans); read them too.
+
+            EXTRACT:
+            - skills (list of strings)
+            - summary (string)
+            - experience_years (int)
+            - education_level (string)
+            - location (string, city / country if present)
+
+            Output strictly valid JSON.
+            """
+            try:
+                parsed_data = gemini_service.generate_with_vision(prompt, vision_path, schema=CVParseResponse)
+                parsed_data["raw_text"] = text
+                parsed_data["text_handle"] = _store_text(text)
+                return parsed_data
+            except (BulkheadFullError, RequestCancelledError):
+                raise
+            except Exception as e:
+                # The typed pages alone still give a usable parse
+                _drop_image_pages(image_pages, f"vision failed: {e}")
+
+        # 4. Text Analysis (Standard)
+        # Already capped at MAX_EXTRACTED_CHARS by PdfService
         prompt = f"""
         You are an expert HR AI. Analyze this resume text and extract the resume data into JSON.
-        Text: {prompt_text} 
+        Text: {text} 
         
         EXTRACT:
         - skills (list of strings)
         - summary (string)
         - experience_years (int)
         - education_level (string)
+        - location (string, city / country if present)
         
         Output strictly valid JSON.
         """
         
-        # Use Flash model for fast extraction (which is now encapsulated or we use standard generate_json)
-        # generate_json uses model_pro (2.5 Pro). For parsing, Pro is good.
-        # Original code used 2.5 Flash for parsing. 
-        # Let's add explicit model choice to service later or just use Pro for quality.
-        # User asked for same models. Parsing used 'gemini-2.5-flash'.
-        # I should probably expose `generate_fast` in service or just use Pro (better).
-        # Let's use Pro for now as it's safer for JSON, or I can update Service to support model choice.
-        # actually gemini_service.model_pro is 2.5-pro. 
-        # Using Pro for extracting data is safer.
-        
-        parsed_data = gemini_service.generate_json(prompt)
+        try:
+            parsed_data = gemini_service.generate_json(prompt, schema=CVParseResponse)
+        except GeminiUnavailableError as e:
+            # Degraded: keep the extracted text so the candidate can still be indexed / re-parsed later
+            logger.warning(f"Parse CV degraded: {e}")
+            return {"skills": [], "summary": "Parsing failed", "error": str(e), "raw_text": text,
+                    "text_handle": _store_text(text)}
         parsed_data["raw_text"] = text
+        # Later screening / vectorizing requests can name the text instead of sending it back
+        parsed_data["text_handle"] = _store_text(text)
         
         return parsed_data
 
+    except BulkheadFullError:
+        # Overloaded, not a parsing problem: 503 so the caller retries
+        raise
+    except PdfLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Parse CV Error: {e}")
         return {"skills": [], "summary": "Parsing failed", "error": str(e), "raw_text": ""}
+    finally:
+        metrics.observe("parse_cv_buffered_bytes", buffered)
+        for path in (source, vision_path):
+            if isinstance(path, str) and os.path.exists(path):
+                os.remove(path)
 
 @router.post("/vectorize-candidate")
+@bulkhead.vector.endpoint
 def vectorize_candidate(request: VectorizeRequest):
+    # Fail fast before paying for the embedding call
+    milvus_service.ensure_available()
+    text = request.text
+    if request.text_handle:
+        stored = _stored_text(request.text_handle)
+        text = f"{text}\n{stored}" if text else stored
     try:
-        # Generate Vector
-        vector = gemini_service.embed_text(request.text, title="Candidate Profile")
-        
-        # Upsert to Milvus
-        milvus_service.upsert_candidate(
-            request.candidate_id, 
-            vector, 
-            metadata={
-                "location": request.location,
-                "experience": request.experience,
-                # location_tokens handled inside service? verify
-                # Service expects raw metadata and handles tokenization?
-                # Let's check milvus_service... yes `loc_tokens = metadata.get("location_tokens", [])`
-                # So we need to tokenize here.
-            }
-        )
-        
-        # Wait, MilvusService code I wrote:
-        # loc_tokens = metadata.get("location_tokens", [])
-        # usage: `loc_tokens = [t.strip() for t in re.split(r'[, ]+', raw_loc.lower()) if t.strip()]`
-        # So I need to pass it.
-        import re
+        # Generate Vectors (dense semantic + sparse lexical)
+        vector = gemini_service.embed_text(text, title="Candidate Profile")
+        sparse_vector = encode_document(text)
+
         raw_loc = request.location or "Unknown"
         loc_tokens = [t.strip() for t in re.split(r'[, ]+', raw_loc.lower()) if t.strip()]
 
-        # Re-call upsert with tokens
+        # The caller retries a request it gave up on: no write for this one
+        check_cancelled("milvus_write")
+        # Upsert to Milvus
         milvus_service.upsert_candidate(
             request.candidate_id, 
             vector, 
@@ -182,45 +367,115 @@ def vectorize_candidate(request: VectorizeRequest):
                 "location": request.location,
                 "experience": request.experience,
                 "location_tokens": loc_tokens
-            }
+            },
+            sparse_vector=sparse_vector
         )
         
         return {"status": "indexed", "id": request.candidate_id}
+    except (MilvusUnavailableError, GeminiUnavailableError):
+        raise
     except Exception as e:
         logger.error(f"Vectorize Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/search-candidates")
+@router.post("/delete-candidate")
+@bulkhead.vector.endpoint
+def delete_candidate(request: DeleteCandidateRequest):
+    # Idempotent: deleting an unknown / already deleted candidate succeeds,
+    # so the core's delete-index job does not retry forever.
+    try:
+        milvus_service.delete_candidates([request.candidate_id])
+        return {"status": "deleted", "id": request.candidate_id}
+    except MilvusUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Delete Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/delete-candidates")
+@bulkhead.vector.endpoint
+def delete_candidates(request: BulkDeleteCandidatesRequest):
+    try:
+        count = milvus_service.delete_candidates(request.candidate_ids)
+        return {"status": "deleted", "count": count}
+    except MilvusUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk Delete Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _build_filter_expr(location, min_experience):
+    expr_parts = []
+    if location:
+        loc_term = location.lower().strip()
+        # json.dumps quotes/escapes the term for the Milvus expression
+        expr_parts.append(f'array_contains(location_tokens, {json.dumps(loc_term)})')
+        
+    if min_experience is not None:
+        expr_parts.append(f'experience >= {int(min_experience)}')
+        
+    return " && ".join(expr_parts) if expr_parts else None
+
+def _format_matches(results):
+    matches = []
+    for hits in results:
+        for hit in hits:
+            matches.append({
+                "candidate_id": hit.id, 
+                "score": hit.distance,
+                "location": hit.entity.get("location"),
+                "experience": hit.entity.get("experience")
+            })
+    return matches
+
+@router.post("/search-candidates", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+@bulkhead.vector.endpoint
 def search_candidates(request: SearchRequest):
+    milvus_service.ensure_available()
     try:
         # Generate Query Vector
         query_vector = gemini_service.embed_text(request.query, task_type="retrieval_query")
         
-        # Build Filter Expr
-        expr_parts = []
-        if request.location:
-            loc_term = request.location.lower().strip()
-            expr_parts.append(f'array_contains(location_tokens, "{loc_term}")')
-            
-        if request.min_experience is not None:
-            expr_parts.append(f'experience >= {request.min_experience}')
-            
-        expr = " && ".join(expr_parts) if expr_parts else None
+        expr = _build_filter_expr(request.location, request.min_experience)
         
         # Search
         results = milvus_service.search(query_vector, limit=request.limit, expr=expr)
-        
-        matches = []
-        for hits in results:
-            for hit in hits:
-                matches.append({
-                    "candidate_id": hit.id, 
-                    "score": hit.distance,
-                    "location": hit.entity.get("location"),
-                    "experience": hit.entity.get("experience")
-                })
-        return {"matches": matches}
+        return {"matches": _format_matches(results)}
 
+    except (MilvusUnavailableError, GeminiUnavailableError):
+        raise
     except Exception as e:
         logger.error(f"Search Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/hybrid-search-candidates", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+@bulkhead.vector.endpoint
+def hybrid_search_candidates(request: HybridSearchRequest):
+    """
+    Single round trip keyword + semantic search. Fusion (RRF or weighted) runs inside Milvus,
+    so the caller gets one ranked list instead of merging two over-fetched ones.
+    Score is the fused score (higher is better).
+    """
+    milvus_service.ensure_available()
+    try:
+        query_vector = gemini_service.embed_text(request.query, task_type="retrieval_query")
+        sparse_vector = encode_query(request.query)
+        expr = _build_filter_expr(request.location, request.min_experience)
+
+        results = milvus_service.hybrid_search(
+            query_vector,
+            sparse_vector,
+            limit=request.limit,
+            offset=request.offset,
+            expr=expr,
+            fusion=request.fusion,
+            rrf_k=request.rrf_k,
+            weights=(request.dense_weight, request.sparse_weight)
+        )
+        return {"matches": _format_matches(results)}
+
+    except (MilvusUnavailableError, GeminiUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"Hybrid Search Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException
+import logging
+import time
+
+from app.core import bulkhead
+from app.core.bulkhead import BulkheadFullError
+from app.core.responses import NegotiatedResponse, negotiate_encoding
+from app.schemas import DeduplicateRequest, DeduplicateResponse
+from app.services.dedup_service import DedupIndexChangedError, DedupMultiWorkerError, dedup_service, find_embedding_matches
+from app.services.milvus_service import MilvusUnavailableError
+
+logger = logging.getLogger("uvicorn")
+
+router = APIRouter(
+    prefix="/deduplication",
+    tags=["deduplication"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.post("/candidates", response_model=DeduplicateResponse,
+             response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+async def deduplicate_candidates(request: DeduplicateRequest):
+    """
+    Adds a batch of candidates to the duplicate index and returns every duplicate cluster
+    the batch belongs to (including members indexed by earlier calls).
+    Full scan: send all candidates in batches, the first with reset_index=true and the
+    others with the index_id of the previous response (409 when the index was rebuilt
+    meanwhile, e.g. by a restart: start the scan again).
+    Incremental: send only the new candidates; needs_full_scan=true means there was no
+    index to match them against.
+    """
+    try:
+        started = time.perf_counter()
+        index, batch_ids, needs_full_scan = await bulkhead.cpu.run(
+            dedup_service.index_batch,
+            request.candidates,
+            reset_index=request.reset_index,
+            index_id=request.index_id,
+            excluded_pairs=request.excluded_pairs
+        )
+        matches = []
+        if request.use_embeddings and batch_ids:
+            # Milvus round trips, outside the index lock
+            matches = await bulkhead.vector.run(find_embedding_matches, batch_ids)
+        result = await bulkhead.cpu.run(dedup_service.finish_batch, index, batch_ids, matches, needs_full_scan)
+        logger.info(
+            f"Dedup batch of {len(request.candidates)}: {len(result['clusters'])} clusters, "
+            f"{result['indexed']} indexed, {time.perf_counter() - started:.2f}s"
+        )
+        return result
+    except DedupIndexChangedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DedupMultiWorkerError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except (MilvusUnavailableError, BulkheadFullError):
+        raise
+    except Exception as e:
+        logger.error(f"Deduplication Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
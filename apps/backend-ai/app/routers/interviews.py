@@ -1,22 +1,21 @@
 import logging
-import google.generativeai as genai
 from fastapi import APIRouter
-import json
+
+from app.core import bulkhead
 
 from app.schemas import (
     InterviewAnalysisRequest, InterviewAnalysisResponse,
     GenerateQuestionsRequest, GenerateQuestionsResponse
 )
-from app.utils.json_parser import clean_and_parse_json
+from app.services.gemini_service import gemini_service, EmptyResponseError
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
 
 @router.post("/analyze-interview")
+@bulkhead.llm.endpoint
 def analyze_interview(request: InterviewAnalysisRequest):
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
         req_list = ", ".join(request.requirements) if request.requirements else "General Fit"
 
         prompt = f"""
@@ -42,26 +41,20 @@ def analyze_interview(request: InterviewAnalysisRequest):
         - Output strictly valid JSON.
         """
         
-        response = model.generate_content(
+        return gemini_service.generate_structured(
             prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json",
-                response_schema=InterviewAnalysisResponse,
-                max_output_tokens=4096, 
-                temperature=0.7
-            )
+            InterviewAnalysisResponse,
+            max_output_tokens=4096,
+            temperature=0.7
         )
-
-        if not response.parts:
-            logger.warning(f"AI Response blocked or empty. Finish Reason: {response.candidates[0].finish_reason}")
-            return {
-                "rating": 0,
-                "pros": [],
-                "cons": [],
-                "summary": "AI Analysis could not be completed. The model returned an empty response (likely due to safety filters or token limits)."
-            }
-
-        return clean_and_parse_json(response.text)
+    except EmptyResponseError as e:
+        logger.warning(str(e))
+        return {
+            "rating": 0,
+            "pros": [],
+            "cons": [],
+            "summary": "AI Analysis could not be completed. The model returned an empty response (likely due to safety filters or token limits)."
+        }
     except Exception as e:
         logger.error(f"Interview Analysis Error: {e}")
         return {
@@ -72,10 +65,9 @@ def analyze_interview(request: InterviewAnalysisRequest):
             }
 
 @router.post("/generate-interview-questions")
+@bulkhead.llm.endpoint
 def generate_interview_questions(request: GenerateQuestionsRequest):
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
         skills_str = ", ".join(request.skills) if request.skills else "General"
         
         prompt = f"""
@@ -95,25 +87,19 @@ def generate_interview_questions(request: GenerateQuestionsRequest):
         Questions should be challenging but fair.
         """
         
-        response = model.generate_content(
+        return gemini_service.generate_structured(
             prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json",
-                response_schema=GenerateQuestionsResponse,
-                max_output_tokens=2048,
-                temperature=0.8
-            )
+            GenerateQuestionsResponse,
+            max_output_tokens=2048,
+            temperature=0.8
         )
-        
-        if not response.parts:
-            return {
-                "role_specific": [],
-                "behavioral": [],
-                "red_flags": []
-            }
-            
-        return clean_and_parse_json(response.text)
 
+    except EmptyResponseError:
+        return {
+            "role_specific": [],
+            "behavioral": [],
+            "red_flags": []
+        }
     except Exception as e:
         logger.error(f"Question Generation Error: {e}")
         return {
@@ -1,130 +1,201 @@
 import logging
-import google.generativeai as genai
-from fastapi import APIRouter, HTTPException
-from pymilvus import Collection
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
+from app.core import bulkhead
+from app.core.responses import NegotiatedResponse, negotiate_encoding
 from app.schemas import (
     JobGenRequest, MatchJobRequest, SectionGenRequest, ScorecardGenRequest,
-    RejectionGenRequest, RejectionEmailResponse
+    RejectionGenRequest, RejectionEmailResponse, ScorecardResponse, JobDescriptionResponse
 )
+from app.services.gemini_service import gemini_service, genai, GeminiUnavailableError
+from app.services.milvus_service import milvus_service, MilvusUnavailableError
+from app.utils.gemini_schema import to_gemini_schema
 from app.utils.json_parser import clean_and_parse_json
-from app.core.config import settings
+from app.utils.json_stream import JsonFieldStream, EVENT_DELTA
+from app.utils.sse import format_sse
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
 
-def get_milvus_collection():
-    from pymilvus import utility
-    if utility.has_collection(settings.COLLECTION_NAME):
-        return Collection(settings.COLLECTION_NAME)
-    return None
+def _job_description_prompt(request: JobGenRequest) -> str:
+    json_structure = """
+    Output strictly valid JSON with this structure:
+    {
+        "description": "Full markdown job description (or empty string)",
+        "summary": "Brief summary",
+        "responsibilities": ["list", "of", "strings"],
+        "requirements": ["list", "of", "strings"],
+        "salary_range": {"min": 1000, "max": 2000}
+    }
+    """
 
-@router.post("/generate-job-description")
-def generate_job_desc(request: JobGenRequest):
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro') 
+    if request.template_mode:
+        return f"""
+        Act as a Senior Technical Recruiter. 
+        Extract specific job details for a template. Do NOT write a full job description text.
         
-        json_structure = """
-        Output strictly valid JSON with this structure:
-        {
-            "description": "Full markdown job description (or empty string)",
-            "summary": "Brief summary",
-            "responsibilities": ["list", "of", "strings"],
-            "requirements": ["list", "of", "strings"],
-            "salary_range": {"min": 1000, "max": 2000}
-        }
+        JOB TITLE: {request.title}
+        TONE: {request.tone}
+        HIRING NOTES: "{request.notes}"
+        COMPANY CONTEXT: "{request.company_description}"
+
+        INSTRUCTIONS:
+        - Populate 'summary' with a brief role overview.
+        - Populate 'responsibilities' with a list of key duties.
+        - Populate 'requirements' with a list of skills.
+        - Populate 'salary_range' with an estimated range.
+        - Leave 'description' empty as we are in template mode.
+        
+        {json_structure}
         """
 
-        if request.template_mode:
-            prompt = f"""
-            Act as a Senior Technical Recruiter. 
-            Extract specific job details for a template. Do NOT write a full job description text.
-            
-            JOB TITLE: {request.title}
-            TONE: {request.tone}
-            HIRING NOTES: "{request.notes}"
-            COMPANY CONTEXT: "{request.company_description}"
-
-            INSTRUCTIONS:
-            - Populate 'summary' with a brief role overview.
-            - Populate 'responsibilities' with a list of key duties.
-            - Populate 'requirements' with a list of skills.
-            - Populate 'salary_range' with an estimated range.
-            - Leave 'description' empty as we are in template mode.
-            
-            {json_structure}
-            """
-        else:
-            prompt = f"""
-            Act as a Senior Technical Recruiter. Create a structured job posting.
-            
-            JOB TITLE: {request.title}
-            TONE: {request.tone}
-            HIRING NOTES: "{request.notes}"
-            COMPANY CONTEXT: "{request.company_description}"
-
-            INSTRUCTIONS:
-            - Write a full markdown job description in the 'description' field.
-            - Also extract 'requirements' and 'salary_range' into their respective fields.
-            - You can leave 'summary' and 'responsibilities' empty if the full description covers it.
-            
-            {json_structure}
-            """
-            
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json"
-            )
-        )
-        return clean_and_parse_json(response.text)
+    return f"""
+    Act as a Senior Technical Recruiter. Create a structured job posting.
+    
+    JOB TITLE: {request.title}
+    TONE: {request.tone}
+    HIRING NOTES: "{request.notes}"
+    COMPANY CONTEXT: "{request.company_description}"
+
+    INSTRUCTIONS:
+    - Write a full markdown job description in the 'description' field.
+    - Also extract 'requirements' and 'salary_range' into their respective fields.
+    - You can leave 'summary' and 'responsibilities' empty if the full description covers it.
+    
+    {json_structure}
+    """
+
+def _section_prompt(request: SectionGenRequest) -> str:
+    section_map = {
+        'SUMMARY': "Write a professional 2-3 sentence role summary.",
+        'RESPONSIBILITIES': "Write a bulleted list of 5 key responsibilities.",
+        'REQUIREMENTS': "Write a bulleted list of 5 key technical requirements and soft skills.",
+        'LEGAL': "Write a standard equal opportunity employer disclaimer."
+    }
+    
+    instruction = section_map.get(request.section_type, "Write content for this section.")
+    
+    skills_instruction = ""
+    if request.skills:
+        skills_list = ", ".join(request.skills)
+        skills_instruction = f"CRITICAL: You MUST include the following required skills in the text: {skills_list}."
+
+    return f"""
+    Act as a Senior Recruiter.
+    JOB TITLE: {request.job_title}
+    TONE: {request.tone}
+    CONTEXT: {request.context}
+    
+    TASK: {instruction}
+    {skills_instruction}
+    
+    Output ONLY the content (no markdown headers like ##).
+    """
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        # Each chunk is pulled on the LLM bulkhead rather than the shared threadpool
+        bulkhead.llm.iterate(events),
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so each event is flushed as it is produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/generate-job-description")
+@bulkhead.llm.endpoint
+def generate_job_desc(request: JobGenRequest):
+    try:
+        return gemini_service.generate_structured(_job_description_prompt(request), JobDescriptionResponse)
+    except GeminiUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Generation Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-job-description/stream")
+@bulkhead.llm.endpoint
+def generate_job_desc_stream(request: JobGenRequest):
+    """
+    SSE variant of /generate-job-description. Events:
+    token {field, text} as string fields are written, field {name, value} as each field
+    completes, then done {JobDescriptionResponse} or error {detail}.
+    """
+    generation_config = genai.GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=to_gemini_schema(JobDescriptionResponse),
+        max_output_tokens=8192,
+        temperature=0.3
+    )
+    try:
+        chunks = gemini_service.stream_content(_job_description_prompt(request), generation_config=generation_config)
+    except GeminiUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Generation Stream Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def events():
+        parser = JsonFieldStream()
+        try:
+            for chunk in chunks:
+                for kind, name, value in parser.feed(chunk):
+                    if kind == EVENT_DELTA:
+                        yield format_sse("token", {"field": name, "text": value})
+                    else:
+                        yield format_sse("field", {"name": name, "value": value})
+            data = parser.fields if parser.done else clean_and_parse_json(parser.text)
+            result = JobDescriptionResponse.model_validate(data)
+            yield format_sse("done", result.model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Generation Stream Error: {e}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return _sse_response(events())
+
 @router.post("/generate-template-section")
+@bulkhead.llm.endpoint
 def generate_template_section(request: SectionGenRequest):
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
-        section_map = {
-            'SUMMARY': "Write a professional 2-3 sentence role summary.",
-            'RESPONSIBILITIES': "Write a bulleted list of 5 key responsibilities.",
-            'REQUIREMENTS': "Write a bulleted list of 5 key technical requirements and soft skills.",
-            'LEGAL': "Write a standard equal opportunity employer disclaimer."
-        }
-        
-        instruction = section_map.get(request.section_type, "Write content for this section.")
-        
-        skills_instruction = ""
-        if request.skills:
-            skills_list = ", ".join(request.skills)
-            skills_instruction = f"CRITICAL: You MUST include the following required skills in the text: {skills_list}."
-
-        prompt = f"""
-        Act as a Senior Recruiter.
-        JOB TITLE: {request.job_title}
-        TONE: {request.tone}
-        CONTEXT: {request.context}
-        
-        TASK: {instruction}
-        {skills_instruction}
-        
-        Output ONLY the content (no markdown headers like ##).
-        """
-        
-        response = model.generate_content(prompt)
+        # Short and interactive: hedged against Gemini's latency tail
+        response = gemini_service.generate_content(_section_prompt(request), hedge="template_section")
         return {"content": response.text.strip()}
         
+    except GeminiUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Section Gen Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-template-section/stream")
+@bulkhead.llm.endpoint
+def generate_template_section_stream(request: SectionGenRequest):
+    """SSE variant of /generate-template-section: token {text} events, then done {content} or error {detail}."""
+    try:
+        chunks = gemini_service.stream_content(_section_prompt(request))
+    except GeminiUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Section Gen Stream Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def events():
+        content = []
+        try:
+            for chunk in chunks:
+                content.append(chunk)
+                yield format_sse("token", {"text": chunk})
+            yield format_sse("done", {"content": "".join(content).strip()})
+        except Exception as e:
+            logger.error(f"Section Gen Stream Error: {e}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return _sse_response(events())
+
 @router.post("/generate-scorecard")
+@bulkhead.llm.endpoint
 def generate_scorecard(request: ScorecardGenRequest):
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
         prompt = f"""
         Act as a Hiring Manager. Create a screening scorecard for the role: "{request.role_title}".
         
@@ -143,53 +214,36 @@ def generate_scorecard(request: ScorecardGenRequest):
         1. Weights MUST sum exactly to 1.0.
         """
         
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json"
-            )
-        )
-        return clean_and_parse_json(response.text)
+        return gemini_service.generate_structured(prompt, ScorecardResponse)
         
+    except GeminiUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Scorecard Gen Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/match-job")
+@router.post("/match-job", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+@bulkhead.vector.endpoint
 def match_job(request: MatchJobRequest):
-    collection = get_milvus_collection()
-    if not collection:
-        raise HTTPException(status_code=503, detail="Vector Database unavailable.")
+    milvus_service.ensure_available()
 
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=request.job_description,
-            task_type="retrieval_query" 
-        )
-        query_vector = result['embedding']
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = collection.search(
-            data=[query_vector], 
-            anns_field="embedding", 
-            param=search_params, 
-            limit=request.limit,
-            offset=request.offset,
-            output_fields=["candidate_id"] 
-        )
+        query_vector = gemini_service.embed_text(request.job_description, task_type="retrieval_query")
+        results = milvus_service.search(query_vector, limit=request.limit, offset=request.offset)
         matches = []
         for hits in results:
             for hit in hits:
                 matches.append({"candidate_id": hit.id, "score": hit.distance})
         return {"matches": matches}
+    except (MilvusUnavailableError, GeminiUnavailableError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/generate-rejection-email")
+@bulkhead.llm.endpoint
 def generate_rejection_email(request: RejectionGenRequest):
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
         prompt = f"""
         Act as a compassionate and professional Recruiter at a top tech company.
         Write a rejection email for a candidate.
@@ -212,14 +266,7 @@ def generate_rejection_email(request: RejectionGenRequest):
            - Wish them luck.
         """
         
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json",
-                response_schema=RejectionEmailResponse
-            )
-        )
-        return clean_and_parse_json(response.text)
+        return gemini_service.generate_structured(prompt, RejectionEmailResponse)
         
     except Exception as e:
         logger.error(f"Rejection Gen Error: {e}")
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel
 from typing import List, Optional
-from app.services.gemini_service import gemini_service
+from app.core import bulkhead
+from app.services.gemini_service import gemini_service, GeminiUnavailableError
 import logging
 
 logger = logging.getLogger("uvicorn")
@@ -23,7 +24,8 @@ class TaskSuggestion(BaseModel):
     dueInDays: int
 
 @router.post("/suggest", response_model=List[TaskSuggestion])
-async def suggest_tasks(request: TaskSuggestionRequest):
+@bulkhead.llm.endpoint
+def suggest_tasks(request: TaskSuggestionRequest):
     try:
         prompt = f"""
         You are an expert AI recruiting assistant.
@@ -42,14 +44,12 @@ async def suggest_tasks(request: TaskSuggestionRequest):
         ]
         """
         
-        response = gemini_service.generate_json(prompt)
-        
-        # Validate/Filter if needed, but for now trust the AI's JSON structure
-        if isinstance(response, list):
-            return response
-        else:
-            return []
+        # Schema-constrained and validated against TaskSuggestion
+        return gemini_service.generate_json(prompt, schema=List[TaskSuggestion])
             
+    except GeminiUnavailableError:
+        # Suggestions are optional; degrade to none while the model is unavailable
+        return []
     except Exception as e:
         logger.error(f"Task Suggestion Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 
 # --- Request Schemas ---
 
@@ -12,10 +12,18 @@ class JobGenRequest(BaseModel):
 
 class VectorizeRequest(BaseModel):
     candidate_id: str
-    text: str
+    text: str = ""
+    # Stored text (see /parse-cv) appended to `text`; unknown handles get a 404
+    text_handle: Optional[str] = None
     location: Optional[str] = "Unknown"
     experience: Optional[int] = 0
 
+class DeleteCandidateRequest(BaseModel):
+    candidate_id: str
+
+class BulkDeleteCandidatesRequest(BaseModel):
+    candidate_ids: List[str]
+
 class SearchRequest(BaseModel):
     query: str
     limit: int = 5
@@ -23,6 +31,49 @@ class SearchRequest(BaseModel):
     location: Optional[str] = None
     min_experience: Optional[int] = None
 
+class HybridSearchRequest(SearchRequest):
+    fusion: Literal["rrf", "weighted"] = "rrf"
+    rrf_k: int = 60
+    dense_weight: float = 0.5
+    sparse_weight: float = 0.5
+
+class DedupCandidate(BaseModel):
+    candidate_id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    linkedin_url: Optional[str] = None
+    text: Optional[str] = None  # resume text
+
+class DeduplicateRequest(BaseModel):
+    candidates: List[DedupCandidate]
+    # Start a new full scan (drops the index built by previous calls)
+    reset_index: bool = False
+    # index_id of the previous batch's response: 409 when the index was rebuilt since
+    index_id: Optional[str] = None
+    use_embeddings: bool = True
+    # [candidate_a, candidate_b] pairs a recruiter marked as not duplicates
+    excluded_pairs: List[List[str]] = []
+
+class DuplicateMatch(BaseModel):
+    candidate_a: str
+    candidate_b: str
+    strategy: str  # EMAIL | LINKEDIN | PHONE_NAME | TEXT | EMBEDDING
+    confidence: str  # EXACT | HIGH | MEDIUM
+    similarity: Optional[float] = None
+
+class DuplicateCluster(BaseModel):
+    candidate_ids: List[str]
+    matches: List[DuplicateMatch]
+
+class DeduplicateResponse(BaseModel):
+    clusters: List[DuplicateCluster]
+    indexed: int
+    index_id: str
+    # Incremental batch sent to an empty index (e.g. after a restart): run a full scan
+    needs_full_scan: bool = False
+
 class MatchJobRequest(BaseModel):
     job_description: str
     limit: int = 10
@@ -43,9 +94,22 @@ class InterviewAnalysisRequest(BaseModel):
     interview_notes: str
 
 class ScreeningRequest(BaseModel):
-    resume_text: str
+    resume_text: str = ""
+    # Stored text (see /parse-cv) screened instead of resume_text; unknown handles get a 404
+    text_handle: Optional[str] = None
+    criteria: Dict[str, Any]
+    job_description: Optional[str] = ""
+
+class BatchScreeningCandidate(BaseModel):
+    candidate_id: str
+    resume_text: str = ""
+    text_handle: Optional[str] = None
+
+class BatchScreeningRequest(BaseModel):
+    """One job context screened against many resumes, see /screen-candidates/batch."""
     criteria: Dict[str, Any]
     job_description: Optional[str] = ""
+    candidates: List[BatchScreeningCandidate]
 
 class ScorecardGenRequest(BaseModel):
     role_title: str
@@ -59,11 +123,14 @@ class SectionGenRequest(BaseModel):
 
 # --- Response Schemas ---
 
+# Response models are used as Gemini response schemas (constrained decoding) and to
+# validate the output, see GeminiService.generate_structured.
+
 class ScreeningResponse(BaseModel):
     match_score: int
     red_flags: List[str]
     missing_critical_skills: List[str]
-    screening_summary: str
+    summary: str  # read by backend-core as the application's aiSummary
     pros: List[str]
     cons: List[str]
 
@@ -72,6 +139,28 @@ class CVParseResponse(BaseModel):
     summary: str
     experience_years: int
     education_level: str
+    location: Optional[str] = None
+
+class ScoringWeights(BaseModel):
+    skills_match: float
+    experience_years: float
+    education_level: float
+
+class ScorecardResponse(BaseModel):
+    requiredSkills: List[str]
+    niceToHaves: List[str]
+    scoringWeights: ScoringWeights
+
+class SalaryRange(BaseModel):
+    min: int
+    max: int
+
+class JobDescriptionResponse(BaseModel):
+    description: str
+    summary: str
+    responsibilities: List[str]
+    requirements: List[str]
+    salary_range: SalaryRange
 
 class RejectionEmailResponse(BaseModel):
     subject: str
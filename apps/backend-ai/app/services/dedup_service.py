@@ -0,0 +1,287 @@
+import logging
+import re
+import threading
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.milvus_service import milvus_service
+from app.utils.minhash import MinHasher, normalize_text, shingles
+
+logger = logging.getLogger("uvicorn")
+
+# Strategies / confidences, as stored by backend-core in DuplicateGroupMember.matchReason
+STRATEGY_EMAIL = "EMAIL"
+STRATEGY_LINKEDIN = "LINKEDIN"
+STRATEGY_PHONE_NAME = "PHONE_NAME"
+STRATEGY_TEXT = "TEXT"
+STRATEGY_EMBEDDING = "EMBEDDING"
+
+_LINKEDIN_RE = re.compile(r"linkedin\.com/in/([^/?#]+)")
+# Candidates per Milvus range-search request
+_SEARCH_BATCH_SIZE = 100
+
+
+def identity_keys(candidate) -> List[Tuple[str, str]]:
+    """(strategy, key) pairs; two candidates sharing a key are duplicates."""
+    keys = []
+    if candidate.email and candidate.email.strip():
+        keys.append((STRATEGY_EMAIL, candidate.email.strip().lower()))
+
+    if candidate.linkedin_url and candidate.linkedin_url.strip():
+        url = candidate.linkedin_url.strip().lower()
+        match = _LINKEDIN_RE.search(url)
+        keys.append((STRATEGY_LINKEDIN, match.group(1) if match else url.rstrip("/")))
+
+    # Same rule as backend-core's fuzzy match: same last name and same phone number
+    last_name = normalize_text(candidate.last_name or "")
+    digits = re.sub(r"\D", "", candidate.phone or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if len(digits) > 5 and len(last_name) > 2:
+        # Last 9 digits: "+33 6 12 34 56 78" and "06 12 34 56 78" are the same number
+        keys.append((STRATEGY_PHONE_NAME, f"{digits[-9:]}|{last_name}"))
+    return keys
+
+
+class DedupIndexChangedError(RuntimeError):
+    """The index a scan was adding to is gone (worker restarted or another scan reset it): HTTP 409."""
+
+    def __init__(self, index_id: str):
+        super().__init__("The duplicate index was rebuilt since the previous batch: start a full scan again")
+        self.index_id = index_id
+
+
+class DedupMultiWorkerError(RuntimeError):
+    """The index is per process and this server runs several workers: a scan would be split (HTTP 503)."""
+
+    def __init__(self, workers: int):
+        super().__init__(
+            f"Duplicate scans need a single-worker AI service, this one runs {workers} workers: "
+            f"start an instance with WEB_CONCURRENCY=1 and point backend-core's AI_DEDUP_SERVICE_URL at it"
+        )
+        self.workers = workers
+
+
+def find_embedding_matches(candidate_ids: List[str]) -> List[tuple]:
+    """
+    (candidate, other, similarity) for candidates whose stored embeddings are within
+    DEDUP_EMBEDDING_MIN_SIMILARITY: Milvus calls only, no index state (run it without the index lock).
+    """
+    # Unit-length embeddings: squared L2 distance = 2 - 2 * cosine similarity
+    max_distance = 2 * (1 - settings.DEDUP_EMBEDDING_MIN_SIMILARITY)
+    vectors = milvus_service.get_embeddings(candidate_ids)
+    ids = [cid for cid in candidate_ids if cid in vectors]
+    matches = []
+    for start in range(0, len(ids), _SEARCH_BATCH_SIZE):
+        chunk = ids[start:start + _SEARCH_BATCH_SIZE]
+        results = milvus_service.range_search(
+            [vectors[cid] for cid in chunk],
+            max_distance,
+            limit=settings.DEDUP_EMBEDDING_NEIGHBOURS + 1  # + itself
+        )
+        for candidate_id, hits in zip(chunk, results):
+            for hit in hits:
+                other = hit.entity.get("candidate_id")
+                if other and other != candidate_id:
+                    matches.append((candidate_id, other, round(1 - hit.distance / 2, 4)))
+    return matches
+
+
+class _DisjointSet:
+    def __init__(self):
+        self._parent: Dict[str, str] = {}
+        self._members: Dict[str, Set[str]] = {}
+
+    def find(self, item: str) -> str:
+        parent = self._parent.setdefault(item, item)
+        if parent == item:
+            return item
+        root = self.find(parent)
+        self._parent[item] = root
+        return root
+
+    def union(self, first: str, second: str):
+        root_a, root_b = self.find(first), self.find(second)
+        if root_a == root_b:
+            return
+        members_a = self._members.setdefault(root_a, {root_a})
+        members_b = self._members.setdefault(root_b, {root_b})
+        # Union by size keeps both trees and member-set merges cheap
+        if len(members_a) < len(members_b):
+            root_a, root_b, members_a, members_b = root_b, root_a, members_b, members_a
+        self._parent[root_b] = root_a
+        members_a |= members_b
+        del self._members[root_b]
+
+    def members(self, item: str) -> Set[str]:
+        return self._members.get(self.find(item), {item})
+
+
+class DedupIndex:
+    """
+    Incremental near-duplicate index: identity keys (email, LinkedIn, phone + last name),
+    MinHash/LSH over normalized resume text, and optionally Milvus range search over the
+    stored embeddings. Matches are merged into clusters with a disjoint set, so adding a
+    batch costs O(batch) lookups instead of one query per candidate against the database.
+    """
+
+    def __init__(self, hasher: Optional[MinHasher] = None):
+        self.hasher = hasher or MinHasher(settings.DEDUP_MINHASH_PERMUTATIONS, settings.DEDUP_LSH_BANDS)
+        # Changes whenever the index is rebuilt (reset, worker restart): callers check it between batches
+        self.index_id = uuid.uuid4().hex
+        self._identity: Dict[Tuple[str, str], str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[bytes, List[str]] = defaultdict(list)
+        self._clusters = _DisjointSet()
+        self._matches: Dict[str, List[dict]] = defaultdict(list)
+        self._seen_pairs: Set[frozenset] = set()
+        self._excluded: Set[frozenset] = set()
+        self._indexed: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._indexed)
+
+    def exclude(self, pairs: Iterable[Iterable[str]]):
+        for pair in pairs:
+            pair = frozenset(pair)
+            if len(pair) == 2:
+                self._excluded.add(pair)
+
+    def add(self, candidates, use_embeddings: bool = True) -> List[dict]:
+        """Indexes `candidates` and returns the clusters (2+ members) they belong to."""
+        batch_ids = self.add_local(candidates)
+        if use_embeddings and batch_ids:
+            self.add_embedding_matches(find_embedding_matches(batch_ids))
+        return self.clusters_for(batch_ids)
+
+    def add_local(self, candidates) -> List[str]:
+        """Identity keys and resume text of `candidates` (no I/O); returns their IDs."""
+        batch_ids = []
+        for candidate in candidates:
+            candidate_id = candidate.candidate_id
+            batch_ids.append(candidate_id)
+            self._indexed.add(candidate_id)
+
+            for strategy, key in identity_keys(candidate):
+                other = self._identity.setdefault((strategy, key), candidate_id)
+                if other != candidate_id:
+                    self._match(candidate_id, other, strategy, "EXACT" if strategy == STRATEGY_EMAIL else "HIGH")
+
+            if candidate.text and candidate_id not in self._signatures:
+                self._add_text(candidate_id, candidate.text)
+        return batch_ids
+
+    def _add_text(self, candidate_id: str, text: str):
+        signature = self.hasher.signature(shingles(text))
+        if signature is None:
+            return
+        self._signatures[candidate_id] = signature
+
+        compared = set()
+        for key in self.hasher.band_keys(signature):
+            bucket = self._buckets[key]
+            for other in bucket:
+                if other in compared:
+                    continue
+                compared.add(other)
+                similarity = MinHasher.similarity(signature, self._signatures[other])
+                if similarity >= settings.DEDUP_TEXT_MIN_SIMILARITY:
+                    self._match(candidate_id, other, STRATEGY_TEXT,
+                                "HIGH" if similarity >= 0.95 else "MEDIUM", similarity)
+            if len(bucket) < settings.DEDUP_MAX_BUCKET_SIZE:
+                bucket.append(candidate_id)
+
+    def add_embedding_matches(self, matches: Iterable[tuple]):
+        """Results of find_embedding_matches."""
+        for candidate_id, other, similarity in matches:
+            self._match(candidate_id, other, STRATEGY_EMBEDDING, "MEDIUM", similarity)
+
+    def _match(self, first: str, second: str, strategy: str, confidence: str, similarity: float = None):
+        pair = frozenset((first, second))
+        if pair in self._excluded or pair in self._seen_pairs:
+            return
+        self._seen_pairs.add(pair)
+        self._clusters.union(first, second)
+        match = {
+            "candidate_a": first,
+            "candidate_b": second,
+            "strategy": strategy,
+            "confidence": confidence,
+            "similarity": similarity,
+        }
+        self._matches[first].append(match)
+        metrics.inc("dedup_matches_total", strategy=strategy)
+
+    def clusters_for(self, candidate_ids: Iterable[str]) -> List[dict]:
+        clusters = []
+        seen_roots = set()
+        for candidate_id in candidate_ids:
+            root = self._clusters.find(candidate_id)
+            if root in seen_roots:
+                continue
+            seen_roots.add(root)
+            members = self._clusters.members(candidate_id)
+            if len(members) < 2:
+                continue
+            clusters.append({
+                "candidate_ids": sorted(members),
+                "matches": [match for member in sorted(members) for match in self._matches.get(member, [])],
+            })
+        return clusters
+
+
+class DedupService:
+    """
+    Holds the process-wide DedupIndex. The index lives in memory (run scans against one worker)
+    and is lost on restart: each response carries its index_id, and a batch sent with an
+    index_id that is no longer current raises DedupIndexChangedError instead of being matched
+    against an empty index.
+    A batch is indexed in two steps under the lock, with the Milvus searches in between
+    outside it: index_batch, find_embedding_matches, finish_batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = DedupIndex()
+
+    def index_batch(self, candidates, reset_index: bool = False, index_id: Optional[str] = None,
+                    excluded_pairs: Iterable[Iterable[str]] = ()) -> tuple:
+        """(index, batch IDs, needs_full_scan) once the batch's identity keys and texts are indexed."""
+        if settings.SERVER_WORKER_PROCESSES > 1:
+            # Batches would land on different workers' indexes: fail at once, not after restarts
+            raise DedupMultiWorkerError(settings.SERVER_WORKER_PROCESSES)
+        with self._lock:
+            if reset_index:
+                self._index = DedupIndex(self._index.hasher)
+            elif index_id and index_id != self._index.index_id:
+                raise DedupIndexChangedError(self._index.index_id)
+            index = self._index
+            # Incremental batch without a scan behind it: no earlier candidate to match against
+            needs_full_scan = not reset_index and len(index) == 0
+            index.exclude(excluded_pairs)
+            return index, index.add_local(candidates), needs_full_scan
+
+    def finish_batch(self, index: DedupIndex, batch_ids: List[str], embedding_matches: Iterable[tuple] = (),
+                     needs_full_scan: bool = False) -> dict:
+        with self._lock:
+            index.add_embedding_matches(embedding_matches)
+            return {
+                "clusters": index.clusters_for(batch_ids),
+                "indexed": len(index),
+                "index_id": index.index_id,
+                "needs_full_scan": needs_full_scan,
+            }
+
+    def deduplicate(self, candidates, reset_index: bool = False, use_embeddings: bool = True,
+                    excluded_pairs: Iterable[Iterable[str]] = (), index_id: Optional[str] = None) -> dict:
+        index, batch_ids, needs_full_scan = self.index_batch(candidates, reset_index, index_id, excluded_pairs)
+        matches = find_embedding_matches(batch_ids) if use_embeddings and batch_ids else []
+        return self.finish_batch(index, batch_ids, matches, needs_full_scan)
+
+
+dedup_service = DedupService()
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.core.metrics import metrics
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger("uvicorn")
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("handle", "expires_at")
+
+    def __init__(self, handle: Any, expires_at: float):
+        self.handle = handle
+        self.expires_at = expires_at
+
+
+class GeminiFileCache:
+    """
+    Reuses Gemini Files API uploads by content hash: a re-parsed or retried document is sent
+    to the model by reference instead of being uploaded again.
+    Entries live for `ttl` seconds (kept below the Files API's own 48h retention); expired or
+    evicted uploads are deleted remotely by a background sweeper thread.
+    """
+
+    def __init__(self, upload: Callable[[str, str], Any], delete: Callable[[str], None],
+                 ttl: float, max_entries: int, cleanup_interval: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self._upload = upload
+        self._delete = delete
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cleanup_interval = cleanup_interval
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending_deletes = []
+        self._lock = threading.Lock()
+        # Concurrent requests for the same new document share one upload
+        self._flight = SingleFlight()
+        self._stop_event = threading.Event()
+        self._cleanup_thread: Optional[threading.Thread] = None
+
+    def get_or_upload(self, file_path: str, mime_type: str) -> Any:
+        key = f"{file_sha256(file_path)}:{mime_type}"
+        handle = self._lookup(key)
+        if handle is not None:
+            metrics.inc("gemini_file_cache_total", outcome="hit")
+            return handle
+
+        return self._flight.do(key, lambda: self._upload_and_store(key, file_path, mime_type))
+
+    def invalidate(self, handle: Any):
+        """Drops a handle the API no longer accepts (e.g. deleted remotely)."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.handle is handle:
+                    del self._entries[key]
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                del self._entries[key]
+                self._pending_deletes.append(entry.handle)
+                return None
+            self._entries.move_to_end(key)
+            return entry.handle
+
+    def _upload_and_store(self, key: str, file_path: str, mime_type: str) -> Any:
+        # Another caller may have finished the upload between the lookup and this flight
+        handle = self._lookup(key)
+        if handle is not None:
+            metrics.inc("gemini_file_cache_total", outcome="hit")
+            return handle
+
+        metrics.inc("gemini_file_cache_total", outcome="miss")
+        handle = self._upload(file_path, mime_type)
+        with self._lock:
+            self._entries[key] = _Entry(handle, self._clock() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._pending_deletes.append(evicted.handle)
+        self._start_cleanup()
+        return handle
+
+    def sweep(self) -> int:
+        """Deletes expired and evicted uploads. Returns the number of remote deletions."""
+        now = self._clock()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.expires_at <= now:
+                    del self._entries[key]
+                    self._pending_deletes.append(entry.handle)
+            doomed, self._pending_deletes = self._pending_deletes, []
+
+        deleted = 0
+        for handle in doomed:
+            try:
+                self._delete(handle.name)
+                deleted += 1
+            except Exception as e:
+                # The Files API expires uploads on its own; a failed delete only costs storage
+                logger.warning(f"Failed to delete Gemini upload {getattr(handle, 'name', handle)}: {e}")
+        if deleted:
+            metrics.inc("gemini_file_cache_deleted_total", deleted)
+        return deleted
+
+    def _start_cleanup(self):
+        with self._lock:
+            if self._cleanup_thread and self._cleanup_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._cleanup_thread = threading.Thread(
+                target=self._cleanup_loop, name="gemini-file-cleanup", daemon=True
+            )
+            self._cleanup_thread.start()
+
+    def _cleanup_loop(self):
+        while not self._stop_event.wait(self.cleanup_interval):
+            self.sweep()
+
+    def close(self):
+        """Stops the sweeper and deletes every upload this process still holds."""
+        self._stop_event.set()
+        with self._lock:
+            self._pending_deletes.extend(entry.handle for entry in self._entries.values())
+            self._entries.clear()
+        self.sweep()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
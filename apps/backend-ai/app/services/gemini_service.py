@@ -1,33 +1,356 @@
-import google.generativeai as genai
+import hashlib
 import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Optional
+from pydantic import TypeAdapter, ValidationError
+from app.core.cancellation import cancellable_sleep, check_cancelled
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.gemini_file_cache import GeminiFileCache
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.gemini_schema import to_gemini_schema
+from app.utils.hedging import Hedger
 from app.utils.json_parser import clean_and_parse_json
+from app.utils.lazy_import import lazy_module
+from app.utils.lru_cache import LRUCache
+from app.utils.retry import RetryPolicy, call_with_retry
+from app.utils.single_flight import SingleFlight
 
 logger = logging.getLogger("uvicorn")
 
+# Imported on first use: the SDK alone takes about a second to import
+genai = lazy_module("google.generativeai")
+google_exceptions = lazy_module("google.api_core.exceptions")
+
+MODEL_PRO = 'gemini-2.5-pro'
+MODEL_FLASH = 'gemini-2.5-flash'
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Full output size; smaller settings.DIMENSION values are requested with output_dimensionality
+EMBEDDING_MODEL_DIMENSION = 768
+
+
+def _unit_length(vector) -> list:
+    """Truncated embeddings are not normalized; Milvus L2 distances (and dedup) assume unit vectors."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+@lru_cache(maxsize=1)
+def retryable_errors() -> tuple:
+    """Transient upstream failures (429 / 5xx / timeouts); anything else is not worth retrying."""
+    return (
+        google_exceptions.TooManyRequests,  # includes ResourceExhausted
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.BadGateway,
+        ConnectionError,
+        TimeoutError,
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, retryable_errors())
+
+
+def _flight_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class EmptyResponseError(ValueError):
+    """The model returned no content (safety block or token limit before any output)."""
+
+
+class GeminiUnavailableError(RuntimeError):
+    """The model's circuit is open; callers should degrade (canned fallback or HTTP 503)."""
+
+    def __init__(self, model: str, retry_after: float = 0.0):
+        super().__init__(f"AI model {model} is temporarily unavailable")
+        self.model = model
+        self.retry_after = retry_after
+
+
 class GeminiService:
     def __init__(self):
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model_pro = genai.GenerativeModel('gemini-2.0-flash-exp') # Updated to latest fast model or use 1.5-pro
-            # User preferences and original code used 2.5-pro and 2.5-flash
-            self.model_pro = genai.GenerativeModel('gemini-2.5-pro') 
-            self.model_flash = genai.GenerativeModel('gemini-2.5-flash')
-            self.embedding_model = "models/text-embedding-004"
-        else:
+        self._models = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._configured = False
+        self._hedgers = {}
+        self._hedge_executor = ThreadPoolExecutor(max_workers=settings.HEDGE_WORKERS, thread_name_prefix="gemini-hedge")
+        # In-flight dedup of identical concurrent calls (bursts from bulk actions / many recruiters)
+        self._flight = SingleFlight()
+        self.generation_policy = RetryPolicy(
+            max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+            base_delay=settings.GEMINI_RETRY_BASE_DELAY,
+            max_delay=settings.GEMINI_RETRY_MAX_DELAY,
+            deadline=settings.GEMINI_DEADLINE_SECONDS
+        )
+        self.embedding_policy = RetryPolicy(
+            max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+            base_delay=settings.GEMINI_RETRY_BASE_DELAY,
+            max_delay=settings.GEMINI_RETRY_MAX_DELAY,
+            deadline=settings.GEMINI_EMBED_DEADLINE_SECONDS
+        )
+        self.file_cache = GeminiFileCache(
+            upload=self._upload_file,
+            delete=lambda name: self._sdk().delete_file(name),
+            ttl=settings.GEMINI_FILE_CACHE_TTL_SECONDS,
+            max_entries=settings.GEMINI_FILE_CACHE_MAX_ENTRIES,
+            cleanup_interval=settings.GEMINI_FILE_CLEANUP_INTERVAL_SECONDS
+        )
+        # Search query vectors (recruiters repeat the same queries); documents are not cached
+        self.query_embeddings = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+        self.embedding_model = EMBEDDING_MODEL
+        if not settings.GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not set. AI features will fail.")
 
+    def _sdk(self):
+        """The google.generativeai module, imported and configured on the first call that needs it."""
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    if settings.GEMINI_API_KEY:
+                        genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._configured = True
+        return genai
+
+    def get_model(self, model_name: str):
+        sdk = self._sdk()
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = sdk.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def breaker(self, model_name: str) -> CircuitBreaker:
+        with self._lock:
+            if model_name not in self._breakers:
+                self._breakers[model_name] = CircuitBreaker(
+                    model_name,
+                    failure_threshold=settings.GEMINI_BREAKER_FAILURES,
+                    reset_timeout=settings.GEMINI_BREAKER_RESET_SECONDS
+                )
+            return self._breakers[model_name]
+
+    def hedger(self, operation: str) -> Hedger:
+        """The Hedger for one kind of call: each keeps the latency distribution of its own calls."""
+        with self._lock:
+            if operation not in self._hedgers:
+                self._hedgers[operation] = Hedger(
+                    operation,
+                    self._hedge_executor,
+                    percentile=settings.HEDGE_PERCENTILE,
+                    budget=settings.HEDGE_BUDGET,
+                    min_samples=settings.HEDGE_MIN_SAMPLES,
+                    min_delay=settings.HEDGE_MIN_DELAY_SECONDS
+                )
+            return self._hedgers[operation]
+
+    def _hedged(self, operation: Optional[str], fn):
+        """
+        Runs `fn` hedged under `operation` (when hedging is on). Attempts then get their own
+        cancellation token, so `fn` should make cancellable calls; unhedged it should not (it
+        runs inside a single flight shared by several requests).
+        """
+        if operation and settings.HEDGE_ENABLED:
+            return self.hedger(operation).call(lambda: fn(True))
+        return fn(False)
+
+    def health(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+            hedgers = dict(self._hedgers)
+        return {
+            "configured": bool(settings.GEMINI_API_KEY),
+            "breakers": {name: breaker.snapshot() for name, breaker in breakers.items()},
+            "in_flight": self._flight.in_flight(),
+            "coalesced_calls": self._flight.coalesced,
+            "cached_uploads": len(self.file_cache),
+            "cached_query_embeddings": len(self.query_embeddings),
+            "hedging": {name: hedger.stats() for name, hedger in hedgers.items()},
+        }
+
+    def close(self):
+        self.file_cache.close()
+        self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Opens the generation channel for each model (count_tokens is free) before real traffic."""
+        for model_name in (MODEL_PRO, MODEL_FLASH):
+            self._call(
+                model_name,
+                lambda timeout: self.get_model(model_name).count_tokens(
+                    "warm-up", request_options={"timeout": timeout}
+                ),
+                self.embedding_policy
+            )
+
+    def _call(self, model_name: str, fn, policy: RetryPolicy, cancellable: bool = True):
+        """
+        Runs `fn(timeout)` under the retry policy and the model's circuit breaker.
+        When `cancellable`, no attempt (or backoff sleep) is made once the current request's
+        client has disconnected. Calls shared by several requests (single flight) pass False.
+        """
+        def attempt(timeout):
+            if cancellable:
+                check_cancelled("gemini")
+            return fn(timeout)
+
+        try:
+            return call_with_retry(
+                attempt, policy, is_retryable, breaker=self.breaker(model_name),
+                sleep=cancellable_sleep if cancellable else time.sleep
+            )
+        except CircuitOpenError as e:
+            raise GeminiUnavailableError(model_name, e.retry_after)
+
+    def generate_content(self, prompt, model_name: str = MODEL_PRO, generation_config=None, model=None,
+                         hedge: Optional[str] = None):
+        """
+        Resilient wrapper around GenerativeModel.generate_content.
+        Raises GeminiUnavailableError when the model's circuit is open.
+        Identical concurrent text prompts share one upstream call (the response is read-only).
+        `model` overrides the plain `model_name` model (e.g. one from shared_context).
+        `hedge` names the operation for hedged requests; only for short text prompts whose
+        latency a user waits on (a hedge may double the cost of a slow call).
+        """
+        shared = model is not None
+        model = model or self.get_model(model_name)
+
+        def _generate(cancellable: bool = True):
+            response = self._call(
+                model_name,
+                lambda timeout: model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": timeout}
+                ),
+                self.generation_policy,
+                cancellable=cancellable
+            )
+            self._record_usage(model_name, response)
+            return response
+
+        if shared or not isinstance(prompt, str):
+            # Multimodal prompts (uploaded files) and shared-context models are not coalesced
+            return _generate()
+        # One caller's disconnect must not fail the others waiting on the shared call
+        check_cancelled("gemini")
+        return self._flight.do(
+            _flight_key("generate", model_name, prompt, generation_config),
+            lambda: self._hedged(hedge, _generate)
+        )
+
+    @staticmethod
+    def _record_usage(model_name: str, response):
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        if not isinstance(prompt_tokens, int):
+            return
+        metrics.inc("gemini_prompt_tokens_total", prompt_tokens, model=model_name)
+        cached_tokens = getattr(usage, "cached_content_token_count", 0)
+        if isinstance(cached_tokens, int) and cached_tokens:
+            metrics.inc("gemini_cached_prompt_tokens_total", cached_tokens, model=model_name)
+
+    @contextmanager
+    def shared_context(self, system_instruction: str, model_name: str = MODEL_PRO):
+        """
+        Yields a model whose system instruction is a prefix shared by many calls (pass it as
+        `model=` to generate_content / generate_structured).
+        Large prefixes are stored once with Gemini context caching (billed at the cached-token
+        rate, deleted on exit); smaller ones, below the explicit-cache minimum, are still sent
+        as an identical leading instruction, which Gemini's implicit prefix caching picks up.
+        """
+        cache = None
+        # ~4 characters per token
+        if len(system_instruction) // 4 >= settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            try:
+                cache = self._call(
+                    model_name,
+                    lambda timeout: self._sdk().caching.CachedContent.create(
+                        model=f"models/{model_name}",
+                        system_instruction=system_instruction,
+                        ttl=timedelta(seconds=settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+                    ),
+                    self.generation_policy
+                )
+            except GeminiUnavailableError:
+                raise
+            except Exception as e:
+                logger.warning(f"Gemini context cache creation failed, sending the prefix inline: {e}")
+
+        sdk = self._sdk()
+        if cache is not None:
+            metrics.inc("gemini_context_cache_total", outcome="explicit")
+            model = sdk.GenerativeModel.from_cached_content(cache)
+        else:
+            metrics.inc("gemini_context_cache_total", outcome="implicit")
+            model = sdk.GenerativeModel(model_name, system_instruction=system_instruction)
+
+        try:
+            yield model
+        finally:
+            if cache is not None:
+                try:
+                    cache.delete()
+                except Exception as e:
+                    # Expires on its own after GEMINI_CONTEXT_CACHE_TTL_SECONDS
+                    logger.warning(f"Failed to delete Gemini context cache {cache.name}: {e}")
+
+    def stream_content(self, prompt, model_name: str = MODEL_PRO, generation_config=None):
+        """
+        Streaming generate_content. The request and its first chunk go through the retry
+        policy and circuit breaker before this returns (so GeminiUnavailableError can still
+        become an HTTP 503); the returned iterator then yields text chunks as they arrive.
+        Streams are never coalesced.
+        """
+        model = self.get_model(model_name)
+        response = self._call(
+            model_name,
+            lambda timeout: model.generate_content(
+                prompt,
+                generation_config=generation_config,
+                stream=True,
+                request_options={"timeout": timeout}
+            ),
+            self.generation_policy
+        )
+
+        def _chunks():
+            for chunk in response:
+                check_cancelled("gemini_stream")
+                # The final chunk may only carry the finish reason
+                if chunk.parts:
+                    yield chunk.text
+
+        return _chunks()
+
     def generate_json(self, prompt: str, schema=None):
+        """
+        JSON generation. With `schema` (a Pydantic model or e.g. List[Model]) the output is
+        schema-constrained and validated, see generate_structured.
+        """
+        if schema is not None:
+            return self.generate_structured(prompt, schema)
         try:
             generation_config = genai.GenerationConfig(
                 response_mime_type="application/json",
-                # response_schema=schema, # Optional: passing schema object directly often helps
                 max_output_tokens=8192,
                 temperature=0.3
             )
-            
-            response = self.model_pro.generate_content(
-                prompt, 
+
+            response = self.generate_content(
+                prompt,
                 generation_config=generation_config
             )
             return clean_and_parse_json(response.text)
@@ -35,21 +358,106 @@ class GeminiService:
             logger.error(f"Gemini Generation Error: {e}")
             raise e
 
-    def generate_with_vision(self, prompt: str, file_path: str, mime_type="application/pdf"):
-        try:
-            uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
-            response = self.model_flash.generate_content(
-                [prompt, uploaded_file],
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json"
-                )
+    def generate_structured(self, prompt, response_type: Any, model_name: str = MODEL_PRO,
+                            max_output_tokens: int = 8192, temperature: float = 0.3, model=None):
+        """
+        Constrained decoding from `response_type`'s schema, then Pydantic validation.
+        Invalid output is re-asked (with the validation error) up to GEMINI_STRUCTURED_MAX_REASKS
+        times before raising. Returns plain JSON data (dicts / lists).
+        Raises EmptyResponseError when the model returns no content.
+        """
+        adapter = TypeAdapter(response_type)
+        schema_name = getattr(response_type, "__name__", None) or str(response_type)
+        generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=to_gemini_schema(response_type),
+            max_output_tokens=max_output_tokens,
+            temperature=temperature
+        )
+
+        current_prompt = prompt
+        max_reasks = settings.GEMINI_STRUCTURED_MAX_REASKS
+        for attempt in range(max_reasks + 1):
+            response = self.generate_content(
+                current_prompt, model_name=model_name, generation_config=generation_config, model=model
             )
-            return clean_and_parse_json(response.text)
+            if not response.parts:
+                metrics.inc("ai_structured_output_total", schema=schema_name, outcome="empty")
+                finish_reason = response.candidates[0].finish_reason if response.candidates else "unknown"
+                raise EmptyResponseError(f"AI response blocked or empty. Finish Reason: {finish_reason}")
+
+            try:
+                value = adapter.validate_python(clean_and_parse_json(response.text))
+            except (ValueError, ValidationError) as e:
+                error = e
+                if attempt < max_reasks:
+                    metrics.inc("ai_structured_reasks_total", schema=schema_name)
+                    logger.warning(f"Invalid {schema_name} output, re-asking: {str(e)[:300]}")
+                    current_prompt = self._reask_prompt(prompt, e)
+                continue
+
+            metrics.inc("ai_structured_output_total", schema=schema_name,
+                        outcome="valid" if attempt == 0 else "valid_after_reask")
+            return adapter.dump_python(value, mode="json")
+
+        metrics.inc("ai_structured_output_total", schema=schema_name, outcome="invalid")
+        logger.error(f"Gemini Structured Output Error ({schema_name}): {error}")
+        raise error
+
+    @staticmethod
+    def _reask_prompt(prompt, error: Exception):
+        correction = (
+            "\n\nYOUR PREVIOUS RESPONSE WAS INVALID:\n"
+            f"{str(error)[:1000]}\n"
+            "Return ONLY a JSON value that matches the response schema exactly."
+        )
+        if isinstance(prompt, list):
+            return [prompt[0] + correction] + prompt[1:]
+        return prompt + correction
+
+    def _upload_file(self, file_path: str, mime_type: str):
+        return self._call(
+            MODEL_FLASH,
+            lambda timeout: self._sdk().upload_file(file_path, mime_type=mime_type),
+            self.generation_policy,
+            # Uploads are shared through the file cache's single flight
+            cancellable=False
+        )
+
+    def generate_with_vision(self, prompt: str, file_path: str, mime_type="application/pdf", schema=None):
+        try:
+            uploaded_file = self.file_cache.get_or_upload(file_path, mime_type)
+            try:
+                return self._generate_from_file(prompt, uploaded_file, schema)
+            except (google_exceptions.NotFound, google_exceptions.PermissionDenied):
+                # The cached upload was removed remotely: upload once more
+                logger.warning(f"Cached Gemini upload {uploaded_file.name} rejected, re-uploading")
+                self.file_cache.invalidate(uploaded_file)
+                uploaded_file = self.file_cache.get_or_upload(file_path, mime_type)
+                return self._generate_from_file(prompt, uploaded_file, schema)
         except Exception as e:
             logger.error(f"Gemini Vision Error: {e}")
             raise e
 
+    def _generate_from_file(self, prompt: str, uploaded_file, schema=None):
+        if schema is not None:
+            return self.generate_structured([prompt, uploaded_file], schema, model_name=MODEL_FLASH)
+        response = self.generate_content(
+            [prompt, uploaded_file],
+            model_name=MODEL_FLASH,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json"
+            )
+        )
+        return clean_and_parse_json(response.text)
+
     def embed_text(self, text: str, task_type="retrieval_document", title=None):
+        cache_key = (self.embedding_model, text) if task_type == "retrieval_query" and not title else None
+        if cache_key:
+            cached = self.query_embeddings.get(cache_key)
+            metrics.inc("embedding_cache_total", outcome="hit" if cached is not None else "miss")
+            if cached is not None:
+                return list(cached)
         try:
             args = {
                 "model": self.embedding_model,
@@ -58,9 +466,27 @@ class GeminiService:
             }
             if title:
                 args["title"] = title
-            
-            result = genai.embed_content(**args)
-            return result['embedding']
+            reduced = settings.DIMENSION < EMBEDDING_MODEL_DIMENSION
+            if reduced:
+                args["output_dimensionality"] = settings.DIMENSION
+
+            check_cancelled("gemini")
+            # A user waits on search queries: those are hedged, document embeddings are not
+            hedge = "query_embedding" if task_type == "retrieval_query" else None
+            result = self._flight.do(
+                _flight_key("embed", self.embedding_model, task_type, title, text),
+                lambda: self._hedged(hedge, lambda cancellable: self._call(
+                    self.embedding_model,
+                    lambda timeout: self._sdk().embed_content(**args, request_options={"timeout": timeout}),
+                    self.embedding_policy,
+                    cancellable=cancellable
+                ))
+            )
+            embedding = _unit_length(result['embedding']) if reduced else result['embedding']
+            if cache_key:
+                self.query_embeddings.put(cache_key, tuple(embedding))
+            # Copy: the vector may be shared with other coalesced callers
+            return list(embedding)
         except Exception as e:
             logger.error(f"Embedding Error: {e}")
             raise e
@@ -1,89 +1,440 @@
-from pymilvus import connections, utility, Collection, FieldSchema, CollectionSchema, DataType
+import json
 import logging
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+import numpy as np
+
 from app.core.config import settings
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.lazy_import import lazy_module
+from app.utils.sparse_encoder import EMPTY_DOCUMENT_TERM
 
 logger = logging.getLogger("uvicorn")
 
+# Imported by the background connect, not at process start
+pymilvus = lazy_module("pymilvus")
+
+
+@lru_cache(maxsize=1)
+def client_errors() -> tuple:
+    """Caller mistakes, not signs that Milvus is unhealthy."""
+    exceptions = pymilvus.exceptions
+    return (exceptions.ParamError, exceptions.DataNotMatchException, exceptions.DataTypeNotMatchException)
+
+
+# Dense vector storage types and indexes (all searched with nprobe, L2)
+VECTOR_DTYPES = {"float32": "FLOAT_VECTOR", "float16": "FLOAT16_VECTOR"}
+INDEX_TYPES = ("IVF_FLAT", "IVF_SQ8", "IVF_PQ")
+# The schema COLLECTION_NAME was created with keeps the plain name
+_ORIGINAL_SCHEMA = (768, "float32")
+
+
+def collection_name() -> str:
+    """Other dimensions / storage types live in their own collection (filled by a re-index)."""
+    if (settings.DIMENSION, settings.VECTOR_STORAGE) == _ORIGINAL_SCHEMA:
+        return settings.COLLECTION_NAME
+    return f"{settings.COLLECTION_NAME}_d{settings.DIMENSION}_{settings.VECTOR_STORAGE}"
+
+
+def dense_index_params() -> dict:
+    """Index of the dense embedding from VECTOR_INDEX_TYPE; ValueError on an invalid setup."""
+    if settings.VECTOR_STORAGE not in VECTOR_DTYPES:
+        raise ValueError(f"VECTOR_STORAGE must be one of {', '.join(VECTOR_DTYPES)}")
+    index_type = settings.VECTOR_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"VECTOR_INDEX_TYPE must be one of {', '.join(INDEX_TYPES)}")
+    params = {"nlist": settings.VECTOR_INDEX_NLIST}
+    if index_type == "IVF_PQ":
+        # One 8-bit code per sub-vector
+        m = settings.VECTOR_PQ_M or max(1, settings.DIMENSION // 4)
+        if settings.DIMENSION % m:
+            raise ValueError(f"VECTOR_PQ_M ({m}) must divide the embedding dimension ({settings.DIMENSION})")
+        params.update(m=m, nbits=8)
+    return {"metric_type": "L2", "index_type": index_type, "params": params}
+
+
+def to_float_list(value) -> list:
+    """A stored dense vector as floats: float16 vectors come back as raw bytes (or a list of one)."""
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+        value = value[0]
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32).tolist()
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32).tolist()
+    return list(value)
+
+
+class MilvusUnavailableError(RuntimeError):
+    """Milvus is down or reconnecting; callers should fail fast (HTTP 503)."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class MilvusService:
     def __init__(self):
-        self.collection_name = settings.COLLECTION_NAME
+        self.collection_name = collection_name()
+        # Fails at startup rather than in the background connect
+        self.index_params = dense_index_params()
         self._collection = None
+        # Guards state only (never held across network I/O), so requests never wait on a connect
+        self._lock = threading.Lock()
+        # One connect / collection load at a time
+        self._connect_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reconnect_thread = None
+        self.last_error = None
+        self.breaker = CircuitBreaker(
+            "milvus",
+            failure_threshold=settings.MILVUS_BREAKER_FAILURES,
+            reset_timeout=settings.MILVUS_BREAKER_RESET_SECONDS
+        )
+
+    # --- Connection management ---
+
+    def connect(self) -> bool:
+        """
+        Single connection attempt (bounded by MILVUS_CONNECT_TIMEOUT).
+        On failure a background reconnect loop is started and False is returned;
+        requests meanwhile fail fast with MilvusUnavailableError.
+        """
+        self._stop_event.clear()
+        if self._try_connect():
+            return True
+        self.start_reconnect()
+        return False
+
+    def _try_connect(self) -> bool:
+        with self._connect_lock:
+            if self._collection is not None:
+                return True
+            try:
+                if not pymilvus.connections.has_connection("default"):
+                    logger.info(f"Connecting to Milvus at {settings.MILVUS_HOST}:{settings.MILVUS_PORT}...")
+                    pymilvus.connections.connect(
+                        alias="default",
+                        host=settings.MILVUS_HOST,
+                        port=settings.MILVUS_PORT,
+                        timeout=settings.MILVUS_CONNECT_TIMEOUT
+                    )
+                collection = self._load_collection()
+            except Exception as e:
+                logger.error(f"Milvus Connect Error: {e}")
+                self.last_error = str(e)
+                with self._lock:
+                    self._collection = None
+                self.breaker.trip()
+                try:
+                    pymilvus.connections.disconnect("default")
+                except Exception:
+                    pass
+                return False
 
-    def connect(self):
+            with self._lock:
+                if self._stop_event.is_set():
+                    # Closed while connecting
+                    return False
+                self._collection = collection
+            self.last_error = None
+            self.breaker.record_success()
+            return True
+
+    def start(self):
+        """
+        Connects (and loads the collection) on a background thread, first attempt right away,
+        so the server starts accepting requests immediately; /ready reports when it is done.
+        """
+        self.start_reconnect(immediate=True)
+
+    def start_reconnect(self, immediate: bool = False):
+        with self._lock:
+            if self._reconnect_thread and self._reconnect_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._reconnect_thread = threading.Thread(
+                target=self._reconnect_loop, args=(immediate,), name="milvus-reconnect", daemon=True
+            )
+            self._reconnect_thread.start()
+
+    def _reconnect_loop(self, immediate: bool = False):
+        delay = settings.MILVUS_RECONNECT_MIN_SECONDS
+        while not self._stop_event.is_set():
+            # Full jitter keeps multiple workers from reconnecting in lockstep
+            if not immediate and self._stop_event.wait(random.uniform(delay / 2, delay)):
+                return
+            immediate = False
+            if self._try_connect():
+                logger.info("Milvus connected")
+                return
+            delay = min(delay * 2, settings.MILVUS_RECONNECT_MAX_SECONDS)
+
+    def wait_until_connected(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._collection is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.wait(min(0.2, remaining)):
+                return self._collection is not None
+        return True
+
+    def close(self):
+        self._stop_event.set()
+        with self._lock:
+            self._collection = None
+        if "pymilvus" not in sys.modules:
+            # Never connected: nothing to close, and no reason to import the SDK now
+            return
         try:
-            if not connections.has_connection("default"):
-                logger.info(f"Connecting to Milvus at {settings.MILVUS_HOST}:{settings.MILVUS_PORT}...")
-                connections.connect(alias="default", host=settings.MILVUS_HOST, port=settings.MILVUS_PORT)
-                self._load_collection()
+            pymilvus.connections.disconnect("default")
+        except Exception:
+            pass
+
+    @property
+    def state(self) -> str:
+        if self._collection is not None and self.breaker.state != CircuitBreaker.OPEN:
+            return "connected"
+        if self._reconnect_thread and self._reconnect_thread.is_alive():
+            return "reconnecting"
+        return "disconnected"
+
+    def health(self) -> dict:
+        return {
+            "state": self.state,
+            "collection": self.collection_name,
+            "vectors": {
+                "dimension": settings.DIMENSION,
+                "storage": settings.VECTOR_STORAGE,
+                "index": self.index_params["index_type"],
+            },
+            "breaker": self.breaker.snapshot(),
+            "last_error": self.last_error,
+        }
+
+    def ensure_available(self):
+        """Fails fast (no network I/O) when Milvus is known to be down."""
+        if self._collection is None or self.breaker.state == CircuitBreaker.OPEN:
+            self.start_reconnect()
+            raise MilvusUnavailableError(
+                "Vector Database unavailable.",
+                retry_after=max(self.breaker.retry_after(), settings.MILVUS_RECONNECT_MIN_SECONDS)
+            )
+
+    def _execute(self, operation):
+        """Runs `operation(collection)` through the circuit breaker."""
+        self.ensure_available()
+        if not self.breaker.allow_request():
+            raise MilvusUnavailableError("Vector Database unavailable.", retry_after=self.breaker.retry_after())
+
+        collection = self._collection
+        try:
+            result = operation(collection)
+        except client_errors():
+            self.breaker.record_success()
+            raise
         except Exception as e:
-            logger.error(f"Milvus Connect Error: {e}")
+            self.last_error = str(e)
+            if self.breaker.record_failure():
+                logger.error(f"Milvus circuit opened after repeated failures: {e}")
+                with self._lock:
+                    self._collection = None
+                self.start_reconnect()
+            raise
+        self.breaker.record_success()
+        return result
+
+    # --- Collection ---
 
     def _load_collection(self):
-        if utility.has_collection(self.collection_name):
-            self._collection = Collection(self.collection_name)
-            self._collection.load()
-            logger.info(f"Loaded collection: {self.collection_name}")
-        else:
-            self._create_collection()
+        """The loaded (or newly created) collection; installed by the caller."""
+        if not pymilvus.utility.has_collection(self.collection_name):
+            return self._create_collection()
+        collection = pymilvus.Collection(self.collection_name)
+        self._check_index(collection)
+        collection.load()
+        logger.info(f"Loaded collection: {self.collection_name}")
+        return collection
 
     def _create_collection(self):
+        FieldSchema, DataType = pymilvus.FieldSchema, pymilvus.DataType
         # Define Schema matching logical needs
         fields = [
             FieldSchema(name="candidate_id", dtype=DataType.VARCHAR, max_length=100, is_primary=True),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=settings.DIMENSION),
+            FieldSchema(name="embedding", dtype=getattr(DataType, VECTOR_DTYPES[settings.VECTOR_STORAGE]),
+                        dim=settings.DIMENSION),
+            # BM25-style lexical weights (see app.utils.sparse_encoder)
+            FieldSchema(name="sparse_embedding", dtype=DataType.SPARSE_FLOAT_VECTOR),
             FieldSchema(name="location", dtype=DataType.VARCHAR, max_length=200),
             FieldSchema(name="experience", dtype=DataType.INT64),
             # Array types for advanced filtering
             FieldSchema(name="location_tokens", dtype=DataType.ARRAY, element_type=DataType.VARCHAR, max_capacity=50, max_length=100)
         ]
-        schema = CollectionSchema(fields, "Candidate Skill Embeddings")
-        self._collection = Collection(self.collection_name, schema)
-        
-        index_params = {"metric_type": "L2", "index_type": "IVF_FLAT", "params": {"nlist": 128}}
-        self._collection.create_index(field_name="embedding", index_params=index_params)
-        self._collection.load()
+        schema = pymilvus.CollectionSchema(fields, "Candidate Skill Embeddings")
+        collection = pymilvus.Collection(self.collection_name, schema)
+
+        collection.create_index(field_name="embedding", index_params=self.index_params)
+        sparse_index_params = {
+            "metric_type": "IP",
+            "index_type": "SPARSE_INVERTED_INDEX",
+            "params": {"drop_ratio_build": 0.2}
+        }
+        collection.create_index(field_name="sparse_embedding", index_params=sparse_index_params)
+        collection.load()
         logger.info(f"Created collection: {self.collection_name}")
+        return collection
 
-    def upsert_candidate(self, candidate_id: str, vector: list, metadata: dict):
-        if not self._collection:
-            self.connect()
+    def _check_index(self, collection):
+        """An existing collection keeps its index: a changed VECTOR_INDEX_TYPE needs a rebuild."""
+        for index in collection.indexes:
+            if index.field_name != "embedding":
+                continue
+            index_type = index.params.get("index_type")
+            if index_type != self.index_params["index_type"]:
+                logger.warning(
+                    f"Collection {self.collection_name} has a {index_type} index, not VECTOR_INDEX_TYPE="
+                    f"{self.index_params['index_type']}; rebuild the index (or re-index) to switch"
+                )
 
+    @staticmethod
+    def _vector_data(vector: list):
+        """A dense vector in the collection's storage type."""
+        if settings.VECTOR_STORAGE == "float16":
+            return np.asarray(vector, dtype=np.float16)
+        return vector
+
+    # --- Data operations ---
+
+    def upsert_candidate(self, candidate_id: str, vector: list, metadata: dict, sparse_vector: dict = None):
         # Delete existing if any (Upsert simulation)
         # Note: Milvus Upsert is supported in newer versions, but delete-insert is safe
         try:
-            self._collection.delete(f'candidate_id in ["{candidate_id}"]')
+            self.delete_candidates([candidate_id])
+        except MilvusUnavailableError:
+            raise
         except Exception:
             pass
-        
+
         # Prepare Data
-        # Order must match Schema fields [id, embedding, location, experience, loc_tokens]
+        # Order must match Schema fields [id, embedding, sparse_embedding, location, experience, loc_tokens]
         location = metadata.get("location", "Unknown")
         experience = metadata.get("experience", 0)
         loc_tokens = metadata.get("location_tokens", [])
 
         data = [
             [candidate_id],
-            [vector],
+            [self._vector_data(vector)],
+            # No lexical terms: a placeholder no query matches rather than an empty row
+            [sparse_vector or {EMPTY_DOCUMENT_TERM: 1.0}],
             [location],
             [experience],
             [loc_tokens]
         ]
-        self._collection.insert(data)
-        self._collection.flush()
 
-    def search(self, vector: list, limit=10, expr=None):
-        if not self._collection:
-            self.connect()
-            
+        def _insert(collection):
+            collection.insert(data, timeout=settings.MILVUS_OPERATION_TIMEOUT)
+            collection.flush(timeout=settings.MILVUS_OPERATION_TIMEOUT)
+
+        self._execute(_insert)
+
+    def delete_candidates(self, candidate_ids: Iterable[str]) -> int:
+        """
+        Deletes candidates by primary key, one `in [...]` expression per chunk.
+        Idempotent: unknown IDs are simply not matched. Returns the number of IDs requested.
+        """
+        # Dedupe while keeping order
+        ids = list(dict.fromkeys(str(cid) for cid in candidate_ids if cid))
+        batch_size = max(1, settings.MILVUS_EXPR_BATCH_SIZE)
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            # json.dumps produces a correctly quoted/escaped string list literal
+            expr = f"candidate_id in {json.dumps(chunk)}"
+            self._execute(lambda collection: collection.delete(expr, timeout=settings.MILVUS_OPERATION_TIMEOUT))
+        return len(ids)
+
+    def search(self, vector: list, limit=10, expr=None, offset=0):
         search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = self._collection.search(
-            data=[vector], 
-            anns_field="embedding", 
-            param=search_params, 
+        return self._execute(lambda collection: collection.search(
+            data=[self._vector_data(vector)],
+            anns_field="embedding",
+            param=search_params,
             limit=limit,
+            offset=offset,
             expr=expr,
-            output_fields=["candidate_id", "location", "experience"]
-        )
-        return results
+            output_fields=["candidate_id", "location", "experience"],
+            timeout=settings.MILVUS_OPERATION_TIMEOUT
+        ))
+
+    def get_embeddings(self, candidate_ids: Iterable[str]) -> Dict[str, list]:
+        """Stored dense vectors by candidate ID (IDs not indexed are absent)."""
+        ids = list(dict.fromkeys(str(cid) for cid in candidate_ids if cid))
+        vectors = {}
+        batch_size = max(1, settings.MILVUS_EXPR_BATCH_SIZE)
+        for start in range(0, len(ids), batch_size):
+            expr = f"candidate_id in {json.dumps(ids[start:start + batch_size])}"
+            rows = self._execute(lambda collection: collection.query(
+                expr=expr,
+                output_fields=["candidate_id", "embedding"],
+                timeout=settings.MILVUS_OPERATION_TIMEOUT
+            ))
+            for row in rows:
+                vectors[row["candidate_id"]] = to_float_list(row["embedding"])
+        return vectors
+
+    def range_search(self, vectors: List[list], max_distance: float, limit=10):
+        """
+        Batched range search: for each vector, up to `limit` candidates whose (squared) L2
+        distance is below `max_distance`. One request per call, one result list per vector.
+        """
+        search_params = {"metric_type": "L2", "params": {"nprobe": 10, "radius": max_distance, "range_filter": 0.0}}
+        return self._execute(lambda collection: collection.search(
+            data=[self._vector_data(vector) for vector in vectors],
+            anns_field="embedding",
+            param=search_params,
+            limit=limit,
+            output_fields=["candidate_id"],
+            timeout=settings.MILVUS_OPERATION_TIMEOUT
+        ))
+
+    def hybrid_search(self, vector: list, sparse_vector: dict, limit=10, offset=0, expr=None,
+                      fusion="rrf", rrf_k=60, weights=(0.5, 0.5)):
+        """
+        Dense + sparse search fused server-side in a single request.
+        fusion="rrf" uses Reciprocal Rank Fusion; "weighted" uses (dense, sparse) weights.
+        """
+        requests = [
+            pymilvus.AnnSearchRequest(
+                data=[self._vector_data(vector)],
+                anns_field="embedding",
+                param={"metric_type": "L2", "params": {"nprobe": 10}},
+                limit=limit + offset,
+                expr=expr
+            )
+        ]
+        if sparse_vector:
+            requests.append(pymilvus.AnnSearchRequest(
+                data=[sparse_vector],
+                anns_field="sparse_embedding",
+                param={"metric_type": "IP", "params": {"drop_ratio_search": 0.2}},
+                limit=limit + offset,
+                expr=expr
+            ))
+
+        if fusion == "weighted":
+            ranker = pymilvus.WeightedRanker(*weights[:len(requests)])
+        else:
+            ranker = pymilvus.RRFRanker(rrf_k)
+
+        return self._execute(lambda collection: collection.hybrid_search(
+            reqs=requests,
+            rerank=ranker,
+            limit=limit,
+            offset=offset,
+            output_fields=["candidate_id", "location", "experience"],
+            timeout=settings.MILVUS_OPERATION_TIMEOUT
+        ))
 
 milvus_service = MilvusService()
@@ -1,44 +1,216 @@
-import fitz  # PyMuPDF
-import os
+import re
 import shutil
 import tempfile
+import threading
+import time
 import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
 from fastapi import UploadFile
 
+from app.core.cancellation import check_cancelled
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.utils.lazy_import import lazy_module
+
 logger = logging.getLogger("uvicorn")
 
+# PyMuPDF, imported with the first PDF
+fitz = lazy_module("fitz")
+
+# A token counts as a word if it is mostly letters (OCR noise is punctuation / digit soup)
+_TOKEN_RE = re.compile(r"\S+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def text_quality(text: str) -> float:
+    """
+    Share (0..1) of whitespace-separated tokens that look like words: at least two letters,
+    with letters making up most of the token. Clean text scores ~0.8+, garbled OCR well below.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return 0.0
+    words = 0
+    for token in tokens:
+        letters = len(_LETTER_RE.findall(token))
+        if letters >= 2 and letters >= 0.7 * len(token):
+            words += 1
+    return words / len(tokens)
+
+
+# A PDF held in memory (small uploads) or spooled to a temp file path
+PdfSource = Union[str, bytes]
+
+
+class PdfLimitError(ValueError):
+    """The document exceeds MAX_PDF_PAGES."""
+
+
+# Page kinds
+PAGE_TEXT = "text"    # has a usable text layer
+PAGE_IMAGE = "image"  # no text layer but images (scan, photo, appended diploma)
+PAGE_EMPTY = "empty"  # neither
+
+
+@dataclass
+class PageInfo:
+    number: int
+    kind: str
+    text: str = ""
+    # Image page whose local OCR output passed the quality check
+    recognized: bool = False
+
+
+@dataclass
+class ExtractedDocument:
+    pages: List[PageInfo] = field(default_factory=list)
+    # Extraction stopped at MAX_EXTRACTED_CHARS
+    truncated: bool = False
+
+    @property
+    def text(self) -> str:
+        # Page order is preserved; OCR'd pages sit between the typed ones
+        return "\n".join(page.text for page in self.pages)
+
+    @property
+    def ocr_used(self) -> bool:
+        return any(page.recognized for page in self.pages)
+
+    @property
+    def unrecognized_image_pages(self) -> List[int]:
+        return [page.number for page in self.pages if page.kind == PAGE_IMAGE and not page.recognized]
+
+
 class PdfService:
-    def extract_text_from_upload(self, file: UploadFile) -> str:
+    def __init__(self):
+        self._tessdata: Optional[str] = None
+        self._ocr_checked = False
+        self._lock = threading.Lock()
+
+    def ocr_available(self) -> bool:
+        """True when OCR is enabled and a local Tesseract install (tessdata) was found."""
+        if not settings.OCR_ENABLED:
+            return False
+        with self._lock:
+            if not self._ocr_checked:
+                self._ocr_checked = True
+                try:
+                    self._tessdata = fitz.get_tessdata(settings.TESSDATA_PREFIX or None)
+                except Exception as e:
+                    logger.warning(f"Local OCR disabled: {e}")
+            return self._tessdata is not None
+
+    def save_upload(self, file: UploadFile) -> str:
+        """Copies the upload to a temp file and returns its path; the caller removes it."""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            shutil.copyfileobj(file.file, tmp)
+            return tmp.name
+
+    def load_upload(self, file: UploadFile) -> PdfSource:
+        """
+        Small uploads (<= UPLOAD_SPOOL_BYTES, already in memory in Starlette's spooled file)
+        are returned as bytes; larger ones are streamed to a temp file whose path is returned.
+        """
+        if file.size is not None and file.size <= settings.UPLOAD_SPOOL_BYTES:
+            return file.file.read()
+        return self.save_upload(file)
+
+    def to_path(self, source: PdfSource) -> str:
+        """A file path for `source`; bytes are written to a temp file the caller removes."""
+        if isinstance(source, str):
+            return source
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            tmp.write(source)
+            return tmp.name
+
+    @staticmethod
+    def _open(source: PdfSource):
+        if isinstance(source, str):
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype="pdf")
+
+    def extract_document(self, source: PdfSource) -> ExtractedDocument:
         """
-        Saves upload to temp, extracts text via PyMuPDF.
+        Classifies each page (text layer / image-only / empty) and runs local OCR on the
+        image-only pages only, rasterized at OCR_DPI. Typed pages keep their text layer, so a
+        typed CV with a scanned diploma appended gets full text without OCRing the CV itself.
+        OCR output failing the quality check is dropped and the page left unrecognized.
+        Stops at MAX_EXTRACTED_CHARS; raises PdfLimitError above MAX_PDF_PAGES.
         """
-        tmp_path = None
+        document = ExtractedDocument()
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                shutil.copyfileobj(file.file, tmp)
-                tmp_path = tmp.name
-            
-            return self.extract_text(tmp_path)
-            
+            doc = self._open(source)
         except Exception as e:
-            logger.error(f"PDF Upload Error: {e}")
-            raise e
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except:
-                    pass
+            logger.error(f"PDF Extraction Error: {e}")
+            return document
 
-    def extract_text(self, file_path: str) -> str:
-        text = ""
-        try:
-            with fitz.open(file_path) as doc:
+        with doc:
+            if doc.page_count > settings.MAX_PDF_PAGES:
+                raise PdfLimitError(f"Document has {doc.page_count} pages (limit {settings.MAX_PDF_PAGES})")
+            remaining = settings.MAX_EXTRACTED_CHARS
+            try:
                 for page in doc:
-                    text += page.get_text() + "\n"
-            return text
+                    # Client gone: stop before extracting / OCRing another page
+                    check_cancelled("pdf_extraction")
+                    text = page.get_text()
+                    if len(text.strip()) >= settings.OCR_PAGE_MIN_CHARS:
+                        kind = PAGE_TEXT
+                    elif page.get_images(full=False):
+                        kind = PAGE_IMAGE
+                    else:
+                        kind = PAGE_EMPTY
+                    metrics.inc("pdf_pages_total", kind=kind)
+                    info = PageInfo(page.number, kind, text)
+
+                    if kind == PAGE_IMAGE and self.ocr_available():
+                        ocr_text = self._ocr_page(page)
+                        if text_quality(ocr_text) >= settings.OCR_MIN_QUALITY:
+                            info.text = ocr_text
+                            info.recognized = True
+
+                    if len(info.text) >= remaining:
+                        info.text = info.text[:remaining]
+                        document.pages.append(info)
+                        document.truncated = True
+                        break
+                    remaining -= len(info.text)
+                    document.pages.append(info)
+            except Exception as e:
+                logger.error(f"PDF Extraction Error: {e}")
+        return document
+
+    def _ocr_page(self, page) -> str:
+        started = time.perf_counter()
+        try:
+            textpage = page.get_textpage_ocr(
+                language=settings.OCR_LANGUAGE,
+                dpi=settings.OCR_DPI,
+                full=True,
+                tessdata=self._tessdata
+            )
+            return page.get_text(textpage=textpage)
         except Exception as e:
-            logger.error(f"PDF Extraction Error: {e}")
+            logger.warning(f"OCR failed on page {page.number}: {e}")
             return ""
+        finally:
+            metrics.observe("pdf_ocr_page_seconds", time.perf_counter() - started)
+
+    def render_pages(self, source: PdfSource, page_numbers: List[int], dpi: int) -> str:
+        """
+        Writes a new PDF holding only `page_numbers`, each rasterized to a JPEG at `dpi`
+        (the vision payload). Returns its temp path; the caller removes it.
+        """
+        with fitz.open() as out, self._open(source) as doc:
+            for number in page_numbers:
+                check_cancelled("pdf_rendering")
+                page = doc[number]
+                pixmap = page.get_pixmap(dpi=dpi)
+                image = out.new_page(width=page.rect.width, height=page.rect.height)
+                image.insert_image(image.rect, stream=pixmap.tobytes("jpeg", jpg_quality=settings.VISION_JPEG_QUALITY))
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                # No random trailer /ID: the same pages give the same file (and Gemini upload cache key)
+                tmp.write(out.tobytes(garbage=3, deflate=True, no_new_id=True))
+                return tmp.name
 
 pdf_service = PdfService()
@@ -0,0 +1,399 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+_CALLBACK_ATTEMPTS = 3
+_CALLBACK_TIMEOUT_SECONDS = 10
+# How often the shared store is scanned for records no worker will ever purge
+_STORE_SWEEP_INTERVAL_SECONDS = 300
+
+
+class TaskQueueFullError(RuntimeError):
+    """Too many tasks waiting; callers should retry later (HTTP 429)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Task queue is full")
+        self.retry_after = retry_after
+
+
+@dataclass
+class TaskRecord:
+    task_id: str
+    kind: str
+    status: str = STATUS_PENDING
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # HTTP status the synchronous endpoint would have answered with
+    status_code: Optional[int] = None
+    idempotency_key: Optional[str] = None
+    callback_url: Optional[str] = None
+    callback_status: Optional[str] = None
+    # Worker process running the task (shared store only)
+    owner_pid: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_SUCCEEDED, STATUS_FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "task_id": self.task_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+            "callback_status": self.callback_status,
+        }
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def callback_allowed(url: str) -> bool:
+    """Only http(s) callbacks to ASYNC_CALLBACK_ALLOWED_HOSTS (the service must not be an open relay)."""
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and parsed.hostname in settings.ASYNC_CALLBACK_ALLOWED_HOSTS
+
+
+class _TaskStore:
+    """
+    Task records as JSON files in a directory shared by the server's worker processes, so a
+    task submitted to one worker can be polled (or deduplicated) through any other.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _task_path(self, task_id: str) -> str:
+        return os.path.join(self.directory, f"{task_id}.json")
+
+    def _key_path(self, idempotency_key: str) -> str:
+        digest = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"key-{digest}")
+
+    def _write(self, path: str, content: str):
+        # Atomic replace: readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def save(self, record: TaskRecord):
+        self._write(self._task_path(record.task_id), json.dumps(asdict(record)))
+        if record.idempotency_key:
+            self._write(self._key_path(record.idempotency_key), record.task_id)
+
+    def load(self, task_id: str) -> Optional[TaskRecord]:
+        try:
+            with open(self._task_path(task_id), encoding="utf-8") as f:
+                return TaskRecord(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def load_by_key(self, idempotency_key: str) -> Optional[TaskRecord]:
+        try:
+            with open(self._key_path(idempotency_key), encoding="utf-8") as f:
+                task_id = f.read().strip()
+        except OSError:
+            return None
+        return self.load(task_id)
+
+    def delete(self, record: TaskRecord):
+        paths = [self._task_path(record.task_id)]
+        if record.idempotency_key and self._key_task_id(record.idempotency_key) == record.task_id:
+            paths.append(self._key_path(record.idempotency_key))
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _key_task_id(self, idempotency_key: str) -> Optional[str]:
+        try:
+            with open(self._key_path(idempotency_key), encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def records(self):
+        """Every stored record (unreadable ones skipped)."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                record = self.load(name[:-len(".json")])
+                if record is not None:
+                    yield record
+
+    def remove_orphan_keys(self):
+        """Idempotency keys whose task file is gone (deleted by another worker)."""
+        for name in os.listdir(self.directory):
+            if not name.startswith("key-"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    task_id = f.read().strip()
+                if not os.path.exists(self._task_path(task_id)):
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class TaskQueue:
+    """
+    Submit / poll execution of long AI calls on a bounded worker pool.
+    Records are kept for ASYNC_TASK_RESULT_TTL_SECONDS after they finish, so a client that
+    timed out can fetch the result again; submitting with a known idempotency key returns
+    the existing task instead of redoing the work (unless it failed).
+    With `store_dir`, records are also written there for the other worker processes.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, result_ttl: float,
+                 clock: Callable[[], float] = time.time, store_dir: Optional[str] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._clock = clock
+        self._store = _TaskStore(store_dir) if store_dir else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-task")
+        self._lock = threading.Lock()
+        self._records: Dict[str, TaskRecord] = {}
+        self._by_key: Dict[str, str] = {}
+        # (finished_at, task_id) in completion order, for O(1) amortized expiry
+        self._finished = deque()
+        self._pending = 0
+        self._running = 0
+        self._next_sweep = 0.0
+
+    def submit(self, kind: str, fn: Callable[[], Any], idempotency_key: Optional[str] = None,
+               callback_url: Optional[str] = None) -> Tuple[TaskRecord, bool]:
+        """
+        Queues `fn` and returns (record, True); or (existing record, False) when a task with the
+        same idempotency key is pending, running or finished within the TTL (`fn` never runs).
+        Raises TaskQueueFullError when ASYNC_TASK_MAX_PENDING tasks are already waiting.
+        """
+        with self._lock:
+            self._purge()
+            if idempotency_key:
+                existing = self._records.get(self._by_key.get(idempotency_key, ""))
+                if existing is None and self._store:
+                    existing = self._load_live(self._store.load_by_key(idempotency_key))
+                if existing is not None and existing.status != STATUS_FAILED:
+                    metrics.inc("async_tasks_total", kind=kind, outcome="deduplicated")
+                    return existing, False
+
+            if self._pending >= self.max_pending:
+                metrics.inc("async_tasks_total", kind=kind, outcome="rejected")
+                raise TaskQueueFullError(retry_after=5)
+
+            record = TaskRecord(
+                task_id=uuid.uuid4().hex,
+                kind=kind,
+                created_at=self._clock(),
+                idempotency_key=idempotency_key,
+                callback_url=callback_url
+            )
+            self._records[record.task_id] = record
+            if idempotency_key:
+                self._by_key[idempotency_key] = record.task_id
+            self._pending += 1
+            self._save(record)
+
+        metrics.inc("async_tasks_total", kind=kind, outcome="accepted")
+        self._executor.submit(self._run, record, fn)
+        self._sweep_store()
+        return record, True
+
+    def get(self, task_id: str) -> Optional[TaskRecord]:
+        with self._lock:
+            self._purge()
+            record = self._records.get(task_id)
+            if record is None and self._store:
+                # Submitted to another worker process
+                record = self._load_live(self._store.load(task_id))
+            return record
+
+    def _load_live(self, record: Optional[TaskRecord]) -> Optional[TaskRecord]:
+        """
+        `record` from the store, or None (and its files removed) once past the TTL.
+        An unfinished record whose worker process is gone (recycled or killed mid-task) is
+        failed with a 503, so its idempotency key can be resubmitted.
+        """
+        if record is None:
+            return None
+        if not record.finished and record.owner_pid and record.owner_pid != os.getpid() \
+                and not _process_alive(record.owner_pid):
+            self._abandon(record, "Worker stopped before the task finished, please resubmit")
+            self._save(record)
+        if record.finished_at is not None and record.finished_at < self._clock() - self.result_ttl:
+            self._store.delete(record)
+            return None
+        return record
+
+    def _abandon(self, record: TaskRecord, error: str):
+        record.status, record.status_code = STATUS_FAILED, 503
+        record.error = error
+        record.finished_at = self._clock()
+
+    def _sweep_store(self):
+        """
+        Drops expired (and fails orphaned) records of every worker from the shared store:
+        each worker only purges the records it created, and recycled workers purge nothing.
+        """
+        with self._lock:
+            now = self._clock()
+            if not self._store or now < self._next_sweep:
+                return
+            self._next_sweep = now + min(self.result_ttl, _STORE_SWEEP_INTERVAL_SECONDS)
+        try:
+            for record in self._store.records():
+                if record.task_id not in self._records:
+                    self._load_live(record)
+            self._store.remove_orphan_keys()
+        except OSError as e:
+            logger.warning(f"Task store sweep failed: {e}")
+
+    def _save(self, record: TaskRecord):
+        if not self._store:
+            return
+        if record.owner_pid is None:
+            record.owner_pid = os.getpid()
+        try:
+            self._store.save(record)
+        except OSError as e:
+            # Still pollable through this worker
+            logger.warning(f"Could not persist task {record.task_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "running": self._running, "stored": len(self._records)}
+
+    def shutdown(self, timeout: float = 0):
+        """
+        Drops queued tasks (marked failed with 503 so clients resubmit elsewhere) and waits up
+        to `timeout` seconds for running ones to finish; those still running then are failed
+        the same way, since the process exits before they could be recorded.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for record in self._records.values():
+                if record.status == STATUS_PENDING:
+                    self._abandon(record, "Service restarting, please resubmit")
+                    self._save(record)
+            self._pending = 0
+
+        deadline = time.monotonic() + timeout
+        while self.stats()["running"] and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        with self._lock:
+            for record in self._records.values():
+                if record.status == STATUS_RUNNING:
+                    self._abandon(record, "Service restarted before the task finished, please resubmit")
+                    self._save(record)
+
+    def _run(self, record: TaskRecord, fn: Callable[[], Any]):
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+            record.status = STATUS_RUNNING
+            self._save(record)
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = fn()
+            status, status_code = STATUS_SUCCEEDED, 200
+        except HTTPException as e:
+            status, status_code, error = STATUS_FAILED, e.status_code, str(e.detail)
+        except Exception as e:
+            logger.error(f"Async task {record.task_id} ({record.kind}) failed: {e}")
+            # Dependency circuit open -> 503, like the synchronous endpoints
+            status, status_code, error = STATUS_FAILED, 503 if hasattr(e, "retry_after") else 500, str(e)
+
+        with self._lock:
+            self._running -= 1
+            record.result, record.error, record.status_code = result, error, status_code
+            record.finished_at = self._clock()
+            record.status = status
+            self._finished.append((record.finished_at, record.task_id))
+            self._save(record)
+        metrics.observe("async_task_seconds", time.perf_counter() - started, kind=record.kind)
+        metrics.inc("async_tasks_finished_total", kind=record.kind, status=record.status)
+
+        if record.callback_url:
+            self._send_callback(record)
+
+    def _send_callback(self, record: TaskRecord):
+        body = json.dumps(record.to_dict()).encode("utf-8")
+        for attempt in range(_CALLBACK_ATTEMPTS):
+            try:
+                request = urllib.request.Request(
+                    record.callback_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+                )
+                with urllib.request.urlopen(request, timeout=_CALLBACK_TIMEOUT_SECONDS):
+                    pass
+                record.callback_status = "delivered"
+                self._save(record)
+                return
+            except Exception as e:
+                logger.warning(f"Callback for task {record.task_id} failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < _CALLBACK_ATTEMPTS:
+                    time.sleep(2 ** attempt)
+        # The result can still be polled
+        record.callback_status = "failed"
+        self._save(record)
+
+    def _purge(self):
+        """Drops finished records older than the TTL. Caller holds the lock."""
+        cutoff = self._clock() - self.result_ttl
+        while self._finished and self._finished[0][0] < cutoff:
+            _, task_id = self._finished.popleft()
+            record = self._records.pop(task_id, None)
+            if record and record.idempotency_key and self._by_key.get(record.idempotency_key) == task_id:
+                del self._by_key[record.idempotency_key]
+            if record and self._store:
+                self._store.delete(record)
+
+
+task_queue = TaskQueue(
+    max_workers=settings.ASYNC_TASK_WORKERS,
+    max_pending=settings.ASYNC_TASK_MAX_PENDING,
+    result_ttl=settings.ASYNC_TASK_RESULT_TTL_SECONDS,
+    store_dir=settings.ASYNC_TASK_STORE_DIR or None
+)
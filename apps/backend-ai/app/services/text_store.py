@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn")
+
+_HANDLE_RE = re.compile(r"^[0-9a-f]{64}$")
+# After an eviction pass the store is back under this share of its limit
+_PRUNE_TARGET = 0.9
+
+
+class TextHandleNotFoundError(LookupError):
+    """The text behind a handle is not (or no longer) stored here; the caller sends the text itself."""
+
+    def __init__(self, handle: str):
+        super().__init__(f"Unknown text_handle {handle!r}: send the text instead")
+        self.handle = handle
+
+
+def text_handle(text: str) -> str:
+    """The handle of a text: its SHA-256 (UTF-8), so a caller holding the text can compute it too."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TextStore:
+    """
+    Extracted CV texts, zlib-compressed in files named by content hash, in a directory shared
+    by the server's worker processes. /parse-cv returns the handle of the text it extracted,
+    so screening and vectorizing can name the text instead of sending it back.
+    Least recently used texts are evicted past `max_bytes` (the size each worker knows of:
+    it rescans the directory, including other workers' writes, at every eviction pass).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, compress_level: int = 6):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = self._scan()[1]
+
+    def _path(self, handle: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, handle[:2], handle)
+
+    def put(self, text: str) -> str:
+        handle = text_handle(text)
+        path = self._path(handle)
+        if os.path.exists(path):
+            self._touch(path)
+            return handle
+
+        data = zlib.compress(text.encode("utf-8"), self.compress_level)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic replace: readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._bytes += len(data)
+            prune = self._bytes > self.max_bytes
+        if prune:
+            self._prune()
+        return handle
+
+    def get(self, handle: str) -> str:
+        """The text behind `handle`; TextHandleNotFoundError when it is not stored."""
+        if not _HANDLE_RE.match(handle or ""):
+            raise TextHandleNotFoundError(handle)
+        path = self._path(handle)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            metrics.inc("text_store_lookups_total", outcome="miss")
+            raise TextHandleNotFoundError(handle)
+        try:
+            text = zlib.decompress(data).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError):
+            text = None
+        if text is None or text_handle(text) != handle:
+            # Damaged file: drop it, the caller resends the text
+            logger.warning(f"Text store entry {handle} is corrupt, removing it")
+            self._remove(path)
+            metrics.inc("text_store_lookups_total", outcome="miss")
+            raise TextHandleNotFoundError(handle)
+        self._touch(path)
+        metrics.inc("text_store_lookups_total", outcome="hit")
+        return text
+
+    def _scan(self) -> tuple:
+        """(mtime, size, path) of every stored text, and their total size."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not _HANDLE_RE.match(name):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _prune(self):
+        entries, total = self._scan()
+        target = self.max_bytes * _PRUNE_TARGET
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._bytes = total
+        metrics.inc("text_store_evictions_total", evicted)
+
+    @staticmethod
+    def _touch(path: str):
+        # mtime is the recency used by eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+text_store = TextStore(
+    directory=settings.TEXT_STORE_DIR,
+    max_bytes=settings.TEXT_STORE_MAX_MB * 1024 * 1024
+)
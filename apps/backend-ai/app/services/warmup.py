@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.gemini_service import gemini_service
+from app.services.milvus_service import milvus_service
+from app.services.pdf_service import pdf_service, fitz
+
+logger = logging.getLogger("uvicorn")
+
+_QUERY_WORKERS = 8
+
+
+def load_warmup_queries(path: str, limit: int) -> List[str]:
+    """Non-empty, de-duplicated lines of `path` (first `limit`)."""
+    with open(path, encoding="utf-8") as f:
+        queries = dict.fromkeys(line.strip() for line in f if line.strip())
+    return list(queries)[:limit]
+
+
+class Warmup:
+    """
+    Startup warm-up, run on a background thread so the server still starts at once: parses a
+    tiny PDF (PyMuPDF init), opens the Gemini channels, embeds frequent recruiter queries into
+    the query-embedding cache, and runs one search once Milvus is connected (segment load).
+    A failed step is logged and skipped; /ready reports unavailable until every step has run.
+    """
+
+    def __init__(self):
+        self.state = "pending"
+        self.steps: Dict[str, dict] = {}
+        self._done = threading.Event()
+        self._thread = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def start(self):
+        if not settings.WARMUP_ENABLED:
+            self.state = "disabled"
+            self._done.set()
+            return
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def run(self):
+        self.state = "running"
+        started = time.perf_counter()
+        for name, step in (
+            ("pdf", self._warm_pdf),
+            ("gemini", self._warm_gemini),
+            ("queries", self._warm_queries),
+            ("milvus", self._warm_milvus),
+        ):
+            step_started = time.perf_counter()
+            try:
+                result = step() or {}
+                status = result.pop("status", "ok")
+                self.steps[name] = {"status": status, **result}
+            except Exception as e:
+                logger.warning(f"Warm-up step '{name}' failed: {e}")
+                self.steps[name] = {"status": "failed", "error": str(e)}
+            elapsed = time.perf_counter() - step_started
+            self.steps[name]["seconds"] = round(elapsed, 3)
+            metrics.observe("warmup_step_seconds", elapsed, step=name)
+
+        self.state = "done"
+        self._done.set()
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s: {self.steps}")
+
+    def health(self) -> dict:
+        return {"state": self.state, "steps": dict(self.steps)}
+
+    @staticmethod
+    def _warm_pdf():
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Warm-up resume: Python developer, five years of experience.")
+        pdf_service.extract_document(doc.tobytes())
+
+    @staticmethod
+    def _warm_gemini():
+        if not settings.GEMINI_API_KEY:
+            return {"status": "skipped"}
+        gemini_service.warm_up()
+
+    @staticmethod
+    def _warm_queries():
+        if not settings.WARMUP_QUERIES_FILE or not settings.GEMINI_API_KEY:
+            return {"status": "skipped"}
+        queries = load_warmup_queries(settings.WARMUP_QUERIES_FILE, settings.WARMUP_MAX_QUERIES)
+        with ThreadPoolExecutor(max_workers=_QUERY_WORKERS, thread_name_prefix="warmup-embed") as executor:
+            list(executor.map(lambda query: gemini_service.embed_text(query, task_type="retrieval_query"), queries))
+        return {"queries": len(queries)}
+
+    @staticmethod
+    def _warm_milvus():
+        if not milvus_service.wait_until_connected(settings.WARMUP_MILVUS_WAIT_SECONDS):
+            raise TimeoutError("Milvus not connected")
+        milvus_service.search([0.0] * settings.DIMENSION, limit=1)
+
+
+warmup = Warmup()
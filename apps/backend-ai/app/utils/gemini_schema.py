@@ -0,0 +1,48 @@
+from typing import Any, Dict
+
+from pydantic import TypeAdapter
+
+# JSON Schema keys Gemini's response_schema understands
+_PASSTHROUGH_KEYS = ("description", "enum", "format")
+
+
+def to_gemini_schema(response_type: Any) -> Dict[str, Any]:
+    """
+    Converts a Pydantic model (or a typing construct such as List[Model]) into the
+    OpenAPI subset accepted by Gemini's response_schema.
+    Unlike passing the class directly, this inlines $refs, marks every field without a
+    default as required, and tolerates defaults / Optional fields.
+    """
+    json_schema = TypeAdapter(response_type).json_schema()
+    return _convert(json_schema, json_schema.get("$defs", {}))
+
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        return _convert(defs[node["$ref"].split("/")[-1]], defs)
+
+    # Optional[X] -> anyOf [X, null]
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _convert(options[0], defs) if options else {"type": "STRING"}
+        if len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+        if "description" in node:
+            converted["description"] = node["description"]
+        return converted
+
+    schema: Dict[str, Any] = {"type": node.get("type", "string").upper()}
+    for key in _PASSTHROUGH_KEYS:
+        if key in node:
+            schema[key] = node[key]
+
+    if schema["type"] == "OBJECT":
+        properties = node.get("properties", {})
+        schema["properties"] = {name: _convert(prop, defs) for name, prop in properties.items()}
+        required = node.get("required", [])
+        if required:
+            schema["required"] = list(required)
+    elif schema["type"] == "ARRAY":
+        schema["items"] = _convert(node.get("items", {}), defs)
+
+    return schema
@@ -0,0 +1,144 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from app.core import cancellation
+from app.core.cancellation import CancellationToken
+from app.core.metrics import metrics
+
+OUTCOME_PRIMARY = "primary"
+OUTCOME_HEDGE = "hedge"
+
+
+class Hedger:
+    """
+    Hedged requests for an idempotent, latency-sensitive call: when the first attempt is
+    still running after the `percentile` latency of recent attempts, an identical second
+    attempt starts and whichever answers first wins. The loser's token is cancelled, so it
+    makes no further retry; its in-flight HTTP call cannot be aborted and is left to finish.
+    `budget` caps hedges at that fraction of calls (earned per call, spent per hedge), so an
+    overloaded upstream never sees more than (1 + budget) times the traffic.
+    No hedging until `min_samples` latencies have been seen.
+    """
+
+    def __init__(self, name: str, executor: ThreadPoolExecutor, percentile: float, budget: float,
+                 min_samples: int, min_delay: float, window: int = 200, clock=time.monotonic):
+        self.name = name
+        self._executor = executor
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        # Hedges that may still be sent; at most 10 saved up for a burst
+        self._credits = 0.0
+        self._max_credits = 10.0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        with self._lock:
+            if len(self._latencies) < max(1, self.min_samples):
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        return max(self.min_delay, ordered[max(0, index)])
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _earn(self):
+        with self._lock:
+            self._credits = min(self._max_credits, self._credits + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            self.hedged += 1
+            return True
+
+    @staticmethod
+    def _isolated(token: CancellationToken) -> contextvars.Context:
+        """A copy of the caller's context where `token` (not the request's) cancels the attempt."""
+        context = contextvars.copy_context()
+        context.run(cancellation._current.set, token)
+        return context
+
+    def _start(self, fn: Callable) -> tuple:
+        """Runs `fn` on the hedging pool with its own cancellation token."""
+        token = CancellationToken()
+        started = self._clock()
+
+        def finished(future: Future):
+            # Every attempt's latency counts, including losers that finish later (no bias)
+            if not future.cancelled() and future.exception() is None:
+                self.record(self._clock() - started)
+
+        future = self._executor.submit(self._isolated(token).run, fn)
+        future.add_done_callback(finished)
+        return future, token
+
+    def call(self, fn: Callable):
+        self._earn()
+        delay = self.delay()
+        if delay is None:
+            started = self._clock()
+            result = self._isolated(CancellationToken()).run(fn)
+            self.record(self._clock() - started)
+            return result
+
+        primary, primary_token = self._start(fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not self._spend():
+            metrics.inc("hedge_budget_exhausted_total", op=self.name)
+            return primary.result()
+
+        metrics.inc("hedged_requests_total", op=self.name)
+        hedge, hedge_token = self._start(fn)
+        attempts = {primary: (OUTCOME_PRIMARY, primary_token), hedge: (OUTCOME_HEDGE, hedge_token)}
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                outcome, _ = attempts[future]
+                self._cancel_others(attempts, future)
+                metrics.inc("hedge_wins_total", op=self.name, winner=outcome)
+                if outcome == OUTCOME_HEDGE:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+        # Both attempts failed
+        raise error
+
+    @staticmethod
+    def _cancel_others(attempts: dict, winner: Future):
+        for future, (_, token) in attempts.items():
+            if future is not winner:
+                token.cancel()
+                future.cancel()
+
+    def stats(self) -> dict:
+        delay = self.delay()
+        with self._lock:
+            return {
+                "samples": len(self._latencies),
+                "delay_seconds": round(delay, 3) if delay is not None else None,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+            }
@@ -0,0 +1,210 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+# Tiers, cheapest first
+TIER_DIRECT = "direct"  # the whole response is valid JSON
+TIER_SCAN = "scan"      # valid JSON embedded in noise (prose, markdown fences, trailing loops)
+TIER_REPAIR = "repair"  # common LLM defects fixed (trailing commas, truncation, raw newlines)
+
+# Max opening brackets tried by the scan / repair tiers
+MAX_CANDIDATES = 8
+
+_decoder = json.JSONDecoder()
+_OPENER_RE = re.compile(r"[\[{]")
+_CLOSERS = {"{": "}", "[": "]"}
+
+# One token per string / structural char / run of anything else; strings may be unterminated (truncation)
+_TOKEN_RE = re.compile(
+    r'(?P<str>"(?P<body>[^"\\]*(?:\\.[^"\\]*)*)(?P<close>")?)'
+    r'|(?P<punct>[{}\[\],:])'
+    r'|(?P<other>[^"{}\[\],:]+)',
+    re.S
+)
+_CONTROL_RE = re.compile(r"[\x00-\x1f]")
+_ESCAPE_RE = re.compile(r"\\(.)", re.S)
+_PY_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class JsonExtractionError(ValueError):
+    pass
+
+
+@dataclass
+class ExtractionResult:
+    value: Any
+    tier: str
+
+
+def extract_json(text: str) -> ExtractionResult:
+    """
+    Locates and parses the JSON value in an LLM response.
+    Runs in linear time: the scan tier uses the C JSON scanner (raw_decode) from each
+    candidate opening bracket, and the repair tier is a single regex-tokenized pass.
+    Raises JsonExtractionError if no tier succeeds.
+    """
+    if not text:
+        raise JsonExtractionError("Failed to parse AI response")
+
+    # 1. Direct
+    try:
+        return ExtractionResult(json.loads(text), TIER_DIRECT)
+    except ValueError:
+        pass
+
+    openers = _find_openers(text)
+    if not openers:
+        raise JsonExtractionError("Failed to parse AI response")
+
+    # 2. Scan: longest value decodable from one of the openers
+    scanned, scanned_start, failed = _scan(text, openers)
+
+    # 3. Repair: an earlier opener that failed to decode may be a broken value enclosing
+    # the scanned one (e.g. a truncated array of objects), so it takes precedence
+    for start in failed:
+        if scanned is not None and start >= scanned_start:
+            break
+        repaired = repair_json(text, start)
+        if repaired is not None:
+            return ExtractionResult(repaired[0], TIER_REPAIR)
+
+    if scanned is not None:
+        return ExtractionResult(scanned[0], TIER_SCAN)
+
+    raise JsonExtractionError("Failed to parse AI response")
+
+
+def _find_openers(text: str) -> List[int]:
+    openers = []
+    for match in _OPENER_RE.finditer(text):
+        openers.append(match.start())
+        if len(openers) >= MAX_CANDIDATES:
+            break
+    return openers
+
+
+def _scan(text: str, openers: List[int]) -> Tuple[Optional[Tuple[Any]], int, List[int]]:
+    """Returns (1-tuple of the longest decoded value or None, its start, openers that failed)."""
+    failed = []
+    best = None
+    best_start = -1
+    best_len = 0
+    skip_until = -1
+    for start in openers:
+        if start < skip_until:
+            # Nested inside a value already decoded
+            continue
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except ValueError:
+            failed.append(start)
+            continue
+        if end - start > best_len:
+            best, best_start, best_len = (value,), start, end - start
+        skip_until = end
+    return best, best_start, failed
+
+
+def _fix_string_body(body: str) -> str:
+    if "\\" in body:
+        # Invalid escapes (e.g. \' or \x) become literal backslashes
+        body = _ESCAPE_RE.sub(
+            lambda m: m.group(0) if m.group(1) in '"\\/bfnrtu' else "\\\\" + m.group(1),
+            body
+        )
+    if _CONTROL_RE.search(body):
+        body = _CONTROL_RE.sub(lambda m: _CONTROL_ESCAPES.get(m.group(), "\\u%04x" % ord(m.group())), body)
+    return body
+
+
+def _strip_trailing(out: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+
+
+def _try_loads(parts: List[str]) -> Optional[Tuple[Any]]:
+    try:
+        return (json.loads("".join(parts)),)
+    except ValueError:
+        return None
+
+
+def repair_json(text: str, start: int = 0) -> Optional[Tuple[Any]]:
+    """
+    Single pass over `text[start:]` (which must begin with an opening bracket) fixing:
+    trailing commas, raw control characters / invalid escapes in strings, Python literals,
+    mismatched closers, and truncation (unterminated strings, missing closing brackets).
+    Returns a 1-tuple with the parsed value, or None.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # (len(out) before the comma, stack at that point): where to cut a truncated trailing element
+    last_comma = None
+    # (len(out) after the opener, stack at that point): fallback when no element is complete
+    last_open = None
+
+    for match in _TOKEN_RE.finditer(text, start):
+        kind = match.lastgroup
+        if kind == "str":
+            out.append('"' + _fix_string_body(match.group("body")) + '"')
+            if match.group("close") is None:
+                break  # unterminated: the response was cut off here
+        elif kind == "punct":
+            char = match.group()
+            if char in "{[":
+                stack.append(char)
+                out.append(char)
+                last_open = (len(out), list(stack))
+            elif char in "}]":
+                _strip_trailing(out)
+                if out and out[-1] == ",":
+                    out.pop()
+                opener = "{" if char == "}" else "["
+                if opener not in stack:
+                    continue  # stray closer
+                while stack[-1] != opener:
+                    out.append(_CLOSERS[stack.pop()])
+                stack.pop()
+                out.append(char)
+                if not stack:
+                    return _try_loads(out)
+            elif char == ",":
+                last_comma = (len(out), list(stack))
+                out.append(char)
+            else:
+                out.append(char)
+        else:
+            token = match.group()
+            if "T" in token or "F" in token or "N" in token:
+                token = _PY_LITERAL_RE.sub(lambda m: _PY_LITERALS[m.group()], token)
+            out.append(token)
+
+    if not stack:
+        return None
+
+    # Truncated: complete what we have
+    completed = list(out)
+    _strip_trailing(completed)
+    if completed and completed[-1] == ",":
+        completed.pop()
+    elif completed and completed[-1] == ":":
+        completed.append("null")
+    completed.extend(_CLOSERS[opener] for opener in reversed(stack))
+    result = _try_loads(completed)
+    if result is not None:
+        return result
+
+    # Drop the partial last element (e.g. a cut-off key or literal),
+    # or failing that everything after the innermost opener
+    for cut_point in (last_comma, last_open):
+        if cut_point is None:
+            continue
+        cut, cut_stack = cut_point
+        result = _try_loads(out[:cut] + [_CLOSERS[opener] for opener in reversed(cut_stack)])
+        if result is not None:
+            return result
+
+    return None
@@ -0,0 +1,148 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Parser phases inside the top-level object
+_KEY = "key"
+_COLON = "colon"
+_VALUE = "value"
+
+# Events returned by JsonFieldStream.feed
+EVENT_DELTA = "delta"  # (EVENT_DELTA, field, decoded text appended to a string field still being written)
+EVENT_FIELD = "field"  # (EVENT_FIELD, field, complete value)
+
+
+class JsonFieldStream:
+    """
+    Incremental parser for a top-level JSON object arriving in chunks (streamed LLM output).
+    Each character is scanned once; a field is emitted as soon as its value is complete,
+    and string fields also emit decoded deltas while they are being written.
+    Text before the opening brace (e.g. a markdown fence) and after the closing brace is ignored.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._phase = _KEY
+        self._in_string = False
+        # -1: right after a backslash, n > 0: hex digits left in a \uXXXX escape
+        self._escape_remaining = 0
+        self._escape_start = 0
+        self._key: Optional[str] = None
+        self._key_start = 0
+        self._value_start: Optional[int] = None
+        self._value_is_string = False
+        self._delta_pos = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        if self.done or not chunk:
+            return events
+
+        self._text += chunk
+        text = self._text
+        length = len(text)
+        i = self._pos
+        while i < length:
+            char = text[i]
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._phase = _KEY
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape_remaining == -1:
+                    self._escape_remaining = 4 if char == "u" else 0
+                elif self._escape_remaining:
+                    self._escape_remaining -= 1
+                elif char == "\\":
+                    self._escape_remaining = -1
+                    self._escape_start = i
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._phase == _KEY:
+                        self._key = _loads(text[self._key_start:i + 1])
+                        self._phase = _COLON
+                    elif self._is_top_string_value():
+                        self._emit_delta(events, i)
+                i += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._phase == _KEY:
+                    self._key_start = i
+                elif self._depth == 1 and self._phase == _VALUE and self._value_start is None:
+                    self._value_start = i
+                    self._value_is_string = True
+                    self._delta_pos = i + 1
+            elif char in "{[":
+                if self._depth == 1 and self._phase == _VALUE and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 1:
+                    self._finish_value(events, i)
+                    self._depth = 0
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ",":
+                    self._finish_value(events, i)
+                    self._phase = _KEY
+                elif char == ":" and self._phase == _COLON:
+                    self._phase = _VALUE
+                    self._value_start = None
+                    self._value_is_string = False
+                elif self._phase == _VALUE and self._value_start is None and not char.isspace():
+                    self._value_start = i
+            i += 1
+
+        self._pos = i
+        if self._in_string and self._is_top_string_value():
+            # Stop before an escape sequence that is still incomplete
+            self._emit_delta(events, self._escape_start if self._escape_remaining else i)
+        return events
+
+    def _is_top_string_value(self) -> bool:
+        return self._depth == 1 and self._phase == _VALUE and self._value_is_string
+
+    def _emit_delta(self, events: list, end: int):
+        if end > self._delta_pos:
+            try:
+                delta = _loads('"' + self._text[self._delta_pos:end] + '"')
+            except ValueError:
+                # Invalid escape: the complete value is still reported (or repaired) at the end
+                delta = None
+            if delta:
+                events.append((EVENT_DELTA, self._key, delta))
+            self._delta_pos = end
+
+    def _finish_value(self, events: list, end: int):
+        if self._phase != _VALUE or self._value_start is None or self._key is None:
+            return
+        raw = self._text[self._value_start:end].strip()
+        self._value_start = None
+        self._value_is_string = False
+        try:
+            value = _loads(raw)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        events.append((EVENT_FIELD, self._key, value))
+
+
+def _loads(raw: str) -> Any:
+    # strict=False: models sometimes emit raw newlines / tabs inside strings
+    return json.loads(raw, strict=False)
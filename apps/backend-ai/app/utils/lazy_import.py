@@ -0,0 +1,24 @@
+import importlib
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for a heavy SDK module (google.generativeai, pymilvus, fitz): the real import
+    happens on first attribute access instead of at process start.
+    Thread-safe through the interpreter's per-module import lock.
+    """
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        value = getattr(module, attr)
+        # Later lookups hit the instance dict and skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_module(name: str) -> ModuleType:
+    return LazyModule(name)
@@ -0,0 +1,66 @@
+import re
+import unicodedata
+import zlib
+from typing import List, Optional, Set
+
+import numpy as np
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, accents stripped, punctuation and layout collapsed to single spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def shingles(text: str, size: int = 3) -> Set[int]:
+    """32-bit hashes of the word `size`-grams of the normalized text."""
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class MinHasher:
+    """
+    MinHash signatures (numpy, vectorized over permutations) and their LSH band keys.
+    With `bands` bands of `rows` rows, two documents with Jaccard similarity s share at
+    least one band key with probability 1 - (1 - s^rows)^bands.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_hashes: Set[int]) -> Optional[np.ndarray]:
+        if not shingle_hashes:
+            return None
+        values = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes))
+        # (shingles, num_perm); uint64 arithmetic wraps, which keeps the family well mixed
+        permuted = np.bitwise_and((np.outer(values, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = signature.reshape(self.bands, self.rows)
+        return [bytes([band]) + rows[band].tobytes() for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the underlying shingle sets."""
+        return float(np.count_nonzero(first == second)) / len(first)
+
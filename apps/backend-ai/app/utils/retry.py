@@ -0,0 +1,63 @@
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 8.0
+    # Overall budget for all attempts + backoff sleeps, in seconds
+    deadline: float = 60.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the sleep after `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+def call_with_retry(
+    fn: Callable[[float], object],
+    policy: RetryPolicy,
+    is_retryable: Callable[[Exception], bool],
+    breaker: Optional[CircuitBreaker] = None,
+    sleep=time.sleep,
+    clock=time.monotonic,
+):
+    """
+    Calls `fn(timeout)` where `timeout` is the time left before the policy deadline.
+    Only errors accepted by `is_retryable` are retried, and only those count against the breaker.
+    Raises CircuitOpenError (from the breaker) without calling `fn` while the circuit is open.
+    """
+    deadline = clock() + policy.deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker:
+            breaker.check()
+
+        remaining = deadline - clock()
+        try:
+            result = fn(remaining)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker:
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # The dependency answered; the request itself was bad
+                    breaker.record_success()
+            if not retryable or attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt)
+            if clock() + delay >= deadline:
+                raise
+            sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
@@ -0,0 +1,67 @@
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+from app.core.config import settings
+
+# Keeps tech tokens like "c++", "c#", "node.js" together
+TOKEN_PATTERN = re.compile(r"\w[\w+#.]*")
+
+STOPWORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "will", "with",
+    # French
+    "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "en", "est", "et",
+    "la", "le", "les", "leur", "ou", "par", "pour", "sur", "un", "une",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group().rstrip(".")
+        if len(token) < 2 and token not in ("c", "r"):
+            continue
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+    return tokens
+
+
+def _term_id(token: str) -> int:
+    # Stable across processes (unlike hash()); Milvus sparse indices must be < 2^32 - 1
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+# Outside the range of _term_id: stands in for the terms of a profile that has none, so the
+# stored row is never empty, and no query can match it
+EMPTY_DOCUMENT_TERM = 0x80000000
+
+
+def encode_document(text: str) -> Dict[int, float]:
+    """
+    BM25 term-frequency weights for a stored profile.
+    IDF is not known client-side, so it is left to the query side (uniform weights);
+    the TF saturation and length normalisation are what keep long CVs from dominating.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return {}
+
+    k1 = settings.SPARSE_BM25_K1
+    b = settings.SPARSE_BM25_B
+    length_norm = 1 - b + b * (len(tokens) / settings.SPARSE_AVG_DOC_LENGTH)
+
+    vector: Dict[int, float] = {}
+    for token, tf in Counter(tokens).items():
+        weight = tf * (k1 + 1) / (tf + k1 * length_norm)
+        term_id = _term_id(token)
+        vector[term_id] = vector.get(term_id, 0.0) + weight
+    return vector
+
+
+def encode_query(text: str) -> Dict[int, float]:
+    return {_term_id(token): 1.0 for token in set(tokenize(text))}
@@ -0,0 +1,7 @@
+import json
+from typing import Any
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encodes one server-sent event; `data` is JSON-serialised onto a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -1,31 +1,78 @@
 import logging
-import logging
-from fastapi import FastAPI
+import math
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from starlette.formparsers import MultiPartParser
 
+from app.core import admission, bulkhead
+from app.core.bulkhead import BulkheadFullError
 from app.core.config import settings
-from app.routers import candidates, jobs, interviews, tasks
+from app.core.metrics import metrics
+from app.core.memory_watchdog import MemoryWatchdog
+from app.core.admission import AdmissionControlMiddleware
+from app.core.cancellation import CancellationMiddleware
+from app.core.middleware import CompressionMiddleware, RequestSizeLimitMiddleware
+from app.core.responses import FastJSONResponse
+from app.routers import candidates, jobs, interviews, tasks, dedup, async_tasks
+from app.services.milvus_service import milvus_service, MilvusUnavailableError
+from app.services.gemini_service import gemini_service, GeminiUnavailableError
+from app.services.task_queue import task_queue, TaskQueueFullError
+from app.services.text_store import text_store
+from app.services.warmup import warmup
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("uvicorn")
 
-# Configure Gemini
-
+# Per worker process (see serve.py)
+memory_watchdog = MemoryWatchdog(
+    max_rss_bytes=settings.WORKER_MAX_RSS_MB * 1024 * 1024,
+    interval=settings.WORKER_MEMORY_CHECK_SECONDS
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Milvus Setup via Service
-    try:
-        from app.services.milvus_service import milvus_service
-        milvus_service.connect()
-    except Exception as e:
-        logger.error(f"❌ Milvus Connection Failed: {e}")
+    # Milvus connects and loads the collection in the background (retrying with backoff):
+    # the server accepts traffic at once, vector routes answer 503 and /ready stays
+    # unavailable until it is done.
+    milvus_service.start()
+    # Primes PyMuPDF, Gemini channels, the query-embedding cache and Milvus segments
+    warmup.start()
+    memory_watchdog.start()
     
     yield
 
-app = FastAPI(title="ATS AI Service", version="3.0", lifespan=lifespan)
+    memory_watchdog.stop()
+    # Running async tasks get the same drain time as in-flight requests
+    task_queue.shutdown(timeout=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS)
+    bulkhead.shutdown()
+    milvus_service.close()
+    gemini_service.close()
+
+# JSON bodies rendered with orjson (when installed)
+app = FastAPI(title="ATS AI Service", version="3.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
+
+# Client disconnects cancel the request's remaining PDF / Gemini / Milvus work
+app.add_middleware(CancellationMiddleware)
+
+# Upload limits: oversized bodies get a 413 before they are buffered;
+# multipart files stay in memory up to UPLOAD_SPOOL_BYTES, then spill to disk
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=settings.MAX_UPLOAD_BYTES)
+MultiPartParser.spool_max_size = settings.UPLOAD_SPOOL_BYTES
+
+# Large JSON bodies (CV texts, search results) compressed for clients that accept it
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_BYTES,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+)
+
+# Load shedding: bounded concurrency and queueing per expensive endpoint, 429 past the limits
+app.add_middleware(AdmissionControlMiddleware, controllers=admission.controllers)
 
 # CORS
 origins = [
@@ -42,17 +89,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(MilvusUnavailableError)
+@app.exception_handler(GeminiUnavailableError)
+@app.exception_handler(BulkheadFullError)
+async def dependency_unavailable_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
+@app.exception_handler(TaskQueueFullError)
+async def task_queue_full_handler(request: Request, exc: TaskQueueFullError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
 # Include Routers
 app.include_router(candidates.router)
 app.include_router(jobs.router)
 app.include_router(interviews.router)
 app.include_router(tasks.router)
+app.include_router(dedup.router)
+app.include_router(async_tasks.router)
 
+# Probes and metrics are async: they answer on the event loop even when every worker pool is busy
 @app.get("/health")
-def health_check():
+async def health_check():
+    # Liveness only: no dependency checks, so a Milvus outage never restarts the container
     return {"status": "ok", "version": "3.0"}
 
+@app.get("/ready")
+async def readiness_check():
+    # Readiness: per-dependency state; 503 until Milvus is connected and warm-up has run
+    milvus = milvus_service.health()
+    # Gemini breaker state is informational: AI routes degrade on their own when a model is down
+    ready = milvus["state"] == "connected" and warmup.done
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "unavailable",
+            "dependencies": {"milvus": milvus, "gemini": gemini_service.health()},
+            "async_tasks": task_queue.stats(),
+            "bulkheads": bulkhead.stats(),
+            "admission": admission.stats(),
+            "text_store": text_store.stats(),
+            "warmup": warmup.health()
+        }
+    )
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
+    # Development server; production uses serve.py (multiple workers, no reload).
     # Reload=True is important for dev, but beware of spawn loops on Windows without this guard
     uvicorn.run("main:app", host="0.0.0.0", port=settings.AI_SERVICE_PORT, reload=True)
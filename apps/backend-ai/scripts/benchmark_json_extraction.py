@@ -0,0 +1,52 @@
+"""
+Benchmarks app.utils.json_extractor on the LLM response corpus (tests/fixtures/llm_json_corpus.json)
+plus a large synthetic response, reporting per-call latency and the tier each case used.
+
+Usage (from apps/backend-ai):
+    python scripts/benchmark_json_extraction.py [iterations]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.utils.json_extractor import extract_json
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'llm_json_corpus.json')
+
+
+def large_response():
+    # ~1 MB screening-like response wrapped in a fence and truncated (max_output_tokens cutoff)
+    payload = {
+        "summary": "Strong candidate. " * 2000,
+        "pros": [f"Skill {i}" for i in range(5000)],
+        "cons": [f"Gap {i}" for i in range(5000)],
+        "raw_text": "Line of resume text\n" * 20000,
+    }
+    text = "```json\n" + json.dumps(payload) + "\n```"
+    return [("large_fenced", text), ("large_truncated", json.dumps(payload)[:-50000])]
+
+
+def bench(text, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = extract_json(text)
+    elapsed = (time.perf_counter() - start) / iterations
+    return result.tier, elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        cases = [(case["name"], case["text"]) for case in json.load(f)]
+
+    print(f"{'case':32} {'tier':8} {'size':>10} {'us/call':>12}")
+    for name, text in cases + large_response():
+        n = iterations if len(text) < 100_000 else max(1, iterations // 50)
+        tier, elapsed = bench(text, n)
+        print(f"{name:32} {tier:8} {len(text):>10} {elapsed * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
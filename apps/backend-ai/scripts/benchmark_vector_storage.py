@@ -0,0 +1,159 @@
+"""
+Compares dense vector storage options (EMBEDDING_DIMENSION, VECTOR_STORAGE, VECTOR_INDEX_TYPE):
+index memory per million candidates and recall@k against exact search on full 768-dim float32
+vectors.
+
+Reduced dimensions are the leading values of each embedding, re-normalized (what
+output_dimensionality returns); float16, SQ8 and PQ are simulated on them with numpy and
+searched exhaustively, so the numbers show the storage loss alone (the IVF nprobe loss is
+the same for every option). Synthetic vectors only give a rough idea for reduced dimensions:
+run with --milvus to measure on the stored candidate embeddings.
+
+Usage (from apps/backend-ai):
+    python scripts/benchmark_vector_storage.py [--milvus] [--vectors 20000] [--queries 200] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.config import settings
+
+FULL_DIMENSION = 768
+# Inverted list entry per vector (int64 id)
+IVF_ID_BYTES = 8
+
+
+def synthetic_vectors(count: int, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors whose variance decays over the dimensions, like trained embeddings."""
+    rng = np.random.default_rng(seed)
+    scale = 1 / np.sqrt(1 + np.arange(FULL_DIMENSION) / 16)
+    centers = rng.normal(size=(64, FULL_DIMENSION)) * scale
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.normal(size=(count, FULL_DIMENSION)) * scale
+    return vectors.astype(np.float32)
+
+
+def milvus_vectors(count: int) -> np.ndarray:
+    from app.services.milvus_service import milvus_service, to_float_list
+
+    if not milvus_service.connect():
+        sys.exit(f"Milvus unavailable: {milvus_service.last_error}")
+    iterator = milvus_service._collection.query_iterator(
+        batch_size=1000, limit=count, expr='candidate_id != ""', output_fields=["embedding"]
+    )
+    vectors = []
+    while True:
+        batch = iterator.next()
+        if not batch:
+            break
+        vectors.extend(to_float_list(row["embedding"]) for row in batch)
+    iterator.close()
+    milvus_service.close()
+    if len(vectors) < 100:
+        sys.exit(f"Only {len(vectors)} stored embeddings: not enough to measure recall")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def truncate(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    reduced = vectors[:, :dimension]
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.where(norms == 0, 1, norms)
+
+
+def top_k(queries: np.ndarray, vectors: np.ndarray, k: int) -> np.ndarray:
+    # Squared L2 without the per-query constant
+    distances = (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    nearest = np.argpartition(distances, k, axis=1)[:, :k]
+    return nearest
+
+
+def scalar_quantized(vectors: np.ndarray) -> np.ndarray:
+    """IVF_SQ8: one byte per value, per-dimension min / max."""
+    low, high = vectors.min(axis=0), vectors.max(axis=0)
+    step = np.where(high > low, (high - low) / 255, 1)
+    return np.round((vectors - low) / step) * step + low
+
+
+def product_quantized(vectors: np.ndarray, m: int, iterations: int = 8, train_size: int = 5000,
+                      seed: int = 7) -> np.ndarray:
+    """IVF_PQ with nbits=8: each of `m` sub-vectors replaced by the nearest of 256 centroids."""
+    rng = np.random.default_rng(seed)
+    width = vectors.shape[1] // m
+    reconstructed = np.empty_like(vectors)
+    train = vectors[rng.choice(len(vectors), min(train_size, len(vectors)), replace=False)]
+    for part in range(m):
+        columns = slice(part * width, (part + 1) * width)
+        sample = train[:, columns]
+        centroids = sample[rng.choice(len(sample), min(256, len(sample)), replace=False)]
+        for _ in range(iterations):
+            assignment = top_k(sample, centroids, 1)[:, 0]
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=len(centroids))[:, None]
+            # Centroids without members stay where they are
+            centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+        reconstructed[:, columns] = centroids[top_k(vectors[:, columns], centroids, 1)[:, 0]]
+    return reconstructed
+
+
+def stored(vectors: np.ndarray, storage: str, index_type: str, m: int) -> np.ndarray:
+    if storage == "float16":
+        vectors = vectors.astype(np.float16).astype(np.float32)
+    if index_type == "IVF_SQ8":
+        return scalar_quantized(vectors)
+    if index_type == "IVF_PQ":
+        return product_quantized(vectors, m)
+    return vectors
+
+
+def bytes_per_vector(dimension: int, storage: str, index_type: str, m: int) -> int:
+    if index_type == "IVF_SQ8":
+        code = dimension
+    elif index_type == "IVF_PQ":
+        code = m
+    else:
+        code = dimension * (2 if storage == "float16" else 4)
+    return code + IVF_ID_BYTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--milvus", action="store_true", help="use the stored candidate embeddings")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimensions", default="768,384,256")
+    parser.add_argument("--storage", default="float32,float16")
+    parser.add_argument("--indexes", default="IVF_FLAT,IVF_SQ8,IVF_PQ")
+    args = parser.parse_args()
+
+    data = milvus_vectors(args.vectors + args.queries) if args.milvus else synthetic_vectors(args.vectors + args.queries)
+    full_dimension = data.shape[1]
+    queries, vectors = data[:args.queries], data[args.queries:]
+    expected = top_k(truncate(queries, full_dimension), truncate(vectors, full_dimension), args.k)
+
+    print(f"{len(vectors)} vectors ({'Milvus' if args.milvus else 'synthetic'}), {len(queries)} queries, "
+          f"recall@{args.k} vs exact {full_dimension}-dim float32")
+    print(f"{'dimension':>9} {'storage':>8} {'index':>9} {'MiB / 1M':>9} {'recall':>7} {'seconds':>8}")
+    for dimension in (int(d) for d in args.dimensions.split(",")):
+        if dimension > full_dimension:
+            continue
+        reduced_vectors, reduced_queries = truncate(vectors, dimension), truncate(queries, dimension)
+        m = settings.VECTOR_PQ_M or max(1, dimension // 4)
+        for storage in args.storage.split(","):
+            for index_type in args.indexes.split(","):
+                if index_type == "IVF_PQ" and dimension % m:
+                    continue
+                started = time.perf_counter()
+                found = top_k(reduced_queries, stored(reduced_vectors, storage, index_type, m), args.k)
+                recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, expected)])
+                memory = bytes_per_vector(dimension, storage, index_type, m) * 1_000_000 / 2 ** 20
+                print(f"{dimension:>9} {storage:>8} {index_type:>9} {memory:>9.0f} {recall:>7.3f} "
+                      f"{time.perf_counter() - started:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
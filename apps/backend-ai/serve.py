@@ -0,0 +1,70 @@
+"""
+Production entry point: `python serve.py`.
+
+Runs main:app on WEB_CONCURRENCY worker processes (default: one per usable CPU). Each worker
+is a spawned process with its own service singletons and background threads. uvloop and
+httptools are used when installed (uvicorn[standard]). Workers are recycled after
+WORKER_MAX_REQUESTS requests or above WORKER_MAX_RSS_MB, and on SIGTERM in-flight requests
+get SERVER_GRACEFUL_SHUTDOWN_SECONDS to finish.
+For development use `python main.py` (auto-reload, single process).
+"""
+import importlib.util
+import logging
+import math
+import os
+
+import uvicorn
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn")
+
+
+def usable_cpus() -> int:
+    """CPUs this process may run on: the affinity mask, capped by a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    return settings.WEB_CONCURRENCY if settings.WEB_CONCURRENCY > 0 else usable_cpus()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    workers = worker_count()
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    # Inherited by the spawned workers: per-process state (the duplicate index) checks it
+    os.environ["SERVER_WORKER_PROCESSES"] = str(workers)
+    logger.info(f"Starting {workers} worker(s) on {settings.SERVER_HOST}:{settings.AI_SERVICE_PORT} ({loop}, {http})")
+
+    uvicorn.run(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.AI_SERVICE_PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        limit_max_requests=settings.WORKER_MAX_REQUESTS or None,
+        limit_max_requests_jitter=settings.WORKER_MAX_REQUESTS_JITTER,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import (
+    AdmissionControlMiddleware, AdmissionController, AdmissionRejectedError,
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, parse_limits, request_priority
+)
+from app.core.metrics import metrics
+
+
+def _controller(max_concurrent=1, max_queue=2, max_wait=1.0, batch_max_wait=1.0):
+    return AdmissionController("/demo", max_concurrent, max_queue, max_wait, batch_max_wait)
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_admits_up_to_concurrency_then_queues(self):
+        async def scenario():
+            controller = _controller(max_concurrent=2)
+            first = await controller.acquire()
+            await controller.acquire()
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            self.assertEqual(controller.queued, 1)
+            self.assertFalse(waiter.done())
+
+            controller.release(first)
+            await waiter
+            self.assertEqual(controller.stats()["active"], 2)
+            self.assertEqual(controller.queued, 0)
+
+        asyncio.run(scenario())
+
+    def test_queue_full_is_shed(self):
+        async def scenario():
+            controller = _controller(max_queue=1)
+            await controller.acquire()
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejectedError) as ctx:
+                await controller.acquire()
+            self.assertEqual(ctx.exception.reason, "queue_full")
+            self.assertGreaterEqual(ctx.exception.retry_after, 1)
+            waiter.cancel()
+
+        asyncio.run(scenario())
+        self.assertGreaterEqual(
+            metrics.get("admission_shed_total", endpoint="/demo", lane=PRIORITY_INTERACTIVE, reason="queue_full"), 1
+        )
+
+    def test_wait_past_max_wait_is_shed(self):
+        async def scenario():
+            controller = _controller(max_wait=0.05)
+            await controller.acquire()
+            with self.assertRaises(AdmissionRejectedError) as ctx:
+                await controller.acquire()
+            self.assertEqual(ctx.exception.reason, "timeout")
+            self.assertEqual(controller.queued, 0)
+
+        asyncio.run(scenario())
+
+    def test_interactive_lane_is_served_first(self):
+        async def scenario():
+            controller = _controller(max_queue=4)
+            order = []
+
+            async def request(priority):
+                granted = await controller.acquire(priority)
+                order.append(priority)
+                controller.release(granted)
+
+            held = await controller.acquire()
+            batch = asyncio.ensure_future(request(PRIORITY_BATCH))
+            await asyncio.sleep(0)
+            interactive = asyncio.ensure_future(request(PRIORITY_INTERACTIVE))
+            await asyncio.sleep(0)
+            controller.release(held)
+            await asyncio.gather(batch, interactive)
+            return order
+
+        self.assertEqual(asyncio.run(scenario()), [PRIORITY_INTERACTIVE, PRIORITY_BATCH])
+
+    def test_batch_lane_uses_part_of_the_queue(self):
+        async def scenario():
+            controller = _controller(max_queue=2)
+            await controller.acquire()
+            waiter = asyncio.ensure_future(controller.acquire(PRIORITY_BATCH))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejectedError):
+                await controller.acquire(PRIORITY_BATCH)
+            # Interactive requests still find room
+            interactive = asyncio.ensure_future(controller.acquire(PRIORITY_INTERACTIVE))
+            await asyncio.sleep(0)
+            self.assertEqual(controller.stats()["queued"], {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1})
+            waiter.cancel()
+            interactive.cancel()
+
+        asyncio.run(scenario())
+
+    def test_cancelled_waiter_frees_its_place(self):
+        async def scenario():
+            controller = _controller()
+            held = await controller.acquire()
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(controller.queued, 0)
+            controller.release(held)
+            self.assertEqual(controller.stats()["active"], 0)
+
+        asyncio.run(scenario())
+
+    def test_parse_limits(self):
+        limits = parse_limits("/parse-cv=2:3, /custom=1:1, broken")
+        self.assertEqual(limits["/parse-cv"], (2, 3))
+        self.assertEqual(limits["/custom"], (1, 1))
+        self.assertIn("/screen-candidate", limits)
+
+    def test_task_submissions_use_the_batch_lane(self):
+        limits = parse_limits("")
+        for path in ("/async/parse-cv", "/async/screen-candidate"):
+            self.assertIn(path, limits)
+            self.assertEqual(request_priority({"path": path, "headers": []}), PRIORITY_BATCH)
+        self.assertEqual(request_priority({"path": "/parse-cv", "headers": []}), PRIORITY_INTERACTIVE)
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.controller = _controller(max_concurrent=1, max_queue=0)
+        app = FastAPI()
+
+        @app.post("/demo")
+        def demo():
+            return {"ok": True}
+
+        @app.post("/other")
+        def other():
+            return {"ok": True}
+
+        app.add_middleware(AdmissionControlMiddleware, controllers={"/demo": self.controller})
+        self.client = TestClient(app)
+
+    def test_admitted_request_releases_its_slot(self):
+        self.assertEqual(self.client.post("/demo").status_code, 200)
+        self.assertEqual(self.client.post("/demo").status_code, 200)
+        self.assertEqual(self.controller.stats()["active"], 0)
+
+    def test_overload_is_429_with_retry_after(self):
+        self.controller._active = 1  # a request in flight
+        response = self.client.post("/demo")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        # Other endpoints are not affected
+        self.assertEqual(self.client.post("/other").status_code, 200)
+
+
+class TestAdmissionOnApp(unittest.TestCase):
+    def test_expensive_routes_are_limited(self):
+        from app.core import admission
+        from main import app
+
+        client = TestClient(app)
+        controller = admission.controllers["/screen-candidate"]
+        # Every slot taken and no queue
+        with patch.object(controller, "_active", controller.max_concurrent), patch.object(controller, "max_queue", 0):
+            response = client.post(
+                "/screen-candidate", json={"resume_text": "x", "job_description": "y", "criteria": {}}
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("admission", client.get("/ready").json())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.config import settings
+from app.services.gemini_service import GeminiService, GeminiUnavailableError
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestBatchScreening(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.contexts = []
+        self.model = MagicMock(name="shared-model")
+
+        @contextmanager
+        def shared_context(system_instruction, model_name="gemini-2.5-pro"):
+            self.contexts.append(system_instruction)
+            yield self.model
+
+        patcher = patch("app.routers.candidates.gemini_service")
+        self.gemini = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gemini.shared_context.side_effect = shared_context
+
+    def _payload(self, count: int) -> dict:
+        return {
+            "job_description": "Senior Python engineer",
+            "criteria": {"requiredSkills": ["Python", "FastAPI"]},
+            "candidates": [{"candidate_id": f"c{i}", "resume_text": f"Resume number {i}"} for i in range(count)]
+        }
+
+    def test_shared_context_and_per_candidate_results(self):
+        def screen(prompt, schema, model=None):
+            self.assertIs(model, self.model)
+            # Counted against the LLM bulkhead like any other Gemini call
+            self.assertTrue(threading.current_thread().name.startswith("llm-bulkhead"))
+            # Only the resume is sent per call; the job context lives in the shared instruction
+            self.assertNotIn("Senior Python engineer", prompt)
+            return {"match_score": int(prompt.strip().split()[-1])}
+
+        self.gemini.generate_structured.side_effect = screen
+        response = self.client.post("/screen-candidates/batch", json=self._payload(5))
+
+        self.assertEqual(response.status_code, 200)
+        events = _events(response.text)
+        self.assertEqual(len(self.contexts), 1)
+        self.assertIn("Senior Python engineer", self.contexts[0])
+        self.assertIn("Python, FastAPI", self.contexts[0])
+
+        results = {data["candidate_id"]: data["result"] for event, data in events if event == "result"}
+        self.assertEqual(results, {f"c{i}": {"match_score": i} for i in range(5)})
+        self.assertEqual(events[-1], ("done", {"screened": 5, "failed": 0}))
+
+    def test_failures_are_reported_per_candidate(self):
+        def screen(prompt, schema, model=None):
+            if "number 1" in prompt:
+                raise GeminiUnavailableError("gemini-2.5-pro", 10)
+            return {"match_score": 50}
+
+        self.gemini.generate_structured.side_effect = screen
+        events = _events(self.client.post("/screen-candidates/batch", json=self._payload(3)).text)
+
+        errors = [data for event, data in events if event == "error"]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["candidate_id"], "c1")
+        self.assertEqual(errors[0]["status_code"], 503)
+        self.assertEqual(events[-1], ("done", {"screened": 2, "failed": 1}))
+
+    def test_batch_size_limit(self):
+        with patch.object(settings, "SCREENING_BATCH_MAX_CANDIDATES", 2):
+            response = self.client.post("/screen-candidates/batch", json=self._payload(3))
+        self.assertEqual(response.status_code, 422)
+
+
+class TestSharedContext(unittest.TestCase):
+    def setUp(self):
+        self.service = GeminiService()
+
+    @patch("app.services.gemini_service.genai")
+    def test_short_prefix_uses_system_instruction(self, mock_genai):
+        with self.service.shared_context("Short job context") as model:
+            self.assertIs(model, mock_genai.GenerativeModel.return_value)
+        mock_genai.GenerativeModel.assert_called_once_with("gemini-2.5-pro", system_instruction="Short job context")
+        mock_genai.caching.CachedContent.create.assert_not_called()
+
+    @patch("app.services.gemini_service.genai")
+    def test_long_prefix_is_cached_and_deleted(self, mock_genai):
+        cache = mock_genai.caching.CachedContent.create.return_value
+        with patch.object(settings, "GEMINI_CONTEXT_CACHE_MIN_TOKENS", 10):
+            with self.service.shared_context("x" * 100) as model:
+                self.assertIs(model, mock_genai.GenerativeModel.from_cached_content.return_value)
+                cache.delete.assert_not_called()
+        mock_genai.GenerativeModel.from_cached_content.assert_called_once_with(cache)
+        cache.delete.assert_called_once()
+
+    @patch("app.services.gemini_service.genai")
+    def test_cache_failure_falls_back_to_inline_prefix(self, mock_genai):
+        mock_genai.caching.CachedContent.create.side_effect = ValueError("too few tokens")
+        with patch.object(settings, "GEMINI_CONTEXT_CACHE_MIN_TOKENS", 10):
+            with self.service.shared_context("x" * 100) as model:
+                self.assertIs(model, mock_genai.GenerativeModel.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.bulkhead import Bulkhead, BulkheadFullError
+from app.core.metrics import metrics
+
+
+class TestBulkhead(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def _bulkhead(self, name: str, workers: int = 1, queue_timeout: float = 0.2) -> Bulkhead:
+        bulkhead = Bulkhead(name, workers, queue_timeout)
+        self.addCleanup(bulkhead.shutdown)
+        return bulkhead
+
+    def test_run_returns_result_on_bulkhead_thread(self):
+        bulkhead = self._bulkhead("demo")
+        name = asyncio.run(bulkhead.run(lambda: threading.current_thread().name))
+        self.assertTrue(name.startswith("demo-bulkhead"))
+
+    def test_saturated_bulkhead_rejects_after_queue_timeout(self):
+        bulkhead = self._bulkhead("saturated")
+
+        async def scenario():
+            blocker = asyncio.ensure_future(bulkhead.run(self.release.wait))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(BulkheadFullError) as ctx:
+                await bulkhead.run(lambda: "never")
+            self.assertEqual(ctx.exception.name, "saturated")
+            self.release.set()
+            await blocker
+
+        asyncio.run(scenario())
+        self.assertEqual(bulkhead.stats()["queued"], 0)
+        self.assertIn('bulkhead_rejected_total{bulkhead="saturated"} 1', metrics.render_prometheus())
+
+    def test_saturated_pool_does_not_block_another(self):
+        llm = self._bulkhead("llm-test")
+        vector = self._bulkhead("vector-test")
+
+        async def scenario():
+            blocker = asyncio.ensure_future(llm.run(self.release.wait))
+            await asyncio.sleep(0.05)
+            result = await vector.run(lambda: "searched")
+            self.release.set()
+            await blocker
+            return result
+
+        self.assertEqual(asyncio.run(scenario()), "searched")
+
+    def test_call_is_reentrant(self):
+        bulkhead = self._bulkhead("reentrant")
+        # On its only thread, a nested call runs inline instead of waiting for itself
+        result = asyncio.run(bulkhead.run(lambda: bulkhead.call(lambda x: x * 2, 21)))
+        self.assertEqual(result, 42)
+
+    def test_iterate_pulls_items_and_closes(self):
+        bulkhead = self._bulkhead("stream")
+        closed = threading.Event()
+
+        def events():
+            try:
+                yield threading.current_thread().name
+                yield "second"
+            finally:
+                closed.set()
+
+        async def scenario():
+            return [item async for item in bulkhead.iterate(events())]
+
+        items = asyncio.run(scenario())
+        self.assertTrue(items[0].startswith("stream-bulkhead"))
+        self.assertEqual(items[1], "second")
+        self.assertTrue(closed.wait(1))
+
+
+class TestBulkheadRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    @patch("app.routers.candidates.gemini_service")
+    def test_screen_candidate_runs_on_llm_bulkhead(self, mock_gemini):
+        seen = {}
+
+        def generate_json(*args, **kwargs):
+            seen["thread"] = threading.current_thread().name
+            return {"match_score": 80}
+
+        mock_gemini.generate_json.side_effect = generate_json
+        response = self.client.post(
+            "/screen-candidate", json={"resume_text": "x", "job_description": "y", "criteria": {}}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(seen["thread"].startswith("llm-bulkhead"))
+
+    def test_bulkhead_full_is_503(self):
+        with patch("app.core.bulkhead.llm.run", side_effect=BulkheadFullError("llm", retry_after=10)):
+            response = self.client.post(
+                "/screen-candidate", json={"resume_text": "x", "job_description": "y", "criteria": {}}
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "10")
+
+    def test_ready_reports_bulkheads(self):
+        body = self.client.get("/ready").json()
+        self.assertEqual(set(body["bulkheads"]), {"llm", "cpu", "vector"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import fitz
+
+from app.core import cancellation
+from app.core.bulkhead import Bulkhead
+from app.core.cancellation import (
+    CancellationMiddleware, CancellationToken, RequestCancelledError, check_cancelled, current_token
+)
+from app.core.metrics import metrics
+from app.routers.candidates import vectorize_candidate
+from app.schemas import VectorizeRequest
+from app.services.gemini_service import gemini_service
+from app.services.pdf_service import pdf_service
+
+
+def _run_cancelled(fn, *args):
+    """Runs `fn` as if inside a request whose client has already disconnected."""
+    token = CancellationToken()
+    token.cancel()
+
+    def run():
+        cancellation._current.set(token)
+        return fn(*args)
+
+    return contextvars.copy_context().run(run)
+
+
+class TestCancellationToken(unittest.TestCase):
+    def test_no_request_is_never_cancelled(self):
+        self.assertIsNone(current_token())
+        check_cancelled("test")  # does not raise
+
+    def test_checkpoint_raises_once_cancelled(self):
+        with self.assertRaises(RequestCancelledError) as ctx:
+            _run_cancelled(check_cancelled, "test")
+        self.assertEqual(ctx.exception.stage, "test")
+        # Not an Exception: route fallbacks must not turn it into a 500 / degraded result
+        self.assertNotIsInstance(ctx.exception, Exception)
+
+    def test_sleep_wakes_up_on_cancel(self):
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        started = time.monotonic()
+        with self.assertRaises(RequestCancelledError):
+            token.sleep(5)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class TestCancellationMiddleware(unittest.TestCase):
+    def _call(self, app, messages):
+        sent = []
+
+        async def receive():
+            message = messages.pop(0)
+            if message is None:  # the client stays connected
+                await asyncio.sleep(10)
+            return message
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/demo", "headers": []}
+        asyncio.run(CancellationMiddleware(app)(scope, receive, send))
+        return sent
+
+    def test_disconnect_after_body_cancels_the_request(self):
+        observed = {}
+
+        async def app(scope, receive, send):
+            await receive()  # the body
+            for _ in range(100):
+                if current_token().cancelled:
+                    break
+                await asyncio.sleep(0.01)
+            observed["cancelled"] = current_token().cancelled
+            check_cancelled("test")
+
+        before = metrics.get("requests_abandoned_total", path="/demo")
+        sent = self._call(app, [
+            {"type": "http.request", "body": b"{}", "more_body": False},
+            {"type": "http.disconnect"},
+        ])
+        self.assertTrue(observed["cancelled"])
+        self.assertEqual(sent, [])
+        self.assertEqual(metrics.get("requests_abandoned_total", path="/demo"), before + 1)
+
+    def test_completed_request_is_not_abandoned(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+            self.assertFalse(current_token().cancelled)
+
+        before = metrics.get("requests_abandoned_total", path="/demo")
+        sent = self._call(app, [{"type": "http.request", "body": b"", "more_body": False}, None])
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertEqual(metrics.get("requests_abandoned_total", path="/demo"), before)
+
+    def test_app_receive_after_body_gets_the_disconnect(self):
+        messages = []
+
+        async def app(scope, receive, send):
+            await receive()
+            messages.append(await receive())
+
+        self._call(app, [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}])
+        self.assertEqual(messages, [{"type": "http.disconnect"}])
+
+
+class TestPipelineCheckpoints(unittest.TestCase):
+    def test_gemini_call_is_not_attempted(self):
+        fn = MagicMock()
+        with self.assertRaises(RequestCancelledError):
+            _run_cancelled(gemini_service._call, "gemini-2.5-pro", fn, gemini_service.generation_policy)
+        fn.assert_not_called()
+
+    def test_pdf_extraction_stops(self):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Senior Python developer with ten years of experience.")
+        with self.assertRaises(RequestCancelledError):
+            _run_cancelled(pdf_service.extract_document, doc.tobytes())
+
+    @patch("app.routers.candidates.milvus_service")
+    @patch("app.routers.candidates.gemini_service")
+    def test_vectorize_skips_the_milvus_write(self, mock_gemini, mock_milvus):
+        mock_gemini.embed_text.return_value = [0.1] * 768
+        request = VectorizeRequest(candidate_id="c1", text="Python developer", location="Paris", experience=3)
+        with self.assertRaises(RequestCancelledError):
+            _run_cancelled(vectorize_candidate.__wrapped__, request)
+        mock_milvus.upsert_candidate.assert_not_called()
+
+    def test_bulkhead_drops_queued_work(self):
+        bulkhead = Bulkhead("cancel-test", 1, 1)
+        self.addCleanup(bulkhead.shutdown)
+        fn = MagicMock()
+
+        async def scenario():
+            token = CancellationToken()
+            token.cancel()
+            cancellation._current.set(token)
+            await bulkhead.run(fn)
+
+        with self.assertRaises(RequestCancelledError):
+            asyncio.run(scenario())
+        fn.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("dep", failure_threshold=2, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_threshold(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        with self.assertRaises(CircuitOpenError) as ctx:
+            self.breaker.check()
+        self.assertAlmostEqual(ctx.exception.retry_after, 10)
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_single_trial(self):
+        self.breaker.trip()
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import random
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.schemas import DedupCandidate
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services.dedup_service import DedupIndex, DedupIndexChangedError, DedupService, identity_keys, STRATEGY_PHONE_NAME
+from app.utils.minhash import MinHasher, shingles
+
+WORDS = ("python java kubernetes docker react angular postgres mongodb kafka spark airflow terraform "
+         "aws azure gcp linux django flask spring node typescript graphql redis elasticsearch scrum "
+         "agile leadership mentoring architecture microservices testing devops security data").split()
+
+
+def _resume(rng: random.Random, words: int = 300) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _candidate(candidate_id, **fields):
+    return DedupCandidate(candidate_id=candidate_id, **fields)
+
+
+class TestMinHash(unittest.TestCase):
+    def test_similarity_estimate(self):
+        rng = random.Random(1)
+        hasher = MinHasher(128, 16)
+        text = _resume(rng)
+        words = text.split()
+        edited = " ".join(words[:-5] + ["senior"] * 5)
+        first, second = shingles(text), shingles(edited)
+        exact = len(first & second) / len(first | second)
+        estimate = MinHasher.similarity(hasher.signature(first), hasher.signature(second))
+        self.assertAlmostEqual(estimate, exact, delta=0.1)
+
+    def test_normalization(self):
+        self.assertEqual(shingles("Développeur  PYTHON, senior!"), shingles("developpeur python senior"))
+
+    def test_empty(self):
+        self.assertIsNone(MinHasher().signature(set()))
+
+
+class TestIdentityKeys(unittest.TestCase):
+    def test_keys(self):
+        keys = dict(identity_keys(_candidate(
+            "a", email=" Jane@Example.com ", linkedin_url="https://www.linkedin.com/in/jane-doe/?trk=x",
+            last_name="Doé", phone="+33 6 12 34 56 78"
+        )))
+        self.assertEqual(keys["EMAIL"], "jane@example.com")
+        self.assertEqual(keys["LINKEDIN"], "jane-doe")
+        self.assertEqual(keys[STRATEGY_PHONE_NAME], "612345678|doe")
+
+    def test_national_and_international_phone_match(self):
+        first = dict(identity_keys(_candidate("a", last_name="Doe", phone="0033 6 12 34 56 78")))
+        second = dict(identity_keys(_candidate("b", last_name="doe", phone="06.12.34.56.78")))
+        self.assertEqual(first[STRATEGY_PHONE_NAME], second[STRATEGY_PHONE_NAME])
+
+
+class TestDedupIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = DedupIndex(MinHasher(128, 16))
+        self.rng = random.Random(42)
+
+    def test_identity_clusters_are_transitive(self):
+        clusters = self.index.add([
+            _candidate("a", email="jane@example.com"),
+            _candidate("b", email="JANE@example.com", linkedin_url="linkedin.com/in/jane"),
+            _candidate("c", linkedin_url="https://linkedin.com/in/jane/"),
+            _candidate("d", email="someone@else.com"),
+        ], use_embeddings=False)
+        self.assertEqual([cluster["candidate_ids"] for cluster in clusters], [["a", "b", "c"]])
+        strategies = {match["strategy"] for match in clusters[0]["matches"]}
+        self.assertEqual(strategies, {"EMAIL", "LINKEDIN"})
+
+    def test_near_duplicate_resume_text(self):
+        text = _resume(self.rng)
+        words = text.split()
+        candidates = [
+            _candidate("original", text=text),
+            _candidate("reupload", text=" ".join(words[:-3] + ["Paris", "France", "2024"])),
+        ] + [_candidate(f"other-{i}", text=_resume(self.rng)) for i in range(50)]
+        clusters = self.index.add(candidates, use_embeddings=False)
+        self.assertEqual([cluster["candidate_ids"] for cluster in clusters], [["original", "reupload"]])
+        self.assertEqual(clusters[0]["matches"][0]["strategy"], "TEXT")
+
+    def test_excluded_pair(self):
+        self.index.exclude([["a", "b"]])
+        clusters = self.index.add([
+            _candidate("a", email="x@example.com"), _candidate("b", email="x@example.com")
+        ], use_embeddings=False)
+        self.assertEqual(clusters, [])
+
+    def test_incremental_batches(self):
+        self.index.add([_candidate("a", email="x@example.com"), _candidate("b")], use_embeddings=False)
+        clusters = self.index.add([_candidate("c", email="X@example.com ")], use_embeddings=False)
+        self.assertEqual(clusters[0]["candidate_ids"], ["a", "c"])
+        self.assertEqual(len(self.index), 3)
+        # Re-sending an indexed candidate does not duplicate matches
+        clusters = self.index.add([_candidate("c", email="x@example.com")], use_embeddings=False)
+        self.assertEqual(len(clusters[0]["matches"]), 1)
+
+    @patch("app.services.dedup_service.milvus_service")
+    def test_embedding_range_search(self, mock_milvus):
+        mock_milvus.get_embeddings.return_value = {"a": [1.0, 0.0], "b": [0.0, 1.0]}
+
+        def hit(candidate_id, distance):
+            return SimpleNamespace(entity={"candidate_id": candidate_id}, distance=distance)
+
+        mock_milvus.range_search.return_value = [
+            [hit("a", 0.0), hit("z", 0.02)],
+            [hit("b", 0.0)],
+        ]
+        clusters = self.index.add([_candidate("a"), _candidate("b"), _candidate("c")])
+        self.assertEqual([cluster["candidate_ids"] for cluster in clusters], [["a", "z"]])
+        match = clusters[0]["matches"][0]
+        self.assertEqual((match["strategy"], match["similarity"]), ("EMBEDDING", 0.99))
+        vectors, max_distance = mock_milvus.range_search.call_args.args
+        self.assertEqual(len(vectors), 2)
+
+
+class TestDedupService(unittest.TestCase):
+    def setUp(self):
+        self.service = DedupService()
+
+    def test_batch_for_a_rebuilt_index_is_rejected(self):
+        first = self.service.deduplicate([_candidate("a", email="x@example.com")], reset_index=True,
+                                         use_embeddings=False)
+        second = self.service.deduplicate([_candidate("b", email="x@example.com")], index_id=first["index_id"],
+                                          use_embeddings=False)
+        self.assertEqual(second["index_id"], first["index_id"])
+        self.assertEqual(second["clusters"][0]["candidate_ids"], ["a", "b"])
+
+        # Another scan (or a restart) rebuilt the index: the old scan cannot continue
+        self.service.deduplicate([_candidate("c")], reset_index=True, use_embeddings=False)
+        with self.assertRaises(DedupIndexChangedError):
+            self.service.deduplicate([_candidate("d")], index_id=first["index_id"], use_embeddings=False)
+
+    def test_incremental_batch_on_an_empty_index_needs_a_full_scan(self):
+        result = self.service.deduplicate([_candidate("a")], use_embeddings=False)
+        self.assertTrue(result["needs_full_scan"])
+        result = self.service.deduplicate([_candidate("b")], use_embeddings=False)
+        self.assertFalse(result["needs_full_scan"])
+
+    @patch("app.services.dedup_service.milvus_service")
+    def test_milvus_is_searched_without_the_index_lock(self, mock_milvus):
+        def get_embeddings(ids):
+            self.assertFalse(self.service._lock.locked())
+            return {}
+
+        mock_milvus.get_embeddings.side_effect = get_embeddings
+        self.service.deduplicate([_candidate("a")], reset_index=True)
+        mock_milvus.get_embeddings.assert_called_once_with(["a"])
+
+
+class TestDedupRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        patcher = patch("app.routers.dedup.dedup_service", DedupService())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, **body):
+        return self.client.post("/deduplication/candidates", json={
+            "candidates": [{"candidate_id": "a"}], "use_embeddings": False, **body
+        })
+
+    def test_stale_index_id_is_a_409(self):
+        index_id = self._post(reset_index=True).json()["index_id"]
+        self.assertEqual(self._post(index_id=index_id).status_code, 200)
+        self._post(reset_index=True)
+        self.assertEqual(self._post(index_id=index_id).status_code, 409)
+
+    def test_multi_worker_server_fails_with_a_configuration_error(self):
+        with patch("app.services.dedup_service.settings.SERVER_WORKER_PROCESSES", 4):
+            response = self._post(reset_index=True)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("WEB_CONCURRENCY=1", response.json()["detail"])
+
+
+if __name__ == "__main__":
+    unittest.main()
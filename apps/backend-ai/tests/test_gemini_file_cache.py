@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from app.services.gemini_file_cache import GeminiFileCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestGeminiFileCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.uploads = []
+        self.deleted = []
+        self.cache = GeminiFileCache(
+            upload=self._upload,
+            delete=self.deleted.append,
+            ttl=100,
+            max_entries=2,
+            cleanup_interval=3600,
+            clock=self.clock
+        )
+        self.paths = []
+
+    def tearDown(self):
+        self.cache._stop_event.set()
+        for path in self.paths:
+            os.remove(path)
+
+    def _upload(self, file_path, mime_type):
+        handle = SimpleNamespace(name=f"files/{len(self.uploads)}")
+        self.uploads.append(file_path)
+        return handle
+
+    def _file(self, content: bytes) -> str:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        self.paths.append(path)
+        return path
+
+    def test_same_content_is_uploaded_once(self):
+        first = self.cache.get_or_upload(self._file(b"scan"), "application/pdf")
+        # Different path, same bytes (a re-parse of the same CV)
+        second = self.cache.get_or_upload(self._file(b"scan"), "application/pdf")
+        self.assertIs(first, second)
+        self.assertEqual(len(self.uploads), 1)
+
+    def test_expired_entry_is_reuploaded_and_deleted(self):
+        path = self._file(b"scan")
+        first = self.cache.get_or_upload(path, "application/pdf")
+        self.clock.now = 101
+        second = self.cache.get_or_upload(path, "application/pdf")
+        self.assertIsNot(first, second)
+        self.assertEqual(self.cache.sweep(), 1)
+        self.assertEqual(self.deleted, [first.name])
+
+    def test_sweep_deletes_expired(self):
+        handle = self.cache.get_or_upload(self._file(b"a"), "application/pdf")
+        self.assertEqual(self.cache.sweep(), 0)
+        self.clock.now = 100
+        self.assertEqual(self.cache.sweep(), 1)
+        self.assertEqual(self.deleted, [handle.name])
+        self.assertEqual(len(self.cache), 0)
+
+    def test_eviction_beyond_max_entries(self):
+        oldest = self.cache.get_or_upload(self._file(b"a"), "application/pdf")
+        self.cache.get_or_upload(self._file(b"b"), "application/pdf")
+        self.cache.get_or_upload(self._file(b"c"), "application/pdf")
+        self.assertEqual(len(self.cache), 2)
+        self.cache.sweep()
+        self.assertEqual(self.deleted, [oldest.name])
+
+    def test_invalidate(self):
+        path = self._file(b"a")
+        handle = self.cache.get_or_upload(path, "application/pdf")
+        self.cache.invalidate(handle)
+        self.assertIsNot(self.cache.get_or_upload(path, "application/pdf"), handle)
+
+    def test_concurrent_uploads_are_coalesced(self):
+        path = self._file(b"a")
+        release = threading.Event()
+
+        def slow_upload(file_path, mime_type):
+            release.wait(2)
+            return self._upload(file_path, mime_type)
+
+        self.cache._upload = slow_upload
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_upload(path, "application/pdf")))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.uploads), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_close_deletes_everything(self):
+        self.cache.get_or_upload(self._file(b"a"), "application/pdf")
+        self.cache.get_or_upload(self._file(b"b"), "application/pdf")
+        self.cache.close()
+        self.assertEqual(len(self.deleted), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from app.core import cancellation
+from app.core.cancellation import CancellationToken, RequestCancelledError, check_cancelled, current_token
+from app.services.gemini_service import GeminiService
+from app.utils.hedging import Hedger
+
+
+class TestHedger(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown, wait=False, cancel_futures=True)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def _hedger(self, budget=1.0, min_samples=5, latency=0.01) -> Hedger:
+        hedger = Hedger("demo", self.executor, percentile=0.9, budget=budget,
+                        min_samples=min_samples, min_delay=0.01)
+        for _ in range(min_samples):
+            hedger.record(latency)
+        return hedger
+
+    def test_no_hedging_before_enough_samples(self):
+        hedger = Hedger("demo", self.executor, percentile=0.9, budget=1.0, min_samples=5, min_delay=0.01)
+        self.assertIsNone(hedger.delay())
+        self.assertEqual(hedger.call(lambda: "ok"), "ok")
+        self.assertEqual(hedger.stats()["samples"], 1)
+
+    def test_delay_is_the_latency_percentile(self):
+        hedger = Hedger("demo", self.executor, percentile=0.9, budget=1.0, min_samples=10, min_delay=0.0)
+        for latency in range(1, 11):
+            hedger.record(latency)
+        self.assertEqual(hedger.delay(), 9)
+
+    def test_fast_call_is_not_hedged(self):
+        hedger = self._hedger(latency=1.0)
+        fn = MagicMock(return_value="ok")
+        self.assertEqual(hedger.call(fn), "ok")
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(hedger.hedged, 0)
+
+    def test_slow_call_is_hedged_and_the_first_answer_wins(self):
+        hedger = self._hedger()
+        calls = []
+        loser_cancelled = threading.Event()
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                # The slow primary: stuck in the latency tail until the hedge has won
+                self.release.wait(5)
+                if current_token().cancelled:
+                    loser_cancelled.set()
+                return "primary"
+            return "hedge"
+
+        started = time.monotonic()
+        self.assertEqual(hedger.call(fn), "hedge")
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(hedger.hedge_wins, 1)
+        self.release.set()
+        self.assertTrue(loser_cancelled.wait(1))
+
+    def test_budget_caps_hedges(self):
+        # Enough fast samples that the slow calls below keep the hedge delay low
+        hedger = self._hedger(budget=0.5, min_samples=100)
+
+        def slow():
+            time.sleep(0.05)
+            return "ok"
+
+        for _ in range(4):
+            hedger.call(slow)
+        self.assertEqual(hedger.hedged, 2)
+
+    def test_failed_attempt_falls_back_to_the_other(self):
+        hedger = self._hedger()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise RuntimeError("primary failed")
+            time.sleep(0.2)
+            return "hedge"
+
+        self.assertEqual(hedger.call(fn), "hedge")
+
+    def test_attempts_ignore_the_request_token(self):
+        # Hedged calls run inside a single flight shared with other requests
+        hedger = self._hedger(min_samples=0)
+        token = CancellationToken()
+        token.cancel()
+        reset = cancellation._current.set(token)
+        try:
+            self.assertEqual(hedger.call(lambda: check_cancelled("test") or "ok"), "ok")
+            with self.assertRaises(RequestCancelledError):
+                check_cancelled("test")
+        finally:
+            cancellation._current.reset(reset)
+
+
+class TestGeminiHedging(unittest.TestCase):
+    def test_query_embeddings_are_hedged(self):
+        service = GeminiService()
+        self.addCleanup(service.close)
+        sdk = MagicMock()
+        sdk.embed_content.return_value = {"embedding": [0.1, 0.2]}
+        with patch.object(service, "_sdk", return_value=sdk):
+            service.embed_text("python developer", task_type="retrieval_query")
+            service.embed_text("resume text", task_type="retrieval_document")
+        self.assertEqual(service.hedger("query_embedding").stats()["samples"], 1)
+        self.assertNotIn("retrieval_document", service.health()["hedging"])
+
+    @patch("app.services.gemini_service.settings.HEDGE_ENABLED", False)
+    def test_hedging_can_be_disabled(self):
+        service = GeminiService()
+        self.addCleanup(service.close)
+        sdk = MagicMock()
+        sdk.embed_content.return_value = {"embedding": [0.1]}
+        with patch.object(service, "_sdk", return_value=sdk):
+            service.embed_text("python developer", task_type="retrieval_query")
+        self.assertEqual(service.health()["hedging"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import random
+import unittest
+
+from app.utils.json_extractor import extract_json, JsonExtractionError, TIER_DIRECT
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "llm_json_corpus.json")
+
+with open(CORPUS_PATH, encoding="utf-8") as f:
+    CORPUS = json.load(f)
+
+
+class TestJsonExtractorCorpus(unittest.TestCase):
+    def test_corpus(self):
+        for case in CORPUS:
+            with self.subTest(case=case["name"]):
+                result = extract_json(case["text"])
+                self.assertEqual(result.value, case["expected"])
+                self.assertEqual(result.tier, case["tier"])
+
+    def test_no_json(self):
+        for text in ["", "I cannot help with that.", "}]"]:
+            with self.subTest(text=text):
+                with self.assertRaises(JsonExtractionError):
+                    extract_json(text)
+
+
+class TestJsonExtractorFuzz(unittest.TestCase):
+    """Random corruptions of valid corpus documents must never crash or lose the whole value."""
+
+    SEED = 1234
+    ROUNDS = 300
+
+    def setUp(self):
+        self.rng = random.Random(self.SEED)
+        self.documents = [json.dumps(case["expected"], ensure_ascii=False)
+                          for case in CORPUS if case["tier"] == TIER_DIRECT]
+
+    def test_truncation_always_recovers_a_container(self):
+        for _ in range(self.ROUNDS):
+            doc = self.rng.choice(self.documents)
+            cut = self.rng.randint(1, len(doc))
+            text = doc[:cut]
+            with self.subTest(text=text):
+                value = extract_json(text).value
+                self.assertIsInstance(value, type(json.loads(doc)))
+
+    def test_noise_around_valid_json_is_ignored(self):
+        noise = ["Sure! ", "```json\n", "\n```", " I do not recommend", "Note: [draft]\n", "\n\n"]
+        for _ in range(self.ROUNDS):
+            doc = self.rng.choice(self.documents)
+            text = "".join(self.rng.sample(noise[:2] + noise[4:], 1)) + doc + "".join(self.rng.sample(noise[2:4], 1))
+            with self.subTest(text=text):
+                self.assertEqual(extract_json(text).value, json.loads(doc))
+
+    def test_random_garbage_only_raises_extraction_error(self):
+        alphabet = '{}[]",:abc 123\n\\'
+        for _ in range(self.ROUNDS):
+            text = "".join(self.rng.choice(alphabet) for _ in range(self.rng.randint(0, 40)))
+            with self.subTest(text=text):
+                try:
+                    extract_json(text)
+                except JsonExtractionError:
+                    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ def test_clean_and_parse_json():
     import sys
     import os
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from main import clean_and_parse_json
+    from app.utils.json_parser import clean_and_parse_json
 
     print("Running tests for clean_and_parse_json...")
 
@@ -28,14 +28,18 @@ def test_clean_and_parse_json():
     print("✅ Test Case 4 Passed: JSON with surrounding text")
     
 
-    # Test Case 5: Malformed JSON (should raise ValueError)
-    malformed_json = '{"key": "value"'
+    # Test Case 5: Truncated JSON (max_output_tokens cutoff) is repaired
+    truncated_json = '{"key": "value"'
+    assert clean_and_parse_json(truncated_json) == {"key": "value"}
+    print("✅ Test Case 5 Passed: Truncated JSON repaired")
+
+    # Test Case 5b: No JSON at all (should raise ValueError)
     try:
-        clean_and_parse_json(malformed_json)
-        print("❌ Test Case 5 Failed: Should have raised ValueError")
+        clean_and_parse_json("I cannot help with that.")
+        raise AssertionError("Test Case 5b Failed: Should have raised ValueError")
     except ValueError as e:
-        assert str(e) == "Failed to parse AI response" or "No JSON start found" in str(e)
-        print(f"✅ Test Case 5 Passed: Malformed JSON raised expected ValueError: {e}")
+        assert str(e) == "Failed to parse AI response"
+        print(f"✅ Test Case 5b Passed: No JSON raised expected ValueError: {e}")
 
     # Test Case 6: Truncated JSON recovery (Brace Counting)
     # The new logic should be able to extract the valid part if it's a "I do not recommend..." loop appended
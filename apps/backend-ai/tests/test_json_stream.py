@@ -0,0 +1,110 @@
+import json
+import random
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.utils.json_stream import JsonFieldStream, EVENT_DELTA, EVENT_FIELD
+
+DOCUMENT = {
+    "description": "# Backend Engineer\n\nWe build \"fast\" things \u00e9t\u00e9 \u2014 see {braces} and [brackets], C:\\path.\n",
+    "summary": "Short",
+    "responsibilities": ["Ship APIs", "Review {code}"],
+    "requirements": [],
+    "salary_range": {"min": 1000, "max": 2000},
+}
+
+
+def _feed_in_chunks(text, sizes):
+    parser = JsonFieldStream()
+    events = []
+    position = 0
+    for size in sizes:
+        events.extend(parser.feed(text[position:position + size]))
+        position += size
+    events.extend(parser.feed(text[position:]))
+    return parser, events
+
+
+class TestJsonFieldStream(unittest.TestCase):
+    def _check(self, text, sizes):
+        parser, events = _feed_in_chunks(text, sizes)
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.fields, DOCUMENT)
+        self.assertEqual([name for kind, name, _ in events if kind == EVENT_FIELD], list(DOCUMENT))
+        deltas = "".join(value for kind, name, value in events if kind == EVENT_DELTA and name == "description")
+        self.assertEqual(deltas, DOCUMENT["description"])
+
+    def test_whole_document(self):
+        self._check(json.dumps(DOCUMENT), [])
+
+    def test_single_characters(self):
+        text = json.dumps(DOCUMENT)
+        self._check(text, [1] * len(text))
+
+    def test_random_chunking_with_fence_and_escapes(self):
+        rng = random.Random(7)
+        for ensure_ascii in (True, False):
+            text = "```json\n" + json.dumps(DOCUMENT, ensure_ascii=ensure_ascii, indent=2) + "\n```"
+            for _ in range(200):
+                with self.subTest(ensure_ascii=ensure_ascii):
+                    self._check(text, [rng.randint(1, 12) for _ in range(len(text) // 3)])
+
+    def test_field_emitted_before_document_ends(self):
+        parser = JsonFieldStream()
+        events = parser.feed('{"summary": "done", "description": "part')
+        self.assertIn((EVENT_FIELD, "summary", "done"), events)
+        self.assertIn((EVENT_DELTA, "description", "part"), events)
+        self.assertFalse(parser.done)
+
+    def test_incomplete_escape_is_held_back(self):
+        parser = JsonFieldStream()
+        self.assertEqual(parser.feed('{"description": "a\\u00'), [(EVENT_DELTA, "description", "a")])
+        self.assertEqual(parser.feed('e9b"}')[0], (EVENT_DELTA, "description", "\u00e9b"))
+
+
+class TestStreamingEndpoints(unittest.TestCase):
+    def setUp(self):
+        from main import app
+        self.client = TestClient(app)
+
+    def _events(self, response):
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            lines = block.split("\n")
+            events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+        return events
+
+    def test_job_description_stream(self):
+        text = json.dumps(DOCUMENT)
+        chunks = iter([text[i:i + 16] for i in range(0, len(text), 16)])
+        with patch("app.routers.jobs.gemini_service.stream_content", return_value=chunks):
+            response = self.client.post("/generate-job-description/stream", json={"title": "Backend Engineer"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = self._events(response)
+        self.assertEqual(events[0][0], "token")
+        self.assertEqual(events[-1], ("done", DOCUMENT))
+        self.assertEqual([data["name"] for kind, data in events if kind == "field"], list(DOCUMENT))
+
+    def test_section_stream(self):
+        with patch("app.routers.jobs.gemini_service.stream_content", return_value=iter(["Hello ", "world "])):
+            response = self.client.post("/generate-template-section/stream", json={
+                "job_title": "Engineer", "section_type": "SUMMARY", "context": "Summary"
+            })
+        events = self._events(response)
+        self.assertEqual(events, [("token", {"text": "Hello "}), ("token", {"text": "world "}), ("done", {"content": "Hello world"})])
+
+    def test_error_mid_stream(self):
+        def chunks():
+            yield '{"summary": "x"'
+            raise ConnectionError("stream reset")
+        with patch("app.routers.jobs.gemini_service.stream_content", return_value=chunks()):
+            response = self.client.post("/generate-job-description/stream", json={"title": "Engineer"})
+        events = self._events(response)
+        self.assertEqual(events[-1], ("error", {"detail": "stream reset"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
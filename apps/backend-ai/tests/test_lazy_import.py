@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from app.utils.lazy_import import lazy_module
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+class TestLazyModule(unittest.TestCase):
+    def test_imports_on_first_attribute_access(self):
+        module = lazy_module("json")
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertIn("dumps", vars(module))
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            lazy_module("json").not_there
+
+    def test_app_import_does_not_load_sdks(self):
+        script = (
+            "import sys, main; "
+            "print(','.join(m for m in ('google.generativeai', 'pymilvus', 'fitz') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", script],
+            cwd=APP_DIR, capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
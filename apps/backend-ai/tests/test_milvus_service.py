@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services.milvus_service import MilvusService, MilvusUnavailableError
+from app.utils.sparse_encoder import EMPTY_DOCUMENT_TERM, encode_query
+
+
+class TestMilvusDelete(unittest.TestCase):
+    def setUp(self):
+        self.service = MilvusService()
+        self.service._collection = MagicMock()
+
+    @patch('app.services.milvus_service.settings')
+    def test_delete_is_chunked_and_deduplicated(self, mock_settings):
+        mock_settings.MILVUS_EXPR_BATCH_SIZE = 2
+
+        count = self.service.delete_candidates(["a", "b", "a", "c"])
+
+        self.assertEqual(count, 3)
+        exprs = [c.args[0] for c in self.service._collection.delete.call_args_list]
+        self.assertEqual(exprs, ['candidate_id in ["a", "b"]', 'candidate_id in ["c"]'])
+
+    def test_delete_escapes_ids(self):
+        self.service.delete_candidates(['x"] or true or ["'])
+
+        expr = self.service._collection.delete.call_args.args[0]
+        self.assertEqual(json.loads(expr[len("candidate_id in "):]), ['x"] or true or ["'])
+
+    def test_delete_nothing(self):
+        self.assertEqual(self.service.delete_candidates([]), 0)
+        self.service._collection.delete.assert_not_called()
+
+
+class TestMilvusUpsert(unittest.TestCase):
+    def test_profile_without_terms_is_stored_with_a_placeholder(self):
+        service = MilvusService()
+        service._collection = MagicMock()
+        service.upsert_candidate("c1", [0.1, 0.2], metadata={}, sparse_vector={})
+        sparse = service._collection.insert.call_args[0][0][2][0]
+        self.assertEqual(sparse, {EMPTY_DOCUMENT_TERM: 1.0})
+        self.assertNotIn(EMPTY_DOCUMENT_TERM, encode_query("python developer"))
+
+
+class TestMilvusAvailability(unittest.TestCase):
+    def setUp(self):
+        self.service = MilvusService()
+        self.service.start_reconnect = MagicMock()
+
+    def test_fails_fast_when_not_connected(self):
+        with self.assertRaises(MilvusUnavailableError):
+            self.service.search([0.1])
+        self.service.start_reconnect.assert_called_once()
+
+    def test_breaker_opens_and_drops_connection(self):
+        collection = MagicMock()
+        collection.search.side_effect = RuntimeError("connection refused")
+        self.service._collection = collection
+
+        for _ in range(self.service.breaker.failure_threshold):
+            with self.assertRaises(RuntimeError):
+                self.service.search([0.1])
+
+        self.assertEqual(self.service.state, "disconnected")
+        with self.assertRaises(MilvusUnavailableError):
+            self.service.search([0.1])
+        self.assertEqual(collection.search.call_count, self.service.breaker.failure_threshold)
+
+
+class TestMilvusStartup(unittest.TestCase):
+    def test_start_connects_in_background(self):
+        service = MilvusService()
+        connected = threading.Event()
+
+        def try_connect():
+            connected.wait(5)
+            service._collection = MagicMock()
+            return True
+
+        service._try_connect = try_connect
+        service.start()
+        # Returns at once; the attempt is still running
+        self.assertEqual(service.state, "reconnecting")
+        with self.assertRaises(MilvusUnavailableError):
+            service.ensure_available()
+
+        connected.set()
+        service._reconnect_thread.join(5)
+        self.assertEqual(service.state, "connected")
+
+    @patch('app.services.milvus_service.pymilvus')
+    def test_requests_fail_fast_while_the_collection_loads(self, mock_pymilvus):
+        service = MilvusService()
+        loading, loaded = threading.Event(), threading.Event()
+
+        def load_collection():
+            loading.set()
+            loaded.wait(5)
+            return MagicMock()
+
+        service._load_collection = load_collection
+        service.start()
+        self.assertTrue(loading.wait(5))
+        started = time.monotonic()
+        with self.assertRaises(MilvusUnavailableError):
+            service.ensure_available()
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        loaded.set()
+        service._reconnect_thread.join(5)
+        self.assertEqual(service.state, "connected")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,63 +1,188 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
+
+import fitz
 from fastapi.testclient import TestClient
+
 from main import app
-import io
+from app.core.metrics import metrics
+from app.services.gemini_file_cache import file_sha256
+from app.services.pdf_service import pdf_service, text_quality, PAGE_TEXT, PAGE_IMAGE, PAGE_EMPTY
+
+CLEAN_OCR = (
+    "Jane Doe - Senior Backend Engineer, Paris. Eight years of experience building Python "
+    "and Go services, PostgreSQL, Kubernetes. Master's degree in Computer Science."
+)
+GARBLED_OCR = "|| ;; 1l1 ,. ~~ 0O0 ## I|l ., '' 8B8 %% |_| ;; 1l1 ,. ~~ 0O0 ## I|l ., '' 8B8 %%"
+TYPED_PAGE = "John Smith\nData Engineer with 6 years of Spark, Airflow and dbt experience in Lyon."
+
+
+def _add_image_page(doc):
+    # No text layer, one embedded image: what a scanned page looks like
+    page = doc.new_page()
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 280), False)
+    pixmap.clear_with(200)
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def _add_text_page(doc, text=TYPED_PAGE):
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+
+
+def _pdf(*builders) -> bytes:
+    doc = fitz.open()
+    for builder in builders:
+        builder(doc)
+    return doc.tobytes()
+
+
+class TestTextQuality(unittest.TestCase):
+    def test_scores(self):
+        self.assertGreater(text_quality(CLEAN_OCR), 0.8)
+        self.assertLess(text_quality(GARBLED_OCR), 0.2)
+        self.assertEqual(text_quality(""), 0.0)
+
+
+class TestPageClassification(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def _file(self, content: bytes) -> str:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        self.paths.append(path)
+        return path
+
+    @patch.object(pdf_service, 'ocr_available', return_value=True)
+    def test_only_image_pages_are_ocrd_and_merged_in_order(self, _):
+        path = self._file(_pdf(_add_text_page, _add_image_page, lambda doc: doc.new_page(), _add_text_page))
+        with patch.object(pdf_service, '_ocr_page', return_value=CLEAN_OCR) as mock_ocr:
+            document = pdf_service.extract_document(path)
+
+        self.assertEqual([page.kind for page in document.pages], [PAGE_TEXT, PAGE_IMAGE, PAGE_EMPTY, PAGE_TEXT])
+        mock_ocr.assert_called_once()
+        self.assertTrue(document.ocr_used)
+        self.assertEqual(document.unrecognized_image_pages, [])
+        text = document.text
+        self.assertLess(text.index("John Smith"), text.index("Jane Doe"))
+        self.assertLess(text.index("Jane Doe"), text.rindex("John Smith"))
+
+    @patch.object(pdf_service, 'ocr_available', return_value=True)
+    def test_poor_ocr_leaves_page_unrecognized(self, _):
+        path = self._file(_pdf(_add_text_page, _add_image_page))
+        with patch.object(pdf_service, '_ocr_page', return_value=GARBLED_OCR):
+            document = pdf_service.extract_document(path)
+
+        self.assertFalse(document.ocr_used)
+        self.assertEqual(document.unrecognized_image_pages, [1])
+        self.assertNotIn("1l1", document.text)
+
+    @patch.object(pdf_service, 'ocr_available', return_value=False)
+    def test_ocr_unavailable(self, _):
+        path = self._file(_pdf(_add_image_page))
+        with patch.object(pdf_service, '_ocr_page') as mock_ocr:
+            document = pdf_service.extract_document(path)
+        mock_ocr.assert_not_called()
+        self.assertEqual(document.unrecognized_image_pages, [0])
+
+    def test_render_pages_keeps_only_requested_pages(self):
+        path = self._file(_pdf(_add_text_page, _add_image_page, _add_text_page))
+        rendered = pdf_service.render_pages(path, [1], dpi=72)
+        self.paths.append(rendered)
+        with fitz.open(rendered) as doc:
+            self.assertEqual(doc.page_count, 1)
+            self.assertEqual(len(doc[0].get_images()), 1)
+            self.assertEqual(doc[0].get_text().strip(), "")
+
+    def test_render_pages_is_deterministic(self):
+        # The Gemini upload cache is keyed on the file hash
+        path = self._file(_pdf(_add_text_page, _add_image_page))
+        rendered = [pdf_service.render_pages(path, [1], dpi=72) for _ in range(2)]
+        self.paths.extend(rendered)
+        self.assertEqual(file_sha256(rendered[0]), file_sha256(rendered[1]))
+
 
 class TestOCRFallback(unittest.TestCase):
     def setUp(self):
         self.client = TestClient(app)
+        self.parsed = {"skills": ["Python"], "summary": "Backend engineer", "experience_years": 8,
+                       "education_level": "Master", "location": "Paris"}
+
+    def _post(self, content: bytes):
+        return self.client.post("/parse-cv", files={'file': ('test.pdf', content, 'application/pdf')})
+
+    @patch.object(pdf_service, 'ocr_available', return_value=True)
+    @patch.object(pdf_service, '_ocr_page', return_value=CLEAN_OCR)
+    @patch('app.routers.candidates.gemini_service')
+    def test_local_ocr_used_when_good(self, mock_gemini, mock_ocr, _):
+        mock_gemini.generate_json.return_value = dict(self.parsed)
+
+        data = self._post(_pdf(_add_image_page)).json()
+
+        self.assertEqual(data['raw_text'].strip(), CLEAN_OCR)
+        self.assertIn(CLEAN_OCR, mock_gemini.generate_json.call_args.args[0])
+        mock_gemini.generate_with_vision.assert_not_called()
+
+    @patch.object(pdf_service, 'ocr_available', return_value=True)
+    @patch.object(pdf_service, '_ocr_page', return_value=GARBLED_OCR)
+    @patch('app.routers.candidates.gemini_service')
+    def test_vision_gets_only_unrecognized_pages(self, mock_gemini, mock_ocr, _):
+        sent = {}
+
+        def vision(prompt, path, schema=None):
+            with fitz.open(path) as doc:
+                sent["pages"] = doc.page_count
+            return dict(self.parsed)
+
+        mock_gemini.generate_with_vision.side_effect = vision
+
+        data = self._post(_pdf(_add_image_page, lambda doc: doc.new_page(), _add_image_page)).json()
 
-    @patch('main.connections')
-    @patch('main.Collection')
-    @patch('main.utility')
-    @patch('main.PdfReader')
-    @patch('main.genai')
-    def test_ocr_fallback_triggered(self, mock_genai, mock_pdf_reader, mock_utility, mock_collection, mock_connections):
-        # Mock Milvus connection to avoid hang
-        mock_connections.has_connection.return_value = True
-        mock_utility.has_collection.return_value = True
-
-        # 1. Mock PdfReader to return empty text
-        mock_pdf_instance = MagicMock()
-        mock_page = MagicMock()
-        mock_page.extract_text.return_value = "" # Empty text
-        mock_pdf_instance.pages = [mock_page]
-        mock_pdf_reader.return_value = mock_pdf_instance
-
-        # 2. Mock genai.upload_file
-        mock_uploaded_file = MagicMock()
-        mock_uploaded_file.name = "mock_file_uri"
-        mock_genai.upload_file.return_value = mock_uploaded_file
-
-        # 3. Mock model.generate_content
-        mock_model = MagicMock()
-        mock_response = MagicMock()
-        mock_response.text = '{"skills": ["OCR Skill"], "summary": "OCR Summary", "experience_years": 5, "education_level": "Bachelor"}'
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
-
-        # 4. Create a dummy PDF file
-        file_content = b"%PDF-1.4 dummy content"
-        files = {'file': ('test.pdf', file_content, 'application/pdf')}
-
-        # 5. Make the request
-        response = self.client.post("/parse-cv", files=files)
-
-        # 6. Assertions
-        self.assertEqual(response.status_code, 200)
-        data = response.json()
-        
-        # Verify OCR fallback was used
         self.assertEqual(data['raw_text'], "OCR_EXTRACTED")
-        self.assertEqual(data['summary'], "OCR Summary")
-        
-        # Verify upload_file was called
-        mock_genai.upload_file.assert_called_once()
-        
-        # Verify generate_content was called with the file
-        args, kwargs = mock_model.generate_content.call_args
-        self.assertIn(mock_uploaded_file, args[0])
+        self.assertEqual(data['summary'], "Backend engineer")
+        self.assertEqual(sent["pages"], 2)
+        mock_gemini.generate_json.assert_not_called()
+
+    @patch.object(pdf_service, 'ocr_available', return_value=False)
+    @patch('app.routers.candidates.gemini_service')
+    def test_typed_cv_with_scanned_page_sends_that_page_to_vision(self, mock_gemini, _):
+        sent = {}
+
+        def vision(prompt, path, schema=None):
+            sent["prompt"] = prompt
+            with fitz.open(path) as doc:
+                sent["pages"] = doc.page_count
+            return dict(self.parsed)
+
+        mock_gemini.generate_with_vision.side_effect = vision
+
+        data = self._post(_pdf(_add_text_page, _add_image_page)).json()
+
+        self.assertIn("John Smith", data['raw_text'])
+        self.assertIn("John Smith", sent["prompt"])
+        self.assertEqual(sent["pages"], 1)
+        mock_gemini.generate_json.assert_not_called()
+
+    @patch.object(pdf_service, 'ocr_available', return_value=False)
+    @patch('app.routers.candidates.gemini_service')
+    def test_scanned_page_dropped_when_vision_fails(self, mock_gemini, _):
+        mock_gemini.generate_with_vision.side_effect = RuntimeError("vision down")
+        mock_gemini.generate_json.return_value = dict(self.parsed)
+        dropped = metrics.get("cv_image_pages_dropped_total")
+
+        data = self._post(_pdf(_add_text_page, _add_image_page)).json()
+
+        self.assertEqual(data['summary'], "Backend engineer")
+        self.assertIn("John Smith", mock_gemini.generate_json.call_args.args[0])
+        self.assertEqual(metrics.get("cv_image_pages_dropped_total"), dropped + 1)
 
 if __name__ == '__main__':
     unittest.main()
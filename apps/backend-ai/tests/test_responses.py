@@ -0,0 +1,149 @@
+import gzip
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.middleware import CompressionMiddleware
+from app.core.responses import (
+    MSGPACK_MEDIA_TYPE, FastJSONResponse, NegotiatedResponse, accepts, negotiate_encoding
+)
+
+LARGE_TEXT = "Senior Python developer, ten years of backend experience. " * 200
+
+
+def _demo_app() -> FastAPI:
+    demo = FastAPI(default_response_class=FastJSONResponse)
+
+    @demo.get("/large")
+    def large():
+        return {"raw_text": LARGE_TEXT}
+
+    @demo.get("/small")
+    def small():
+        return {"ok": True}
+
+    @demo.get("/bulk", response_class=NegotiatedResponse, dependencies=[Depends(negotiate_encoding)])
+    def bulk():
+        return {"results": [1, 2, 3]}
+
+    @demo.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["event: a\ndata: " + LARGE_TEXT + "\n\n"]), media_type="text/event-stream")
+
+    @demo.get("/chunks")
+    def chunks():
+        return StreamingResponse(iter([LARGE_TEXT, LARGE_TEXT]), media_type="application/x-ndjson")
+
+    demo.add_middleware(CompressionMiddleware, minimum_size=1024, gzip_level=6, brotli_quality=5)
+    return demo
+
+
+class TestAccepts(unittest.TestCase):
+    def test_header_parsing(self):
+        self.assertTrue(accepts("gzip, br;q=0.5", "br"))
+        self.assertFalse(accepts("gzip, br;q=0", "br"))
+        self.assertFalse(accepts("*/*", MSGPACK_MEDIA_TYPE))
+        self.assertTrue(accepts("application/msgpack, application/json;q=0.9", MSGPACK_MEDIA_TYPE))
+        self.assertFalse(accepts(None, "br"))
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(_demo_app())
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertLess(int(response.headers["content-length"]), len(LARGE_TEXT) // 10)
+        self.assertEqual(response.json()["raw_text"], LARGE_TEXT)
+
+    def test_small_body_is_not_compressed(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_sse_stream_is_not_compressed(self):
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip, br"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_brotli_preferred_when_installed(self):
+        compressor = MagicMock()
+        compressor.process.side_effect = lambda body: gzip.compress(body)
+        compressor.finish.return_value = b""
+        compressor.flush.return_value = b""
+        fake_brotli = MagicMock()
+        fake_brotli.Compressor.return_value = compressor
+        with patch("app.core.middleware.brotli", fake_brotli):
+            response = self.client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+            self.assertEqual(response.headers["content-encoding"], "br")
+            self.assertEqual(response.headers["vary"], "Accept-Encoding")
+            self.assertLess(int(response.headers["content-length"]), len(LARGE_TEXT) // 10)
+            fake_brotli.Compressor.assert_called_with(quality=5)
+            # Streamed bodies: each chunk flushed, no Content-Length
+            response = self.client.get("/chunks", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.headers["content-encoding"], "br")
+            self.assertNotIn("content-length", response.headers)
+            self.assertEqual(compressor.flush.call_count, 2)
+            # Small bodies and SSE streams are left alone
+            for path in ("/small", "/stream"):
+                response = self.client.get(path, headers={"Accept-Encoding": "br"})
+                self.assertNotIn("content-encoding", response.headers)
+            # Clients without br still get gzip
+            response = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(response.headers["content-encoding"], "gzip")
+
+
+class TestNegotiation(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(_demo_app())
+
+    def test_json_by_default(self):
+        response = self.client.get("/bulk")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.headers["vary"], "Accept")
+        self.assertEqual(response.json(), {"results": [1, 2, 3]})
+
+    def test_msgpack_on_request(self):
+        fake_msgpack = MagicMock()
+        fake_msgpack.packb.return_value = b"\x81packed"
+        with patch("app.core.responses.msgpack", fake_msgpack):
+            response = self.client.get("/bulk", headers={"Accept": MSGPACK_MEDIA_TYPE})
+        self.assertEqual(response.headers["content-type"], MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.headers["vary"], "Accept")
+        self.assertEqual(response.content, b"\x81packed")
+        fake_msgpack.packb.assert_called_with({"results": [1, 2, 3]}, use_bin_type=True)
+
+    def test_msgpack_not_installed_falls_back_to_json(self):
+        with patch("app.core.responses.msgpack", None):
+            response = self.client.get("/bulk", headers={"Accept": MSGPACK_MEDIA_TYPE})
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+
+class TestAppResponses(unittest.TestCase):
+    @patch("app.routers.candidates.gemini_service")
+    def test_routes_render_with_fast_json(self, mock_gemini):
+        mock_gemini.generate_json.return_value = {"match_score": 80, "summary": LARGE_TEXT}
+        rendered = []
+        render = FastJSONResponse.render
+
+        def tracking_render(response, content):
+            rendered.append(content)
+            return render(response, content)
+
+        with patch.object(FastJSONResponse, "render", tracking_render):
+            response = TestClient(app).post(
+                "/screen-candidate",
+                json={"resume_text": "x", "job_description": "y", "criteria": {}},
+                headers={"Accept-Encoding": "gzip"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.json()["summary"], LARGE_TEXT)
+        self.assertEqual(len(rendered), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from google.api_core import exceptions as google_exceptions
+
+from app.services.gemini_service import is_retryable
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.retry import RetryPolicy, call_with_retry
+
+
+class TestCallWithRetry(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, deadline=5)
+
+    def _call(self, fn, breaker=None):
+        return call_with_retry(fn, self.policy, is_retryable, breaker=breaker, sleep=self.sleeps.append)
+
+    def test_retries_transient_errors_then_succeeds(self):
+        outcomes = [google_exceptions.ResourceExhausted("quota"), google_exceptions.ServiceUnavailable("busy"), "ok"]
+
+        def fn(timeout):
+            self.assertGreater(timeout, 0)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(self._call(fn), "ok")
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_does_not_retry_client_errors(self):
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            raise google_exceptions.InvalidArgument("bad prompt")
+
+        with self.assertRaises(google_exceptions.InvalidArgument):
+            self._call(fn)
+        self.assertEqual(len(calls), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        def fn(timeout):
+            raise google_exceptions.InternalServerError("boom")
+
+        with self.assertRaises(google_exceptions.InternalServerError):
+            self._call(fn)
+        self.assertEqual(len(self.sleeps), self.policy.max_attempts - 1)
+
+    def test_open_breaker_fails_fast(self):
+        breaker = CircuitBreaker("model", failure_threshold=2, reset_timeout=60)
+
+        def fn(timeout):
+            raise google_exceptions.ServiceUnavailable("down")
+
+        with self.assertRaises(CircuitOpenError):
+            self._call(fn, breaker=breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self._call(lambda timeout: self.fail("should not be called"), breaker=breaker)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import serve
+from app.core.config import settings
+from app.core.memory_watchdog import MemoryWatchdog, current_rss_bytes
+
+
+class TestMemoryWatchdog(unittest.TestCase):
+    def test_recycles_once_above_limit(self):
+        rss = [100, 300, 400]
+        on_exceeded = MagicMock()
+        watchdog = MemoryWatchdog(max_rss_bytes=200, interval=1, on_exceeded=on_exceeded, rss=lambda: rss.pop(0))
+
+        self.assertFalse(watchdog.check())
+        self.assertTrue(watchdog.check())
+        self.assertFalse(watchdog.check())
+        on_exceeded.assert_called_once()
+
+    def test_disabled_when_limit_is_zero(self):
+        watchdog = MemoryWatchdog(max_rss_bytes=0, interval=1)
+        watchdog.start()
+        self.assertIsNone(watchdog._thread)
+
+    def test_reads_current_rss(self):
+        self.assertGreater(current_rss_bytes(), 0)
+
+
+class TestServe(unittest.TestCase):
+    def test_worker_count(self):
+        with patch.object(settings, "WEB_CONCURRENCY", 3):
+            self.assertEqual(serve.worker_count(), 3)
+        with patch.object(settings, "WEB_CONCURRENCY", 0):
+            self.assertEqual(serve.worker_count(), serve.usable_cpus())
+        self.assertGreaterEqual(serve.usable_cpus(), 1)
+
+    @patch("serve.uvicorn.run")
+    def test_runs_multi_worker_server(self, run):
+        with patch.object(settings, "WEB_CONCURRENCY", 4):
+            serve.main()
+        kwargs = run.call_args.kwargs
+        self.assertEqual(run.call_args.args, ("main:app",))
+        self.assertEqual(kwargs["workers"], 4)
+        self.assertNotIn("reload", kwargs)
+        self.assertEqual(kwargs["limit_max_requests"], settings.WORKER_MAX_REQUESTS)
+        self.assertEqual(kwargs["timeout_graceful_shutdown"], settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return {"answer": 42}
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flight.do, "key", fn) for _ in range(5)]
+            while flight.coalesced < 4:
+                threading.Event().wait(0.01)
+            release.set()
+            results = [f.result(timeout=5) for f in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"answer": 42} for r in results))
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError("upstream failed")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(flight.do, "key", failing) for _ in range(2)]
+            while flight.coalesced < 1:
+                threading.Event().wait(0.01)
+            release.set()
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result(timeout=5)
+
+        # Completed calls are forgotten: the next call runs again
+        self.assertEqual(flight.do("key", lambda: "fresh"), "fresh")
+
+    def test_different_keys_do_not_coalesce(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("a", lambda: 1), 1)
+        self.assertEqual(flight.do("b", lambda: 2), 2)
+        self.assertEqual(flight.coalesced, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from pydantic import ValidationError
+
+from app.schemas import HybridSearchRequest
+from app.utils.sparse_encoder import tokenize, encode_document, encode_query
+
+
+class TestSparseEncoder(unittest.TestCase):
+    def test_tokenize_keeps_tech_terms_and_drops_stopwords(self):
+        tokens = tokenize("Senior C++ and C# developer with Node.js, the best.")
+        self.assertIn("c++", tokens)
+        self.assertIn("c#", tokens)
+        self.assertIn("node.js", tokens)
+        self.assertNotIn("and", tokens)
+        self.assertNotIn("the", tokens)
+        self.assertIn("best", tokens)
+
+    def test_query_terms_match_document_terms(self):
+        doc = encode_document("Python developer, Django and PostgreSQL")
+        query = encode_query("django python")
+        self.assertTrue(set(query).issubset(set(doc)))
+        self.assertTrue(all(w == 1.0 for w in query.values()))
+
+    def test_term_frequency_saturates(self):
+        once = encode_document("python")
+        many = encode_document(" ".join(["python"] * 50))
+        term = next(iter(once))
+        self.assertGreater(many[term], once[term])
+        # BM25 caps the contribution at k1 + 1
+        self.assertLess(many[term], 2.3)
+
+    def test_empty_text(self):
+        self.assertEqual(encode_document(""), {})
+        self.assertEqual(encode_query("the and of"), {})
+
+
+
+class TestHybridSearchRequest(unittest.TestCase):
+    def test_fusion_is_validated(self):
+        self.assertEqual(HybridSearchRequest(query="python").fusion, "rrf")
+        self.assertEqual(HybridSearchRequest(query="python", fusion="weighted").fusion, "weighted")
+        with self.assertRaises(ValidationError):
+            HybridSearchRequest(query="python", fusion="max")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+from typing import List
+from unittest.mock import patch
+
+from app.schemas import ScreeningResponse, ScorecardResponse, CVParseResponse
+from app.services.gemini_service import gemini_service, EmptyResponseError
+from app.utils.gemini_schema import to_gemini_schema
+
+
+def _response(text):
+    return SimpleNamespace(parts=[text] if text else [], text=text, candidates=[])
+
+
+class TestGeminiSchema(unittest.TestCase):
+    def test_nested_model_is_inlined_and_required(self):
+        schema = to_gemini_schema(ScorecardResponse)
+        self.assertEqual(schema["type"], "OBJECT")
+        self.assertEqual(set(schema["required"]), {"requiredSkills", "niceToHaves", "scoringWeights"})
+        weights = schema["properties"]["scoringWeights"]
+        self.assertEqual(weights["type"], "OBJECT")
+        self.assertEqual(weights["properties"]["skills_match"]["type"], "NUMBER")
+
+    def test_optional_and_defaults(self):
+        schema = to_gemini_schema(CVParseResponse)
+        self.assertTrue(schema["properties"]["location"]["nullable"])
+        self.assertNotIn("location", schema.get("required", []))
+        self.assertNotIn("default", str(schema))
+
+    def test_list_of_models(self):
+        schema = to_gemini_schema(List[ScreeningResponse])
+        self.assertEqual(schema["type"], "ARRAY")
+        self.assertEqual(schema["items"]["type"], "OBJECT")
+
+
+class TestGenerateStructured(unittest.TestCase):
+    def test_valid_first_try(self):
+        payload = '{"match_score": 80, "summary": "Good", "pros": ["a"], "cons": [], "red_flags": [], "missing_critical_skills": []}'
+        with patch.object(gemini_service, "generate_content", return_value=_response(payload)) as call:
+            result = gemini_service.generate_structured("prompt", ScreeningResponse)
+        self.assertEqual(result["match_score"], 80)
+        self.assertEqual(call.call_count, 1)
+
+    def test_invalid_output_is_reasked(self):
+        responses = [
+            _response('{"match_score": "high", "summary": "x", "pros": [], "cons": [], "red_flags": [], "missing_critical_skills": []}'),
+            _response('{"match_score": 70, "summary": "x", "pros": [], "cons": [], "red_flags": [], "missing_critical_skills": []}'),
+        ]
+        with patch("app.services.gemini_service.settings.GEMINI_STRUCTURED_MAX_REASKS", 1), \
+                patch.object(gemini_service, "generate_content", side_effect=responses) as call:
+            result = gemini_service.generate_structured("prompt", ScreeningResponse)
+        self.assertEqual(result["match_score"], 70)
+        self.assertEqual(call.call_count, 2)
+        self.assertIn("YOUR PREVIOUS RESPONSE WAS INVALID", call.call_args_list[1].args[0])
+
+    def test_reask_budget_exhausted(self):
+        bad = _response('{"summary": "missing fields"}')
+        with patch("app.services.gemini_service.settings.GEMINI_STRUCTURED_MAX_REASKS", 1), \
+                patch.object(gemini_service, "generate_content", return_value=bad) as call:
+            with self.assertRaises(ValueError):
+                gemini_service.generate_structured("prompt", ScreeningResponse)
+        self.assertEqual(call.call_count, 2)
+
+    def test_empty_response(self):
+        with patch.object(gemini_service, "generate_content", return_value=_response("")):
+            with self.assertRaises(EmptyResponseError):
+                gemini_service.generate_structured("prompt", ScreeningResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
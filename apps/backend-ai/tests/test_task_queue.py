@@ -0,0 +1,296 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import fitz
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services.gemini_service import GeminiUnavailableError
+from app.services.pdf_service import pdf_service
+from app.services.task_queue import (
+    TaskQueue, TaskQueueFullError, callback_allowed,
+    STATUS_FAILED, STATUS_SUCCEEDED
+)
+
+
+def _wait(queue: TaskQueue, task_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        record = queue.get(task_id)
+        if record is not None and record.finished:
+            return record
+        time.sleep(0.01)
+    raise AssertionError(f"task {task_id} did not finish")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTaskQueue(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = TaskQueue(max_workers=2, max_pending=2, result_ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def test_submit_and_poll(self):
+        record, created = self.queue.submit("demo", lambda: {"ok": True})
+        self.assertTrue(created)
+        finished = _wait(self.queue, record.task_id)
+        self.assertEqual(finished.status, STATUS_SUCCEEDED)
+        self.assertEqual(finished.result, {"ok": True})
+        self.assertEqual(finished.status_code, 200)
+
+    def test_idempotency_key_returns_existing_task(self):
+        calls = []
+        record, _ = self.queue.submit("demo", lambda: calls.append(1), idempotency_key="k")
+        _wait(self.queue, record.task_id)
+
+        again, created = self.queue.submit("demo", lambda: calls.append(1), idempotency_key="k")
+        self.assertFalse(created)
+        self.assertEqual(again.task_id, record.task_id)
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_task_is_retried_and_keeps_http_status(self):
+        def fail():
+            raise HTTPException(status_code=413, detail="too many pages")
+
+        record, _ = self.queue.submit("demo", fail, idempotency_key="k")
+        failed = _wait(self.queue, record.task_id)
+        self.assertEqual(failed.status, STATUS_FAILED)
+        self.assertEqual(failed.status_code, 413)
+        self.assertEqual(failed.error, "too many pages")
+
+        retry, created = self.queue.submit("demo", lambda: 1, idempotency_key="k")
+        self.assertTrue(created)
+        self.assertNotEqual(retry.task_id, record.task_id)
+
+    def test_queue_full(self):
+        release = threading.Event()
+        for _ in range(4):  # 2 running + 2 pending
+            self.queue.submit("demo", release.wait)
+        deadline = time.monotonic() + 5
+        while self.queue.stats()["running"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with self.assertRaises(TaskQueueFullError):
+            self.queue.submit("demo", release.wait)
+        release.set()
+
+    def test_results_expire_after_ttl(self):
+        record, _ = self.queue.submit("demo", lambda: 1, idempotency_key="k")
+        _wait(self.queue, record.task_id)
+
+        self.clock.now += 61
+        self.assertIsNone(self.queue.get(record.task_id))
+        _, created = self.queue.submit("demo", lambda: 1, idempotency_key="k")
+        self.assertTrue(created)
+
+    def test_callback_allow_list(self):
+        self.assertTrue(callback_allowed("http://backend-core:3001/hooks/ai"))
+        self.assertFalse(callback_allowed("http://evil.example.com/hook"))
+        self.assertFalse(callback_allowed("file:///etc/passwd"))
+
+
+class TestSharedTaskStore(unittest.TestCase):
+    """Two queues sharing a store directory stand in for two worker processes."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.clock = FakeClock()
+        self.first = TaskQueue(1, 5, result_ttl=60, clock=self.clock, store_dir=self.directory)
+        self.second = TaskQueue(1, 5, result_ttl=60, clock=self.clock, store_dir=self.directory)
+        self.addCleanup(self.first.shutdown)
+        self.addCleanup(self.second.shutdown)
+
+    def test_poll_and_dedupe_through_another_worker(self):
+        record, _ = self.first.submit("demo", lambda: {"ok": True}, idempotency_key="k")
+        _wait(self.first, record.task_id)
+
+        polled = self.second.get(record.task_id)
+        self.assertEqual(polled.status, STATUS_SUCCEEDED)
+        self.assertEqual(polled.result, {"ok": True})
+
+        again, created = self.second.submit("demo", lambda: {"ok": False}, idempotency_key="k")
+        self.assertFalse(created)
+        self.assertEqual(again.task_id, record.task_id)
+
+    def test_expired_records_are_removed(self):
+        record, _ = self.first.submit("demo", lambda: 1)
+        _wait(self.first, record.task_id)
+        self.clock.now += 61
+        self.assertIsNone(self.second.get(record.task_id))
+        self.assertIsNone(self.first.get(record.task_id))
+
+    def test_shutdown_fails_queued_tasks(self):
+        release = threading.Event()
+        running, _ = self.first.submit("demo", release.wait)
+        queued, _ = self.first.submit("demo", lambda: 1)
+        threading.Timer(0.2, release.set).start()
+
+        self.first.shutdown(timeout=5)
+
+        self.assertEqual(self.second.get(running.task_id).status, STATUS_SUCCEEDED)
+        failed = self.second.get(queued.task_id)
+        self.assertEqual(failed.status, STATUS_FAILED)
+        self.assertEqual(failed.status_code, 503)
+
+    def test_shutdown_fails_tasks_still_running(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        running, _ = self.first.submit("demo", release.wait, idempotency_key="k")
+        while self.first.stats()["running"] == 0:
+            time.sleep(0.01)
+
+        self.first.shutdown(timeout=0.1)
+
+        self.assertEqual(self.second.get(running.task_id).status_code, 503)
+        _, created = self.second.submit("demo", lambda: 1, idempotency_key="k")
+        self.assertTrue(created)
+
+    def test_task_of_a_dead_worker_can_be_resubmitted(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        running, _ = self.first.submit("demo", release.wait, idempotency_key="k")
+        # The worker process that owned the task is gone (recycled, killed)
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        stored = self.second.get(running.task_id)
+        stored.owner_pid = dead.pid
+        self.first._store.save(stored)
+
+        again, created = self.second.submit("demo", lambda: 1, idempotency_key="k")
+        self.assertTrue(created)
+        self.assertNotEqual(again.task_id, running.task_id)
+        self.assertEqual(self.second.get(running.task_id).status_code, 503)
+
+    def test_sweep_removes_expired_records_of_other_workers(self):
+        record, _ = self.first.submit("demo", lambda: 1, idempotency_key="k")
+        _wait(self.first, record.task_id)
+        self.clock.now += 61
+        self.second.submit("demo", lambda: 2)
+        self.assertEqual(
+            [name for name in os.listdir(self.directory) if record.task_id in name or name.startswith("key-")], []
+        )
+
+
+class TestAsyncEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        # A fresh in-memory queue: the shared store would keep results across test runs
+        queue = TaskQueue(max_workers=2, max_pending=10, result_ttl=60)
+        self.addCleanup(queue.shutdown)
+        patcher = patch("app.routers.async_tasks.task_queue", queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _poll(self, status_url: str) -> dict:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            body = self.client.get(status_url).json()
+            if body["status"] in (STATUS_SUCCEEDED, STATUS_FAILED):
+                return body
+            time.sleep(0.01)
+        raise AssertionError("task did not finish")
+
+    @patch("app.routers.candidates.gemini_service")
+    def test_screen_candidate(self, mock_gemini):
+        mock_gemini.generate_json.return_value = {"match_score": 80}
+        payload = {"resume_text": "Python dev", "job_description": "Python", "criteria": {}}
+
+        response = self.client.post("/async/screen-candidate", json=payload)
+        self.assertEqual(response.status_code, 202)
+        body = self._poll(response.json()["status_url"])
+        self.assertEqual(body["result"], {"match_score": 80})
+
+        # Same request again: served from the stored task
+        again = self.client.post("/async/screen-candidate", json=payload)
+        self.assertEqual(again.json()["task_id"], response.json()["task_id"])
+        self.assertEqual(mock_gemini.generate_json.call_count, 1)
+
+    @patch("app.routers.candidates.gemini_service")
+    def test_parse_cv(self, mock_gemini):
+        mock_gemini.generate_json.return_value = {"skills": ["Python"], "summary": "Dev"}
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Senior Python developer with ten years of backend experience.")
+
+        response = self.client.post(
+            "/async/parse-cv", files={"file": ("cv.pdf", doc.tobytes(), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, 202)
+        body = self._poll(response.json()["status_url"])
+        self.assertEqual(body["result"]["skills"], ["Python"])
+        self.assertIn("Senior Python developer", body["result"]["raw_text"])
+
+    @patch("app.routers.candidates.gemini_service")
+    def test_degraded_parse_fails_and_is_rerun(self, mock_gemini):
+        mock_gemini.generate_json.side_effect = GeminiUnavailableError("circuit open", retry_after=30)
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Senior Python developer with ten years of backend experience.")
+        files = {"file": ("cv.pdf", doc.tobytes(), "application/pdf")}
+
+        body = self._poll(self.client.post("/async/parse-cv", files=files).json()["status_url"])
+        self.assertEqual((body["status"], body["status_code"]), (STATUS_FAILED, 503))
+
+        # Gemini is back: the same file is parsed again, not served the stored failure
+        mock_gemini.generate_json.side_effect = None
+        mock_gemini.generate_json.return_value = {"skills": ["Python"], "summary": "Dev"}
+        body = self._poll(self.client.post("/async/parse-cv", files=files).json()["status_url"])
+        self.assertEqual(body["result"]["skills"], ["Python"])
+
+    @patch("app.routers.candidates.gemini_service")
+    def test_parse_cv_upload_is_read_on_the_cpu_bulkhead(self, mock_gemini):
+        mock_gemini.generate_json.return_value = {"skills": [], "summary": "Dev"}
+        threads = []
+        load_upload = pdf_service.load_upload
+
+        def tracking_load(file):
+            threads.append(threading.current_thread().name)
+            return load_upload(file)
+
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Senior Python developer with ten years of backend experience.")
+        with patch.object(pdf_service, "load_upload", side_effect=tracking_load):
+            response = self.client.post(
+                "/async/parse-cv", files={"file": ("cv.pdf", doc.tobytes(), "application/pdf")}
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(threads[0].startswith("cpu-bulkhead"))
+
+    def test_unknown_task(self):
+        self.assertEqual(self.client.get("/async/tasks/missing").status_code, 404)
+
+    def test_rejects_foreign_callback(self):
+        response = self.client.post(
+            "/async/screen-candidate",
+            params={"callback_url": "http://evil.example.com/hook"},
+            json={"resume_text": "x", "job_description": "y", "criteria": {}}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_queue_full_is_429(self):
+        with patch("app.routers.async_tasks.task_queue.submit", side_effect=TaskQueueFullError(5)):
+            response = self.client.post(
+                "/async/screen-candidate", json={"resume_text": "x", "job_description": "y", "criteria": {}}
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "5")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import fitz
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services.text_store import TextHandleNotFoundError, TextStore, text_handle
+
+RESUME = "Senior Python developer with ten years of FastAPI and PostgreSQL experience. " * 20
+
+
+class TestTextStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.store = TextStore(self.directory, max_bytes=1024 * 1024)
+
+    def test_round_trip_by_content_hash(self):
+        handle = self.store.put(RESUME)
+        self.assertEqual(handle, hashlib.sha256(RESUME.encode("utf-8")).hexdigest())
+        self.assertEqual(self.store.get(handle), RESUME)
+        # Stored compressed, and only once
+        self.assertEqual(self.store.put(RESUME), handle)
+        self.assertLess(self.store.stats()["bytes"], len(RESUME) // 5)
+
+    def test_unknown_or_malformed_handle(self):
+        for handle in (text_handle("never stored"), "../../etc/passwd", ""):
+            with self.assertRaises(TextHandleNotFoundError):
+                self.store.get(handle)
+
+    def test_corrupt_entry_is_dropped(self):
+        handle = self.store.put(RESUME)
+        path = os.path.join(self.directory, handle[:2], handle)
+        with open(path, "wb") as f:
+            f.write(b"garbage")
+        with self.assertRaises(TextHandleNotFoundError):
+            self.store.get(handle)
+        self.assertFalse(os.path.exists(path))
+
+    def test_least_recently_used_texts_are_evicted(self):
+        texts = [os.urandom(600).hex() for _ in range(3)]
+        store = TextStore(self.directory, max_bytes=2000)
+        first, second = store.put(texts[0]), store.put(texts[1])
+        for offset, handle in enumerate((second, first)):
+            path = os.path.join(self.directory, handle[:2], handle)
+            os.utime(path, (1000 + offset, 1000 + offset))
+        store.put(texts[2])  # over the limit: `second` is the oldest
+        self.assertEqual(store.get(first), texts[0])
+        with self.assertRaises(TextHandleNotFoundError):
+            store.get(second)
+        # Sizes of existing entries are picked up on start
+        self.assertEqual(TextStore(self.directory, max_bytes=2000).stats()["bytes"], store.stats()["bytes"])
+
+
+class TestTextHandles(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        patcher = patch("app.routers.candidates.gemini_service")
+        self.gemini = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _screen(self, **resume):
+        return self.client.post("/screen-candidate", json={"job_description": "Python", "criteria": {}, **resume})
+
+    def test_parse_cv_returns_the_text_handle(self):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Senior Python developer with ten years of experience.")
+        self.gemini.generate_json.return_value = {"skills": ["Python"], "summary": "s"}
+        data = self.client.post("/parse-cv", files={"file": ("cv.pdf", doc.tobytes(), "application/pdf")}).json()
+        self.assertEqual(data["text_handle"], text_handle(data["raw_text"]))
+
+        self.gemini.generate_json.return_value = {"match_score": 80}
+        self.assertEqual(self._screen(text_handle=data["text_handle"]).status_code, 200)
+        prompt = self.gemini.generate_json.call_args[0][0]
+        self.assertIn("Senior Python developer", prompt)
+
+    def test_screened_text_can_be_named_by_its_hash_later(self):
+        self.gemini.generate_json.return_value = {"match_score": 80}
+        self._screen(resume_text=RESUME)
+        self.gemini.generate_json.reset_mock()
+        self.assertEqual(self._screen(text_handle=text_handle(RESUME)).status_code, 200)
+        self.assertIn(RESUME, self.gemini.generate_json.call_args[0][0])
+
+    def test_unknown_handle_is_a_404(self):
+        response = self._screen(text_handle=text_handle("not stored anywhere"))
+        self.assertEqual(response.status_code, 404)
+        self.gemini.generate_json.assert_not_called()
+        response = self.client.post("/async/screen-candidate", json={
+            "criteria": {}, "text_handle": text_handle("not stored anywhere")
+        })
+        self.assertEqual(response.status_code, 404)
+
+    @patch("app.routers.candidates.milvus_service")
+    def test_vectorize_appends_the_stored_text(self, mock_milvus):
+        self.gemini.embed_text.return_value = [0.1] * 768
+        self._screen(resume_text=RESUME)
+        response = self.client.post("/vectorize-candidate", json={
+            "candidate_id": "c1", "text": "Candidate: Ada Lovelace", "text_handle": text_handle(RESUME)
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.gemini.embed_text.call_args[0][0], "Candidate: Ada Lovelace\n" + RESUME)
+
+
+if __name__ == "__main__":
+    unittest.main()
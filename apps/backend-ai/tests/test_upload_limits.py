@@ -0,0 +1,99 @@
+import io
+import unittest
+from unittest.mock import patch
+
+import fitz
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.middleware import RequestSizeLimitMiddleware
+from app.services.pdf_service import pdf_service
+
+
+def _text_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {number} of a long portfolio with plenty of text in it.")
+    return doc.tobytes()
+
+
+def _limited_app(max_bytes: int) -> FastAPI:
+    limited = FastAPI()
+    limited.add_middleware(RequestSizeLimitMiddleware, max_bytes=max_bytes)
+
+    @limited.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @limited.post("/raw")
+    async def raw(request: Request):
+        return {"size": len(await request.body())}
+
+    return limited
+
+
+class TestRequestSizeLimit(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(_limited_app(max_bytes=1000))
+
+    def test_under_limit(self):
+        response = self.client.post("/upload", files={"file": ("a.pdf", b"x" * 100, "application/pdf")})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"size": 100})
+
+    def test_content_length_over_limit(self):
+        response = self.client.post("/upload", files={"file": ("a.pdf", b"x" * 5000, "application/pdf")})
+        self.assertEqual(response.status_code, 413)
+
+    def test_chunked_body_over_limit(self):
+        # No Content-Length: the limit is enforced while the body streams in
+        def chunks():
+            for _ in range(50):
+                yield b"x" * 100
+
+        response = self.client.post("/raw", content=chunks())
+        self.assertEqual(response.status_code, 413)
+
+    def test_chunked_multipart_over_limit(self):
+        body = (
+            b"--boundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n"
+            b"Content-Type: application/pdf\r\n\r\n" + b"x" * 5000 + b"\r\n--boundary--\r\n"
+        )
+
+        def chunks():
+            for start in range(0, len(body), 256):
+                yield body[start:start + 256]
+
+        response = self.client.post(
+            "/upload", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+        )
+        self.assertEqual(response.status_code, 413)
+
+
+class TestPdfLimits(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    @patch("app.services.pdf_service.settings.MAX_PDF_PAGES", 2)
+    def test_page_limit(self):
+        response = self.client.post("/parse-cv", files={"file": ("cv.pdf", _text_pdf(3), "application/pdf")})
+        self.assertEqual(response.status_code, 413)
+
+    @patch("app.services.pdf_service.settings.MAX_EXTRACTED_CHARS", 100)
+    def test_extracted_text_is_capped(self):
+        document = pdf_service.extract_document(_text_pdf(5))
+        self.assertTrue(document.truncated)
+        self.assertLessEqual(sum(len(page.text) for page in document.pages), 100)
+        self.assertLess(len(document.pages), 5)
+
+    def test_small_upload_stays_in_memory(self):
+        class Upload:
+            size = 10
+            file = io.BytesIO(b"%PDF-small")
+
+        self.assertEqual(pdf_service.load_upload(Upload()), b"%PDF-small")
+
+
+if __name__ == "__main__":
+    unittest.main()
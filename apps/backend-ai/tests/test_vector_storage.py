@@ -0,0 +1,77 @@
+import math
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from app.services.gemini_service import GeminiService
+from app.services.milvus_service import MilvusService, collection_name, dense_index_params, to_float_list
+
+
+class TestVectorSettings(unittest.TestCase):
+    def test_default_schema_keeps_the_collection(self):
+        self.assertEqual(collection_name(), "candidate_profiles_v4")
+        self.assertEqual(dense_index_params(), {"metric_type": "L2", "index_type": "IVF_FLAT", "params": {"nlist": 128}})
+
+    @patch("app.services.milvus_service.settings.DIMENSION", 256)
+    @patch("app.services.milvus_service.settings.VECTOR_STORAGE", "float16")
+    @patch("app.services.milvus_service.settings.VECTOR_INDEX_TYPE", "IVF_PQ")
+    def test_reduced_quantized_schema(self):
+        self.assertEqual(collection_name(), "candidate_profiles_v4_d256_float16")
+        self.assertEqual(dense_index_params()["params"], {"nlist": 128, "m": 64, "nbits": 8})
+
+    @patch("app.services.milvus_service.settings.VECTOR_PQ_M", 100)
+    @patch("app.services.milvus_service.settings.VECTOR_INDEX_TYPE", "IVF_PQ")
+    def test_invalid_settings_fail_at_startup(self):
+        with self.assertRaises(ValueError):
+            MilvusService()
+        with patch("app.services.milvus_service.settings.VECTOR_INDEX_TYPE", "HNSW_WHATEVER"), \
+                self.assertRaises(ValueError):
+            dense_index_params()
+
+
+@patch("app.services.milvus_service.settings.VECTOR_STORAGE", "float16")
+class TestFloat16Storage(unittest.TestCase):
+    def setUp(self):
+        self.service = MilvusService()
+        self.service._collection = MagicMock()
+
+    def test_vectors_are_sent_as_float16(self):
+        self.service.upsert_candidate("c1", [0.5, 0.25], metadata={})
+        self.service.search([0.5, 0.25])
+        inserted = self.service._collection.insert.call_args[0][0][1][0]
+        searched = self.service._collection.search.call_args.kwargs["data"][0]
+        for vector in (inserted, searched):
+            self.assertEqual(vector.dtype, np.float16)
+
+    def test_stored_vectors_come_back_as_floats(self):
+        raw = np.asarray([0.5, 0.25], dtype=np.float16).tobytes()
+        self.service._collection.query.return_value = [{"candidate_id": "c1", "embedding": [raw]}]
+        self.assertEqual(self.service.get_embeddings(["c1"]), {"c1": [0.5, 0.25]})
+        self.assertEqual(to_float_list([0.5, 0.25]), [0.5, 0.25])
+
+
+class TestReducedEmbeddings(unittest.TestCase):
+    def _embed(self, dimension):
+        service = GeminiService()
+        self.addCleanup(service.close)
+        sdk = MagicMock()
+        sdk.embed_content.return_value = {"embedding": [3.0, 4.0]}
+        with patch.object(service, "_sdk", return_value=sdk), \
+                patch("app.services.gemini_service.settings.DIMENSION", dimension):
+            vector = service.embed_text("resume text")
+        return vector, sdk.embed_content.call_args.kwargs
+
+    def test_full_dimension_is_unchanged(self):
+        vector, args = self._embed(768)
+        self.assertEqual(vector, [3.0, 4.0])
+        self.assertNotIn("output_dimensionality", args)
+
+    def test_reduced_dimension_is_requested_and_normalized(self):
+        vector, args = self._embed(256)
+        self.assertEqual(args["output_dimensionality"], 256)
+        self.assertTrue(math.isclose(math.hypot(*vector), 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.config import settings
+from app.services.gemini_service import GeminiService
+from app.services.warmup import Warmup, load_warmup_queries
+from app.utils.lru_cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.service = GeminiService()
+        self.calls = []
+
+        def embed(**kwargs):
+            self.calls.append(kwargs)
+            return {"embedding": [0.1, 0.2]}
+
+        patcher = patch("app.services.gemini_service.genai")
+        self.genai = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.genai.embed_content.side_effect = embed
+
+    def test_queries_are_cached(self):
+        first = self.service.embed_text("python developer paris", task_type="retrieval_query")
+        first.append(99.0)  # callers get their own copy
+        second = self.service.embed_text("python developer paris", task_type="retrieval_query")
+        self.assertEqual(second, [0.1, 0.2])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_documents_are_not_cached(self):
+        self.service.embed_text("resume text", title="Candidate Profile")
+        self.service.embed_text("resume text", title="Candidate Profile")
+        self.assertEqual(len(self.calls), 2)
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.gemini = patch("app.services.warmup.gemini_service").start()
+        self.milvus = patch("app.services.warmup.milvus_service").start()
+        self.addCleanup(patch.stopall)
+        self.milvus.wait_until_connected.return_value = True
+
+    def test_runs_every_step(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("python developer\n\nreact paris\npython developer\n")
+        self.addCleanup(os.remove, f.name)
+
+        with patch.object(settings, "GEMINI_API_KEY", "key"), \
+                patch.object(settings, "WARMUP_QUERIES_FILE", f.name):
+            warmup = Warmup()
+            warmup.run()
+
+        self.assertTrue(warmup.done)
+        self.assertEqual({name: step["status"] for name, step in warmup.steps.items()},
+                         {"pdf": "ok", "gemini": "ok", "queries": "ok", "milvus": "ok"})
+        self.assertEqual(warmup.steps["queries"]["queries"], 2)
+        self.gemini.warm_up.assert_called_once()
+        self.assertEqual(self.gemini.embed_text.call_count, 2)
+        self.milvus.search.assert_called_once()
+
+    def test_failed_step_does_not_block_the_rest(self):
+        self.milvus.wait_until_connected.return_value = False
+        with patch.object(settings, "GEMINI_API_KEY", ""):
+            warmup = Warmup()
+            warmup.run()
+
+        self.assertTrue(warmup.done)
+        self.assertEqual(warmup.steps["gemini"]["status"], "skipped")
+        self.assertEqual(warmup.steps["milvus"]["status"], "failed")
+        self.assertEqual(warmup.steps["pdf"]["status"], "ok")
+
+    def test_disabled(self):
+        with patch.object(settings, "WARMUP_ENABLED", False):
+            warmup = Warmup()
+            warmup.start()
+        self.assertTrue(warmup.done)
+        self.assertEqual(warmup.state, "disabled")
+
+    def test_load_queries_limit(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("a\nb\nc\n")
+        self.addCleanup(os.remove, f.name)
+        self.assertEqual(load_warmup_queries(f.name, 2), ["a", "b"])
+
+
+class TestReadiness(unittest.TestCase):
+    def test_not_ready_until_warmup_done(self):
+        client = TestClient(app)
+        warmup = MagicMock(done=False)
+        warmup.health.return_value = {"state": "running", "steps": {}}
+        with patch("main.warmup", warmup), \
+                patch("main.milvus_service.health", return_value={"state": "connected"}):
+            self.assertEqual(client.get("/ready").status_code, 503)
+            warmup.done = True
+            self.assertEqual(client.get("/ready").status_code, 200)
+        self.assertEqual(client.get("/health").status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,13 +7,30 @@ import { Job } from 'bullmq';
 import axios from 'axios';
 import { Readable } from 'stream';
 import FormData from 'form-data';
+import { createHash } from 'crypto';
 
 jest.mock('axios');
 jest.mock('form-data');
 
+// AI tasks: the submit answers with a status URL, the first poll with `task`
+const mockAiTask = (task: any) => {
+  (axios.post as jest.Mock).mockImplementation(async (url: string) =>
+    url.includes('/async/')
+      ? { data: { task_id: 'task-1', status_url: '/async/tasks/task-1' } }
+      : { data: {} },
+  );
+  const download = (axios.get as jest.Mock).getMockImplementation();
+  (axios.get as jest.Mock).mockImplementation(async (url: string, config) =>
+    url.includes('/async/tasks/')
+      ? { data: { task_id: 'task-1', ...task } }
+      : download?.(url, config),
+  );
+};
+
 describe('ApplicationsProcessor', () => {
   let processor: ApplicationsProcessor;
   let prismaService: PrismaService;
+  let emailService: EmailService;
 
   beforeEach(async () => {
     const module: TestingModule = await Test.createTestingModule({
@@ -51,6 +68,7 @@ describe('ApplicationsProcessor', () => {
 
     processor = module.get<ApplicationsProcessor>(ApplicationsProcessor);
     prismaService = module.get<PrismaService>(PrismaService);
+    emailService = module.get<EmailService>(EmailService);
   });
 
   it('should stream file from URL to AI service', async () => {
@@ -86,9 +104,10 @@ describe('ApplicationsProcessor', () => {
       status: 200,
     });
 
-    // Mock axios.post for AI service
-    (axios.post as jest.Mock).mockResolvedValue({
-      data: { skills: [], raw_text: 'parsed text' },
+    // Mock the AI service's parse task
+    mockAiTask({
+      status: 'succeeded',
+      result: { skills: [], raw_text: 'parsed text' },
     });
 
     // Mock FormData
@@ -145,15 +164,6 @@ describe('ApplicationsProcessor', () => {
       mockCandidate,
     );
 
-    // Mock axios.post for AI service (parse-cv and vectorize)
-    (axios.post as jest.Mock).mockResolvedValue({
-      data: {
-        skills: ['Manual'],
-        raw_text: 'Manual content',
-        location: 'Remote',
-        experience_years: 5,
-      },
-    });
 
     // Mock fs (indirectly via stream)
     // Since we refactored to use fs.createReadStream, we need to mock it if we test local file path
@@ -167,6 +177,16 @@ describe('ApplicationsProcessor', () => {
     mockStream.push('manual pdf');
     mockStream.push(null);
     (axios.get as jest.Mock).mockResolvedValue({ data: mockStream });
+    // Parse task, then vectorize
+    mockAiTask({
+      status: 'succeeded',
+      result: {
+        skills: ['Manual'],
+        raw_text: 'Manual content',
+        location: 'Remote',
+        experience_years: 5,
+      },
+    });
 
     await processor.process(mockJob);
 
@@ -186,8 +206,75 @@ describe('ApplicationsProcessor', () => {
       expect.stringContaining('/vectorize-candidate'),
       expect.objectContaining({
         candidate_id: 'cand-manual',
-        text: expect.stringContaining('Manual content'),
+        // The resume itself is named by handle
+        text_handle: createHash('sha256')
+          .update('Manual content', 'utf8')
+          .digest('hex'),
       }),
+      expect.any(Object),
     );
   });
+
+  describe('when the AI service is overloaded', () => {
+    const mockJob = {
+      name: 'process-application',
+      data: {
+        applicationId: 'app-1',
+        filePath: 'http://example.com/resume.pdf',
+        jobId: 'job-1',
+      },
+    } as Job;
+
+    beforeEach(() => {
+      (prismaService.application.findUnique as jest.Mock).mockResolvedValue({
+        id: 'app-1',
+        candidateId: 'cand-1',
+        job: { title: 'Engineer', screeningTemplate: null },
+        candidate: { email: 'john@example.com', firstName: 'John' },
+      });
+      (axios.get as jest.Mock).mockResolvedValue({ data: new Readable() });
+      (axios.isAxiosError as unknown as jest.Mock).mockImplementation(
+        (error: any) => !!error?.isAxiosError,
+      );
+    });
+
+    it.each([
+      [
+        'the task queue is full',
+        () =>
+          (axios.post as jest.Mock).mockRejectedValue({
+            isAxiosError: true,
+            message: 'Too Many Requests',
+            response: { status: 429 },
+          }),
+      ],
+      [
+        'the task failed with a 503',
+        () =>
+          mockAiTask({
+            status: 'failed',
+            status_code: 503,
+            error: 'Worker stopped',
+          }),
+      ],
+    ])('retries the job when %s', async (_, mockFailure) => {
+      mockFailure();
+
+      await expect(processor.process(mockJob)).rejects.toBeDefined();
+
+      expect(emailService.sendParsingErrorEmail).not.toHaveBeenCalled();
+      expect(prismaService.application.delete).not.toHaveBeenCalled();
+    });
+
+    it('still rejects resumes that cannot be parsed', async () => {
+      mockAiTask({ status: 'failed', status_code: 422, error: 'Bad PDF' });
+
+      await processor.process(mockJob);
+
+      expect(emailService.sendParsingErrorEmail).toHaveBeenCalled();
+      expect(prismaService.application.delete).toHaveBeenCalledWith({
+        where: { id: 'app-1' },
+      });
+    });
+  });
 });
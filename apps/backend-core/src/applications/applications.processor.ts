@@ -2,12 +2,31 @@ import { Processor, WorkerHost } from '@nestjs/bullmq';
 import { Job } from 'bullmq';
 import { PrismaService } from '../prisma/prisma.service';
 import axios from 'axios';
+import { createHash } from 'crypto';
 import * as fs from 'fs';
 import FormData from 'form-data';
 import { AppStatus } from '@prisma/client';
 import { EmailService } from '../email/email.service';
 import { SearchService } from '../search/search.service';
 
+// Background jobs queue behind interactive requests in the AI service and are shed first
+// under load (429); BullMQ retries them with backoff
+const BATCH_PRIORITY = { headers: { 'X-Request-Priority': 'batch' } };
+
+// The AI service keeps the resume texts it extracts or screens under their
+// SHA-256, so requests can name a resume by this handle instead of its text
+const textHandle = (text: string) =>
+  createHash('sha256').update(text, 'utf8').digest('hex');
+
+// The AI service could not run a task now (overloaded, restarting): not a verdict on the
+// resume, so the job is retried instead of the application being rejected
+class TransientAiError extends Error {}
+
+const isTransientAiError = (error: any) =>
+  error instanceof TransientAiError ||
+  (axios.isAxiosError(error) &&
+    (!error.response || [429, 503].includes(error.response.status)));
+
 @Processor('applications')
 export class ApplicationsProcessor extends WorkerHost {
   constructor(
@@ -72,6 +91,14 @@ export class ApplicationsProcessor extends WorkerHost {
         }
 
       } catch (error: any) {
+        if (isTransientAiError(error)) {
+          // Overload or restart on the AI side: BullMQ retries with backoff
+          console.warn(
+            `⏳ AI service busy, retrying application ${applicationId}:`,
+            error.message,
+          );
+          throw error;
+        }
         console.error('❌ AI Parsing Failed:', error.message);
 
         // --- FIX: Notify candidate and delete application to allow retry ---
@@ -117,19 +144,22 @@ export class ApplicationsProcessor extends WorkerHost {
           `🧠 Performing Screening: ${jobData.screeningTemplate.name}`,
         );
         try {
-          const screenRes = await axios.post(
-            `${aiServiceUrl}/screen-candidate`,
-            {
-              resume_text: aiData.raw_text,
-              job_description: jobData.descriptionText || '',
-              criteria: {
-                requiredSkills: jobData.screeningTemplate.requiredSkills || [],
-                niceToHaves: jobData.screeningTemplate.niceToHaves || [],
-                scoringWeights: jobData.screeningTemplate.scoringWeights || {},
-              },
-            },
+          const template = jobData.screeningTemplate;
+          screeningResult = await this.sendResumeText(
+            aiData.raw_text,
+            (handle) =>
+              this.runAiTask(`${aiServiceUrl}/async/screen-candidate`, {
+                ...(handle
+                  ? { text_handle: handle }
+                  : { resume_text: aiData.raw_text }),
+                job_description: jobData.descriptionText || '',
+                criteria: {
+                  requiredSkills: template.requiredSkills || [],
+                  niceToHaves: template.niceToHaves || [],
+                  scoringWeights: template.scoringWeights || {},
+                },
+              }),
           );
-          screeningResult = screenRes.data;
         } catch (e: any) {
           console.error('⚠️ Screening Failed:', e.message);
         }
@@ -169,12 +199,16 @@ export class ApplicationsProcessor extends WorkerHost {
       const semanticText = `Candidate: ${application.candidate.firstName} ${application.candidate.lastName} Skills: ${aiData.skills?.join(', ')}`;
 
       // Allow error to propagate so BullMQ retries
-      await axios.post(`${aiServiceUrl}/vectorize-candidate`, {
-        candidate_id: application.candidateId,
-        text: semanticText,
-        location: aiData.location || 'Unknown',
-        experience: aiData.experience_years || 0,
-      });
+      await axios.post(
+        `${aiServiceUrl}/vectorize-candidate`,
+        {
+          candidate_id: application.candidateId,
+          text: semanticText,
+          location: aiData.location || 'Unknown',
+          experience: aiData.experience_years || 0,
+        },
+        BATCH_PRIORITY,
+      );
 
       const candidateForMeili = await this.prisma.candidate.findUnique({
         where: { id: application.candidateId },
@@ -192,6 +226,57 @@ export class ApplicationsProcessor extends WorkerHost {
     }
   }
 
+  // --- Helper: Submit an AI task and poll for its result ---
+  // The AI service answers at once with a task id; identical submissions (same request body
+  // or file) reuse the stored task, so a BullMQ retry does not redo the model call.
+  private async runAiTask(
+    url: string,
+    body: any,
+    config: any = {},
+    timeoutMs = Number(process.env.AI_TASK_TIMEOUT_MS || 5 * 60 * 1000),
+  ): Promise<any> {
+    const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000';
+    const submitted = await axios.post(url, body, config);
+    const statusUrl = `${aiServiceUrl}${submitted.data.status_url}`;
+
+    const deadline = Date.now() + timeoutMs;
+    let delay = 500;
+    while (Date.now() < deadline) {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      const { data: task } = await axios.get(statusUrl, {
+        // raw_text is capped by the AI service (MAX_EXTRACTED_CHARS)
+        maxContentLength: 10 * 1024 * 1024,
+      });
+      if (task.status === 'succeeded') return task.result;
+      if (task.status === 'failed') {
+        // 5xx: the worker stopped or the model was unavailable, the task can be resubmitted
+        const TaskError = task.status_code >= 500 ? TransientAiError : Error;
+        throw new TaskError(
+          `AI task ${task.task_id} failed (${task.status_code}): ${task.error}`,
+        );
+      }
+      delay = Math.min(delay * 2, 5000);
+    }
+    throw new TransientAiError(`AI task ${submitted.data.task_id} timed out`);
+  }
+
+  // --- Helper: Send a resume by handle, falling back to its text ---
+  // The AI service answers 404 for texts it does not hold (stored on another
+  // host, or evicted); the request is then sent again with the text itself.
+  private async sendResumeText<T>(
+    text: string,
+    send: (handle: string | null) => Promise<T>,
+  ): Promise<T> {
+    if (text) {
+      try {
+        return await send(textHandle(text));
+      } catch (e: any) {
+        if (e.response?.status !== 404) throw e;
+      }
+    }
+    return send(null);
+  }
+
   // --- Helper: Download & Parse Resume ---
   private async downloadAndParseResume(filePath: string): Promise<any> {
     const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000';
@@ -211,13 +296,20 @@ export class ApplicationsProcessor extends WorkerHost {
       formData.append('file', fs.createReadStream(filePath));
     }
 
+    // Keep in line with the AI service's MAX_UPLOAD_BYTES (it answers 413 above it)
+    const maxUploadBytes = Number(
+      process.env.AI_MAX_UPLOAD_BYTES || 20 * 1024 * 1024,
+    );
+
     console.log('📤 Sending to AI Service for parsing...');
-    const aiResponse = await axios.post(`${aiServiceUrl}/parse-cv`, formData, {
-      headers: { ...formData.getHeaders() },
-      maxContentLength: Infinity,
-      maxBodyLength: Infinity,
-    });
-    const aiData = aiResponse.data;
+    const aiData = await this.runAiTask(
+      `${aiServiceUrl}/async/parse-cv`,
+      formData,
+      {
+        headers: { ...formData.getHeaders() },
+        maxBodyLength: maxUploadBytes,
+      },
+    );
 
     const textLen = aiData.raw_text ? aiData.raw_text.length : 0;
     console.log(
@@ -264,14 +356,22 @@ export class ApplicationsProcessor extends WorkerHost {
       // 4. Vectorize & Index
       const aiServiceUrl =
         process.env.AI_SERVICE_URL || 'http://localhost:8000';
-      const semanticText = `Candidate: ${candidate.firstName} ${candidate.lastName} Skills: ${aiData.skills?.join(', ')}\n${aiData.raw_text || ''}`;
-
-      await axios.post(`${aiServiceUrl}/vectorize-candidate`, {
-        candidate_id: candidate.id,
-        text: semanticText,
-        location: aiData.location || candidate.location || 'Unknown',
-        experience: aiData.experience_years || candidate.experience || 0,
-      });
+      const profile = `Candidate: ${candidate.firstName} ${candidate.lastName} Skills: ${aiData.skills?.join(', ')}`;
+
+      // With a handle, the AI service appends the stored resume text to `text`
+      await this.sendResumeText(aiData.raw_text, (handle) =>
+        axios.post(
+          `${aiServiceUrl}/vectorize-candidate`,
+          {
+            candidate_id: candidate.id,
+            text: handle ? profile : `${profile}\n${aiData.raw_text || ''}`,
+            text_handle: handle || undefined,
+            location: aiData.location || candidate.location || 'Unknown',
+            experience: aiData.experience_years || candidate.experience || 0,
+          },
+          BATCH_PRIORITY,
+        ),
+      );
 
       // Re-fetch to get latest data for MeiliSearch
       const updatedCandidate = await this.prisma.candidate.findUnique({
@@ -300,16 +400,25 @@ export class ApplicationsProcessor extends WorkerHost {
     });
     if (!candidate) return;
 
-    const semanticText = `Candidate: ${candidate.firstName} ${candidate.lastName}\n${candidate.resumeText || ''}`;
+    const profile = `Candidate: ${candidate.firstName} ${candidate.lastName}`;
+    const resumeText = candidate.resumeText || '';
     const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000';
 
     try {
-      await axios.post(`${aiServiceUrl}/vectorize-candidate`, {
-        candidate_id: candidate.id,
-        text: semanticText,
-        location: candidate.location || 'Unknown',
-        experience: candidate.experience || 0,
-      });
+      // Re-indexes name the resume by handle: its text is only sent on a 404
+      await this.sendResumeText(resumeText, (handle) =>
+        axios.post(
+          `${aiServiceUrl}/vectorize-candidate`,
+          {
+            candidate_id: candidate.id,
+            text: handle ? profile : `${profile}\n${resumeText}`,
+            text_handle: handle || undefined,
+            location: candidate.location || 'Unknown',
+            experience: candidate.experience || 0,
+          },
+          BATCH_PRIORITY,
+        ),
+      );
 
       await this.searchService.indexCandidate(candidate);
       console.log(`✅ Re-indexed candidate ${candidateId}`);
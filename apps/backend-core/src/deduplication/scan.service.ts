@@ -1,6 +1,6 @@
 import { Injectable, Logger } from '@nestjs/common';
+import axios from 'axios';
 import { PrismaService } from '../prisma/prisma.service';
-import { DeduplicationService } from './deduplication.service';
 import { DuplicateStatus } from '@prisma/client';
 
 @Injectable()
@@ -9,168 +9,106 @@ export class ScanService {
 
     constructor(
         private readonly prisma: PrismaService,
-        private readonly deduplicationService: DeduplicationService,
     ) { }
 
     /**
      * Triggers a full database scan to identify duplicate groups.
+     * Candidates are streamed in batches to the AI service's duplicate index
+     * (identity keys + MinHash/LSH over resume text + embedding range search),
+     * which returns the duplicate clusters each batch belongs to in one pass.
      * This is a heavy operation and should be run in the background.
      */
     async scanDatabase() {
         this.logger.log('Starting retroactive duplicate scan...');
 
+        // The duplicate index lives in one AI worker process: with several workers, point
+        // AI_DEDUP_SERVICE_URL at an instance started with WEB_CONCURRENCY=1
+        const aiServiceUrl =
+            process.env.AI_DEDUP_SERVICE_URL || process.env.AI_SERVICE_URL || 'http://localhost:8000';
+        const exclusions = await this.prisma.duplicateExclusion.findMany({
+            select: { candidateAId: true, candidateBId: true },
+        });
+
         let cursor: string | undefined;
-        let hasMore = true;
-        const BATCH_SIZE = 100;
+        const BATCH_SIZE = 500;
         let processedCount = 0;
         let newGroupsCount = 0;
-
-        while (hasMore) {
+        let isFirstBatch = true;
+        // Returned by every batch; a 409 means the index was rebuilt mid-scan (AI worker
+        // restart, another scan): the earlier batches are gone, so the scan starts over
+        let indexId: string | undefined;
+        const MAX_RESTARTS = 3;
+        let restarts = 0;
+
+        while (true) {
             // 1. Fetch candidates in batches
             const candidates = await this.prisma.candidate.findMany({
-                select: { id: true, firstName: true, lastName: true, phone: true, email: true, linkedinUrl: true },
+                select: { id: true, firstName: true, lastName: true, phone: true, email: true, linkedinUrl: true, resumeText: true },
                 take: BATCH_SIZE,
                 skip: cursor ? 1 : 0,
                 cursor: cursor ? { id: cursor } : undefined,
                 orderBy: { id: 'asc' },
             });
 
-            if (candidates.length === 0) {
-                hasMore = false;
-                break;
-            }
+            if (candidates.length === 0) break;
 
             // Update cursor for next iteration
             cursor = candidates[candidates.length - 1].id;
             processedCount += candidates.length;
 
-            const visitedInBatch = new Set<string>();
-
-            for (const candidate of candidates) {
-                if (visitedInBatch.has(candidate.id)) continue;
-
-                // Find matches against THE BATCH + Database via logic if needed
-                // Ideally, we compare this candidate against ALL others.
-                // Comparing only within batch is insufficient.
-                // Comparing against DB for every candidate is expensive (O(N*M)).
-                // Optimization: We rely on `findMatchesForCandidate` which likely queries DB efficiently.
-
-                const potentialMatches = await this.findMatchesForCandidate(candidate);
-
-                if (potentialMatches.length > 0) {
-                    // Check if already in an OPEN group
-                    const existingGroup = await this.findExistingOpenGroup([candidate, ...potentialMatches]);
-
-                    if (existingGroup) {
-                        // Add missing members to existing group
-                        await this.addToGroup(existingGroup.id, [candidate, ...potentialMatches]);
-                    } else {
-                        // Create new group
-                        const groupMembers = [candidate, ...potentialMatches];
-                        await this.createDuplicateGroup(groupMembers);
-                        newGroupsCount++;
-                    }
-
-                    // Mark as visited to avoid re-processing in this loop if they are in the same batch
-                    potentialMatches.forEach(m => {
-                        if (candidates.some(c => c.id === m.id)) visitedInBatch.add(m.id);
-                    });
+            // 2. Index the batch; clusters may include candidates from earlier batches
+            let data: any;
+            try {
+                ({ data } = await axios.post(`${aiServiceUrl}/deduplication/candidates`, {
+                    candidates: candidates.map(c => ({
+                        candidate_id: c.id,
+                        first_name: c.firstName,
+                        last_name: c.lastName,
+                        email: c.email,
+                        phone: c.phone,
+                        linkedin_url: c.linkedinUrl,
+                        text: c.resumeText,
+                    })),
+                    reset_index: isFirstBatch,
+                    index_id: isFirstBatch ? undefined : indexId,
+                    excluded_pairs: isFirstBatch ? exclusions.map(e => [e.candidateAId, e.candidateBId]) : [],
+                }));
+            } catch (error) {
+                if (axios.isAxiosError(error) && error.response?.status === 503 && error.response.data?.detail) {
+                    // e.g. a multi-worker AI service: a configuration problem, retrying will not help
+                    throw new Error(`Duplicate scan aborted: ${error.response.data.detail}`);
                 }
-            }
-
-            this.logger.log(`Processed ${processedCount} candidates...`);
-        }
-
-        this.logger.log(`Scan complete. Created ${newGroupsCount} new duplicate groups.`);
-    }
-
-    private async findMatchesForCandidate(source: any) {
-        // We need to find potential matches in the ENTIRE DB, not just the batch.
-        // We use targeted queries based on our Matching Strategies.
-
-        const matches: any[] = [];
-
-        // 1. Strict Email Match (Sanity check, usually unique)
-        if (source.email) {
-            const emailMatches = await this.prisma.candidate.findMany({
-                where: {
-                    email: { equals: source.email, mode: 'insensitive' },
-                    id: { not: source.id }
-                },
-                select: { id: true, firstName: true, lastName: true, phone: true, email: true, linkedinUrl: true }
-            });
-            matches.push(...emailMatches.map(c => ({ candidate: c, reason: { strategy: 'EMAIL', confidence: 'EXACT' } })));
-        }
-
-        // 2. LinkedIn Match
-        if (source.linkedinUrl) {
-            const linkedinMatches = await this.prisma.candidate.findMany({
-                where: {
-                    linkedinUrl: { equals: source.linkedinUrl, mode: 'insensitive' },
-                    id: { not: source.id } // Exclude self
-                },
-                select: { id: true, firstName: true, lastName: true, phone: true, email: true, linkedinUrl: true }
-            });
-            // Avoid duplicates if caught by email
-            for (const m of linkedinMatches) {
-                if (!matches.some(existing => existing.candidate.id === m.id)) {
-                    matches.push({ candidate: m, reason: { strategy: 'LINKEDIN', confidence: 'HIGH' } });
+                if (!axios.isAxiosError(error) || error.response?.status !== 409 || restarts >= MAX_RESTARTS) {
+                    throw error;
                 }
+                restarts++;
+                this.logger.warn(`Duplicate index was rebuilt after ${processedCount} candidates, restarting the scan`);
+                cursor = undefined;
+                processedCount = 0;
+                isFirstBatch = true;
+                continue;
             }
-        }
-
-        // 3. Fuzzy Match (Name + Phone)
-        // We query by LastName first (indexed usually) to limit set
-        if (source.lastName && source.lastName.length > 2 && source.phone) {
-            const nameMatches = await this.prisma.candidate.findMany({
-                where: {
-                    lastName: { equals: source.lastName, mode: 'insensitive' },
-                    id: { not: source.id }
-                },
-                select: { id: true, firstName: true, lastName: true, phone: true, email: true, linkedinUrl: true }
-            });
-
-            for (const target of nameMatches) {
-                if (matches.some(m => m.candidate.id === target.id)) continue;
-
-                const isFuzzy = this.deduplicationService.checkFuzzyMatchOffline(
-                    {
-                        firstName: source.firstName || undefined,
-                        lastName: source.lastName || undefined,
-                        phone: source.phone || undefined
-                    },
-                    {
-                        firstName: target.firstName || undefined,
-                        lastName: target.lastName || undefined,
-                        phone: target.phone || undefined
-                    }
-                );
-                if (isFuzzy) {
-                    matches.push({ candidate: target, reason: { strategy: 'PHONE_NAME', confidence: 'HIGH' } });
+            isFirstBatch = false;
+            indexId = data.index_id;
+
+            // 3. Persist clusters, merging into OPEN groups when one already exists
+            for (const cluster of data.clusters) {
+                const members = cluster.candidate_ids.map((id: string) => ({ id }));
+                const matchReason = { note: 'Retroactive Scan (Batch)', matches: cluster.matches };
+
+                const existingGroup = await this.findExistingOpenGroup(members);
+                if (existingGroup) {
+                    await this.addToGroup(existingGroup.id, members, matchReason);
+                } else {
+                    await this.createDuplicateGroup(members, matchReason);
+                    newGroupsCount++;
                 }
             }
-        }
 
-        // Filter out exclusions
-        if (matches.length > 0) {
-            const targetIds = matches.map(m => m.candidate.id);
-            const exclusions = await this.prisma.duplicateExclusion.findMany({
-                where: {
-                    OR: [
-                        { candidateAId: source.id, candidateBId: { in: targetIds } },
-                        { candidateAId: { in: targetIds }, candidateBId: source.id }
-                    ]
-                }
-            });
-
-            const excludedIds = new Set(
-                exclusions.flatMap(e => [e.candidateAId, e.candidateBId])
-            );
-
-            return matches.filter(m => !excludedIds.has(m.candidate.id)).map(m => m.candidate);
+            this.logger.log(`Processed ${processedCount} candidates...`);
         }
 
-        return matches.map(m => m.candidate);
+        this.logger.log(`Scan complete. Created ${newGroupsCount} new duplicate groups.`);
     }
 
     private async findExistingOpenGroup(candidates: any[]) {
@@ -187,7 +125,7 @@ export class ScanService {
         return existingMember?.group || null;
     }
 
-    private async addToGroup(groupId: string, candidates: any[]) {
+    private async addToGroup(groupId: string, candidates: any[], matchReason: any = { note: 'Retroactive Scan (Batch)' }) {
         for (const c of candidates) {
             const exists = await this.prisma.duplicateGroupMember.findUnique({
                 where: { groupId_candidateId: { groupId, candidateId: c.id } }
@@ -199,18 +137,18 @@ export class ScanService {
                         groupId,
                         candidateId: c.id,
                         confidence: 'HIGH',
-                        matchReason: { note: 'Retroactive Scan (Batch)' }
+                        matchReason
                     }
                 });
             }
         }
     }
 
-    private async createDuplicateGroup(candidates: any[]) {
+    private async createDuplicateGroup(candidates: any[], matchReason?: any) {
         const group = await this.prisma.duplicateGroup.create({
             data: { status: DuplicateStatus.OPEN }
         });
 
-        await this.addToGroup(group.id, candidates);
+        await this.addToGroup(group.id, candidates, matchReason);
     }
 }
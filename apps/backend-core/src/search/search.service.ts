@@ -50,36 +50,40 @@ export class SearchService implements OnModuleInit {
   }
 
   // 2. HYBRID SEARCH
+  // Dense + sparse (BM25-style) fusion runs inside Milvus via the AI service,
+  // so this is a single round trip returning one ranked list.
+  // MeiliSearch keyword search is used when the AI service is unavailable or finds
+  // nothing: a new Milvus collection stays empty until candidates are re-indexed
+  // (POST /candidates/reindex), and keyword results beat an empty page meanwhile.
   async search(query: string) {
-    // Parallel Execution
-    const [vectorResults, keywordResults] = await Promise.all([
-      this.searchVectors(query),
-      this.searchKeywords(query),
-    ]);
+    const hybridIds = await this.searchHybrid(query);
+    if (hybridIds) return hybridIds;
 
-    // Merge results using RRF
-    return this.reciprocalRankFusion(vectorResults, keywordResults);
+    const keywordResults = await this.searchKeywords(query);
+    return keywordResults.map((hit: any) => hit.id as string);
   }
 
-  private async searchVectors(query: string) {
+  private async searchHybrid(query: string): Promise<string[] | null> {
     try {
       const aiServiceUrl =
         process.env.AI_SERVICE_URL || 'http://localhost:8000';
-      // Call your existing Python/Milvus service
       const { data } = await firstValueFrom(
-        this.httpService.post(`${aiServiceUrl}/search-candidates`, {
+        this.httpService.post(`${aiServiceUrl}/hybrid-search-candidates`, {
           query,
-          limit: 20, // Get more than needed to allow for intersection
+          limit: 20,
+          fusion: 'rrf',
         }),
       );
-      // Normalize to: { id: string, score: number }
-      return data.matches.map((m: any) => ({
-        id: m.candidate_id,
-        score: m.score,
-      }));
+      if (!data.matches?.length) {
+        this.logger.warn(
+          'Hybrid search returned no matches, falling back to keyword search',
+        );
+        return null;
+      }
+      return data.matches.map((m: any) => m.candidate_id as string);
     } catch (error) {
-      this.logger.error('Vector search failed', error);
-      return [];
+      this.logger.error('Hybrid search failed', error);
+      return null;
     }
   }
 
@@ -94,33 +98,4 @@ export class SearchService implements OnModuleInit {
       return [];
     }
   }
-
-  /**
-   * 3. THE ALGORITHM: Reciprocal Rank Fusion (RRF)
-   * This merges two lists of ranked items without needing to normalize disparate scores.
-   * Score = 1 / (k + rank)
-   */
-  private reciprocalRankFusion(vectorHits: any[], keywordHits: any[], k = 60) {
-    const scores = new Map<string, number>();
-
-    // Process Vector Hits
-    vectorHits.forEach((hit, rank) => {
-      const currentScore = scores.get(hit.id) || 0;
-      // Rank is 0-based index. Lower rank (higher in list) = higher score.
-      scores.set(hit.id, currentScore + 1 / (k + rank));
-    });
-
-    // Process Keyword Hits
-    keywordHits.forEach((hit, rank) => {
-      const currentScore = scores.get(hit.id) || 0;
-      scores.set(hit.id, currentScore + 1 / (k + rank));
-    });
-
-    // Sort by final score descending
-    const sortedIds = Array.from(scores.entries())
-      .sort((a, b) => b[1] - a[1])
-      .map(([id]) => id);
-
-    return sortedIds; // Returns ID list to fetch from Postgres
-  }
 }
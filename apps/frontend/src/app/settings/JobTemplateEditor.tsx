@@ -250,7 +250,8 @@ export default function JobTemplateEditor({ initialData }: Props) {
     }
 
     try {
-      const res = await fetch('http://localhost:8000/generate-template-section', {
+      // Streamed (SSE): the block fills in as tokens arrive instead of after the whole section
+      const res = await fetch('http://localhost:8000/generate-template-section/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -261,10 +262,32 @@ export default function JobTemplateEditor({ initialData }: Props) {
           skills: skills      // Pass Skills
         })
       });
-
-      const data = await res.json();
-      if (data.content) {
-        updateBlock(block.id, 'content', data.content);
+      if (!res.ok || !res.body) throw new Error(`AI service responded ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let content = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const raw of events) {
+          const [eventLine, dataLine] = raw.split('\n');
+          const event = eventLine.replace('event: ', '');
+          const data = JSON.parse(dataLine.replace('data: ', ''));
+          if (event === 'token') {
+            content += data.text;
+            updateBlock(block.id, 'content', content);
+          } else if (event === 'done') {
+            updateBlock(block.id, 'content', data.content);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
       }
     } catch (e) {
       console.error(e);